@@ -0,0 +1,118 @@
+""" Measures the time to build, store and load a KmerIndex and the
+latency of motif queries on both strands: by complementing the sequence
+for every query, by scanning for the reverse complement of the motif
+and through the index.
+
+Run from the root of the repository:
+    python -m benchmarks.motif_benchmark --length 5000000
+"""
+from argparse import ArgumentParser
+from os.path import join
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from src.motif_search import DEFAULT_K, KmerIndex, search
+from src.origin_parser import Sequence, reverse_complement
+
+BASES = b'ACGT' * 64  # Translation table from random bytes to bases
+QUERIES = [
+    ('EcoRI site', 'GAATTC'),
+    ('primer', 'AGAGTTTGATCCTGGCTCAG'),
+    ('degenerate primer', 'GTGYCAGCMGCCGCGGTAA'),
+    ('degenerate site', 'GGNNCC'),
+]
+
+
+def __complement_search(sequence, motif):
+    """ The search without this module: the motif is searched on the
+    forward strand and on the complemented sequence.
+    """
+    hits = 0
+    for bases in (sequence.get_sequence(),
+                  reverse_complement(sequence.get_sequence())):
+        start = bases.find(motif)
+        while start != -1:
+            hits += 1
+            start = bases.find(motif, start + 1)
+    return hits
+
+
+def __time(function, repetitions):
+    """ Returns the fastest time of a function in milliseconds """
+    times = []
+    for _ in range(repetitions):
+        begin = perf_counter()
+        function()
+        times.append(perf_counter() - begin)
+    return min(times) * 1000
+
+
+def run(length, k=DEFAULT_K, repetitions=5, seed=42):
+    """ Runs the benchmark on a random sequence.
+
+    Parameters:
+        length - int
+            The length of the sequence
+        k - int. Default: 8
+            The length of the k-mers of the index
+        repetitions - int. Default: 5
+            The amount of measurements per query, the fastest one is
+            used
+        seed - int. Default: 42
+            The seed of the random sequence
+    Returns:
+        A tuple with a dictionary of the build, save and load times and
+        a list of tuples with the name of the query and the latency in
+        milliseconds of the three ways to search.
+    """
+    sequence = Sequence(Random(seed).randbytes(length).translate(BASES)
+                        .decode('ascii'))
+    timings = {}
+    begin = perf_counter()
+    index = KmerIndex(sequence, k)
+    timings['build'] = perf_counter() - begin
+    with TemporaryDirectory() as directory:
+        filename = join(directory, 'sequence.kmers')
+        begin = perf_counter()
+        index.save(filename)
+        timings['save'] = perf_counter() - begin
+        begin = perf_counter()
+        KmerIndex.load(filename, sequence)
+        timings['load'] = perf_counter() - begin
+    results = []
+    for name, motif in QUERIES:
+        # The old way only supports exact motifs
+        complement = None
+        if set(motif) <= set('ACGT'):
+            complement = __time(lambda: __complement_search(sequence, motif),
+                                repetitions)
+        results.append((
+            name, complement,
+            __time(lambda: search(sequence, motif), repetitions),
+            __time(lambda: search(sequence, motif, index=index),
+                   repetitions)))
+    return timings, results
+
+
+def main(args=None):
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--length', type=int, default=5000000,
+                        help='Length of the sequence, default: 5000000')
+    parser.add_argument('-k', type=int, default=DEFAULT_K,
+                        help='Length of the k-mers, default: {}'
+                        .format(DEFAULT_K))
+    options = parser.parse_args(args)
+    timings, results = run(options.length, options.k)
+    for name, seconds in timings.items():
+        print('{:<20}{:>10.3f}s'.format('index ' + name, seconds))
+    print('{:<20}{:>12}{:>12}{:>12}'.format('query', 'complement',
+                                            'scan', 'index'))
+    for name, complement, scan, indexed in results:
+        print('{:<20}{:>12}{:>12.3f}{:>12.3f}   ms'.format(
+            name, '-' if complement is None else
+            '{:.3f}'.format(complement), scan, indexed))
+
+
+if __name__ == '__main__':
+    main()
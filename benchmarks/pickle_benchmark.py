@@ -0,0 +1,89 @@
+""" Measures the size and the time of pickling parsed records, as they
+are sent to the processes of a pool, and checks that they are restored
+as they were.
+
+Run from the root of the repository:
+    python -m benchmarks.pickle_benchmark --file NC_000913.3.gb
+
+The exit code is 1 when any restored record differs.
+"""
+from argparse import ArgumentParser
+from os.path import basename
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from sys import exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from src.genbank_parser import GenbankParser
+
+from .synthetic import CORPORA, generate_corpus
+from .writer_benchmark import compare_records
+
+PARTS = ('metadata', 'features', 'sequence')
+
+
+def benchmark_file(filename, binary=False):
+    """ Pickles every part of all records of a file.
+
+    Parameters:
+        filename - string
+            The Genbank file
+        binary - boolean. Default: False
+            Whether to parse in binary mode, which pickles the
+            qualifiers which have not been decoded as bytes
+    Returns:
+        A tuple with a dictionary of the (bytes, dump seconds, load
+        seconds) of every part and the list of differences found.
+    """
+    records = []
+    with GenbankParser(filename, binary=binary) as parser:
+        while parser.has_record():
+            records.append((parser.parse_metadata(),
+                            parser.parse_features(), parser.parse_origin()))
+    results = {}
+    restored = [[] for _ in records]
+    for index, part in enumerate(PARTS):
+        size = dump_seconds = load_seconds = 0
+        for record, parts in zip(records, restored):
+            begin = perf_counter()
+            data = dumps(record[index], HIGHEST_PROTOCOL)
+            dumped = perf_counter()
+            parts.append(loads(data))
+            load_seconds += perf_counter() - dumped
+            dump_seconds += dumped - begin
+            size += len(data)
+        results[part] = (size, dump_seconds, load_seconds)
+    return results, compare_records(records, restored)
+
+
+def main(args=None):
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help='Synthetic corpus to run, default: all')
+    parser.add_argument('--file', action='append', default=[],
+                        help='A real Genbank file to include')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Scales the size of the synthetic corpora')
+    parser.add_argument('--binary', action='store_true',
+                        help='Parse in binary mode')
+    options = parser.parse_args(args)
+    failed = False
+    with TemporaryDirectory() as directory:
+        files = [(name, generate_corpus(directory, name, options.scale))
+                 for name in options.corpus or sorted(CORPORA)]
+        files += [(basename(filename), filename)
+                  for filename in options.file]
+        for name, filename in files:
+            results, differences = benchmark_file(filename, options.binary)
+            print(name)
+            for part, (size, dump_seconds, load_seconds) in results.items():
+                print('  {:<10}{:>10.2f}MB  dump {:>7.3f}s  load {:>7.3f}s'
+                      .format(part, size / 1e6, dump_seconds, load_seconds))
+            for difference in differences:
+                print('  DIFFERENCE ' + difference)
+            failed = failed or bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
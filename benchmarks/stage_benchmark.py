@@ -0,0 +1,173 @@
+""" Times every parsing stage over synthetic and real Genbank files and
+compares the results to a stored baseline.
+
+Run from the root of the repository:
+    python -m benchmarks.stage_benchmark --save-baseline baseline.json
+    python -m benchmarks.stage_benchmark --baseline baseline.json
+
+The synthetic corpora are generated in a temporary directory. Real
+files can be added with --file. A stage which is slower than the
+baseline by more than the threshold is reported as a regression, and
+the exit code is 1 when any regression has been found.
+"""
+from argparse import ArgumentParser
+from json import dump, load
+from os.path import basename
+from sys import exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from src.genbank_parser import GenbankParser
+from src.location_parser import parse_location
+
+from .synthetic import CORPORA, generate_corpus
+
+STAGES = ('parse_metadata', 'parse_features', 'parse_origin',
+          'parse_location')
+# Stages faster than this are too noisy to compare to a baseline
+MINIMUM_SECONDS = 0.01
+
+
+def benchmark_file(filename, measure_memory=True, binary=False, prefetch=0):
+    """ Parses all records of a file and measures every stage.
+
+    Parameters:
+        filename - string
+            The Genbank file to parse
+        measure_memory - boolean. Default: True
+            Whether to parse the file a second time to measure the peak
+            memory, which is slow.
+        binary - boolean. Default: False
+            Whether to parse in binary mode
+        prefetch - int. Default: 0
+            The amount of blocks the parser reads ahead in a thread
+    Returns:
+        A dictionary with the seconds spent in every stage, the amount
+        of records, the peak memory in bytes (or None) and the
+        description of the PrefetchStatistics (or None).
+    """
+    timings, locations = __time_stages(filename, binary, prefetch)
+    # Time the location parser on its own, using the locations of the
+    # parsed features
+    begin = perf_counter()
+    for location in locations:
+        parse_location(location)
+    timings['parse_location'] = perf_counter() - begin
+    result = {'seconds': timings, 'records': timings.pop('records'),
+              'peak_memory': None, 'prefetch': timings.pop('prefetch')}
+    if measure_memory:
+        start()
+        __time_stages(filename, binary, prefetch)
+        result['peak_memory'] = get_traced_memory()[1]
+        stop()
+    return result
+
+
+def __time_stages(filename, binary, prefetch):
+    """ Parses all records of the file and times the stages """
+    timings = dict.fromkeys(STAGES[:3], 0.0)
+    locations = []
+    records = 0
+    with GenbankParser(filename, binary=binary, prefetch=prefetch) as parser:
+        while parser.has_record():
+            for stage in STAGES[:3]:
+                begin = perf_counter()
+                result = getattr(parser, stage)()
+                timings[stage] += perf_counter() - begin
+                if stage == 'parse_features':
+                    locations += [str(feature.location)
+                                  for feature in result]
+            records += 1
+    timings['records'] = records
+    statistics = parser.prefetch_statistics
+    timings['prefetch'] = None if statistics is None else str(statistics)
+    return timings, locations
+
+
+def compare(results, baseline, threshold):
+    """ Compares results with a baseline.
+
+    Parameters:
+        results - dict
+            The results of the current run, by corpus name
+        baseline - dict
+            The stored results, by corpus name
+        threshold - float
+            The allowed ratio between the current and baseline time
+    Returns:
+        A list of strings describing each regression
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for stage, seconds in result['seconds'].items():
+            base = baseline[name]['seconds'].get(stage)
+            if (base and base >= MINIMUM_SECONDS and
+                    seconds > base * threshold):
+                regressions.append('{} {}: {:.3f}s -> {:.3f}s ({:.0%})'
+                                   .format(name, stage, base, seconds,
+                                           seconds / base - 1))
+        base_memory = baseline[name].get('peak_memory')
+        memory = result['peak_memory']
+        if base_memory and memory and memory > base_memory * threshold:
+            regressions.append('{} peak memory: {} -> {} bytes'
+                               .format(name, base_memory, memory))
+    return regressions
+
+
+def main(args=None):
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help='Synthetic corpus to run, default: all')
+    parser.add_argument('--file', action='append', default=[],
+                        help='A real Genbank file to include')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Scales the size of the synthetic corpora')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip measuring the peak memory')
+    parser.add_argument('--binary', action='store_true',
+                        help='Parse in binary mode')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='Blocks read ahead in a thread, default: 0')
+    parser.add_argument('--baseline', help='Baseline to compare to')
+    parser.add_argument('--save-baseline', help='Store the results')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Allowed slowdown ratio, default: 1.2')
+    options = parser.parse_args(args)
+    results = {}
+    with TemporaryDirectory() as directory:
+        files = [(name, generate_corpus(directory, name, options.scale))
+                 for name in options.corpus or sorted(CORPORA)]
+        files += [(basename(filename), filename)
+                  for filename in options.file]
+        for name, filename in files:
+            result = results[name] = benchmark_file(filename,
+                                                    not options.no_memory,
+                                                    options.binary,
+                                                    options.prefetch)
+            print('{} ({} records)'.format(name, result['records']))
+            for stage in STAGES:
+                print('  {:<16}{:>10.3f}s'.format(stage,
+                                                  result['seconds'][stage]))
+            if result['peak_memory'] is not None:
+                print('  {:<16}{:>10.1f}MB'.format(
+                    'peak memory', result['peak_memory'] / 1e6))
+            if result['prefetch'] is not None:
+                print('  prefetch: ' + result['prefetch'])
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as filehandle:
+            dump(results, filehandle, indent=2)
+    if options.baseline:
+        with open(options.baseline) as filehandle:
+            regressions = compare(results, load(filehandle),
+                                  options.threshold)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,140 @@
+""" Generates synthetic Genbank files for the benchmarks.
+
+The records follow the layout of real Genbank files: a header with
+references, a FEATURES block with gene and CDS features (part of them
+joined or on the complement strand, with multiline translations) and a
+random sequence in the ORIGIN block.
+"""
+from os.path import join
+from random import Random
+
+BASES = b'acgt' * 64  # Translation table from random bytes to bases
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+QUALIFIER_SPACING = ' ' * 21
+LINE_WIDTH = 79
+
+# The corpora as name -> (amount of records, sequence length, amount of
+# features per record)
+CORPORA = {
+    'viral': (1, 10000, 10),
+    'bacterial': (1, 5000000, 5000),
+    'contig': (1, 100000000, 1),
+    'release': (200, 20000, 20),
+}
+
+
+def generate_corpus(directory, name, scale=1.0, seed=42):
+    """ Writes a corpus to a file.
+
+    Parameters:
+        directory - string
+            The directory to write the file in
+        name - string
+            The name of the corpus in CORPORA
+        scale - float. Default: 1.0
+            Scales the sequence length and the amount of features,
+            which is useful to run the benchmarks quickly.
+        seed - int. Default: 42
+            The seed of the random generator, so the corpus is the same
+            for every run.
+    Returns:
+        The filename of the corpus
+    """
+    records, length, feature_count = CORPORA[name]
+    length = max(int(length * scale), 1000)
+    feature_count = max(int(feature_count * scale), 1)
+    rng = Random(seed)
+    filename = join(directory, name + '.gb')
+    with open(filename, 'w') as filehandle:
+        for index in range(records):
+            write_record(filehandle, '{}{:05d}'.format(name.upper()[:3],
+                                                       index),
+                         length, feature_count, rng)
+    return filename
+
+
+def write_record(filehandle, locus_name, length, feature_count, rng):
+    """ Writes a single synthetic record.
+
+    Parameters:
+        filehandle - file object
+            The text file to write to
+        locus_name - string
+            The name of the locus, also used as accession
+        length - int
+            The length of the sequence
+        feature_count - int
+            The amount of features, the first one always is the source
+        rng - Random object
+            The random generator
+    """
+    write = filehandle.write
+    write('LOCUS       {:<16}{:>12} bp    DNA     linear   BCT 01-JAN-2020\n'
+          .format(locus_name, length))
+    write('DEFINITION  Synthetic record {} for benchmarking, complete\n'
+          '            sequence.\n'.format(locus_name))
+    write('ACCESSION   {}\n'.format(locus_name))
+    write('VERSION     {}.1\n'.format(locus_name))
+    write('KEYWORDS    .\n')
+    write('SOURCE      Synthetic organism\n')
+    write('  ORGANISM  Synthetic organism\n'
+          '            Bacteria; Synthetic.\n')
+    for reference in range(1, 3):
+        write('REFERENCE   {}  (bases 1 to {})\n'.format(reference, length))
+        write('  AUTHORS   Doe,J. and Roe,R.\n')
+        write('  TITLE     A synthetic publication which has a title that\n'
+              '            spans multiple lines\n')
+        write('  JOURNAL   Unpublished\n')
+    write('FEATURES             Location/Qualifiers\n')
+    write('     source          1..{}\n'.format(length))
+    write('                     /organism="Synthetic organism"\n')
+    write('                     /mol_type="genomic DNA"\n')
+    for index in range(1, feature_count):
+        __write_gene(write, locus_name, index, length, feature_count, rng)
+    write('ORIGIN      \n')
+    __write_origin(write, length, rng)
+    write('//\n')
+
+
+def __write_gene(write, locus_name, index, length, feature_count, rng):
+    """ Writes a gene and its CDS """
+    # Spread the genes evenly over the sequence
+    span = max(length // feature_count, 20)
+    start = (index - 1) * span + 1
+    end = min(start + rng.randint(span // 2, span - 1), length)
+    middle = (start + end) // 2
+    if index % 3 == 0:
+        location = 'join({}..{},{}..{})'.format(start, middle - 5,
+                                                middle + 5, end)
+    else:
+        location = '{}..{}'.format(start, end)
+    if index % 2 == 0:
+        location = 'complement({})'.format(location)
+    locus_tag = '{}_{:05d}'.format(locus_name, index)
+    write('     gene            {}..{}\n'.format(start, end))
+    write('                     /locus_tag="{}"\n'.format(locus_tag))
+    write('     CDS             {}\n'.format(location))
+    write('                     /locus_tag="{}"\n'.format(locus_tag))
+    write('                     /codon_start=1\n')
+    write('                     /product="hypothetical protein"\n')
+    write('                     /protein_id="{}.1"\n'.format(locus_tag))
+    write('                     /db_xref="GeneID:{}"\n'.format(index))
+    translation = ''.join(rng.choice(AMINO_ACIDS)
+                          for _ in range((end - start) // 3))
+    __write_wrapped(write, '/translation="{}"'.format(translation))
+
+
+def __write_wrapped(write, qualifier):
+    """ Writes a qualifier over multiple lines """
+    width = LINE_WIDTH - len(QUALIFIER_SPACING)
+    for start in range(0, len(qualifier), width):
+        write(QUALIFIER_SPACING + qualifier[start:start + width] + '\n')
+
+
+def __write_origin(write, length, rng):
+    """ Writes the ORIGIN block with a random sequence """
+    sequence = rng.randbytes(length).translate(BASES).decode('ascii')
+    for start in range(0, length, 60):
+        line = sequence[start:start + 60]
+        write('{:>9} {}\n'.format(start + 1, ' '.join(
+            line[i:i + 10] for i in range(0, len(line), 10))))
@@ -0,0 +1,92 @@
+""" Micro benchmarks which compare the per-line cost of the column
+based tokenizer with the regular expression based splitting it
+replaced.
+
+Run from the root of the repository:
+    python -m benchmarks.tokenizer_benchmark
+"""
+from re import match, split
+from timeit import repeat
+
+from src.tokenizer import (split_feature_line, split_keyword_line,
+                           split_origin_line, split_qualifier,
+                           split_qualifier_line)
+
+LOCUS_LINE = ('LOCUS       SCU49845     5028 bp    DNA             PLN'
+              '       21-JUN-1999\n')
+FEATURE_LINE = '     CDS             complement(join(3300..3459,3500..4037))\n'
+QUALIFIER_LINE = '                     /protein_id="AAA98667.1"\n'
+QUALIFIER = 'protein_id="AAA98667.1"'
+ORIGIN_LINE = ('       61 ccgacatgag acagttaggt atcgtcgaga gttacaagct '
+               'aaaacgagca gtagtcagct\n')
+
+
+def __regex_qualifier(attribute):
+    """ The character by character key search of the old parser """
+    key = ''
+    for char in attribute:
+        if char == '=':
+            break
+        key += char
+    return key, attribute[len(key) + 1:]
+
+
+def __strip_qualifier_line(line):
+    """ The qualifier detection of the old parser, through
+    'handle_keyword' """
+    line = line.strip()
+    if line.startswith('/') and line:
+        return line[1:].strip()
+
+
+def __regex_origin(line):
+    """ The regular expression based ORIGIN line parsing of the old
+    parser """
+    line = line.strip()
+    if match('^\\d+.*', line):
+        splitted = split('\\s+', line)
+        return splitted[0], ''.join(splitted[1:])
+
+
+# Pairs of (name, old implementation, new implementation)
+BENCHMARKS = [
+    ('keyword line', lambda: split('\\s+', LOCUS_LINE.strip(), 1),
+     lambda: split_keyword_line(LOCUS_LINE)),
+    ('feature line', lambda: split('\\s+', FEATURE_LINE.strip()),
+     lambda: split_feature_line(FEATURE_LINE)),
+    ('qualifier line', lambda: __strip_qualifier_line(QUALIFIER_LINE),
+     lambda: split_qualifier_line(QUALIFIER_LINE)),
+    ('qualifier', lambda: __regex_qualifier(QUALIFIER),
+     lambda: split_qualifier(QUALIFIER)),
+    ('origin line', lambda: __regex_origin(ORIGIN_LINE),
+     lambda: split_origin_line(ORIGIN_LINE)),
+]
+
+
+def run(number=100000, repetitions=5):
+    """ Runs all benchmarks.
+
+    Parameters:
+        number - int. Default: 100000
+            The amount of lines to tokenize in one measurement
+        repetitions - int. Default: 5
+            The amount of measurements, the fastest one is used
+    Returns:
+        A list of tuples with the name of the benchmark and the cost
+        per line in nanoseconds of the old and the new implementation.
+    """
+    results = []
+    for name, old, new in BENCHMARKS:
+        old_time = min(repeat(old, number=number, repeat=repetitions))
+        new_time = min(repeat(new, number=number, repeat=repetitions))
+        results.append((name, old_time / number * 1e9,
+                        new_time / number * 1e9))
+    return results
+
+
+if __name__ == '__main__':
+    print('{:<16}{:>12}{:>12}{:>10}'.format('benchmark', 'regex ns',
+                                             'column ns', 'speedup'))
+    for name, old_ns, new_ns in run():
+        print('{:<16}{:>12.0f}{:>12.0f}{:>9.1f}x'.format(
+            name, old_ns, new_ns, old_ns / new_ns))
@@ -0,0 +1,154 @@
+""" Times writing parsed records with GenbankWriter and cutting regions
+out of them, and checks that the parser reads back what was written.
+
+Run from the root of the repository:
+    python -m benchmarks.writer_benchmark --window 50000
+
+Every record of the synthetic corpora (and of the files given with
+--file) is written in full and as a region around its middle. Both are
+parsed again and compared to the original records; the exit code is 1
+when any of them differs.
+"""
+from argparse import ArgumentParser
+from os.path import basename, join
+from sys import exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from src.genbank_parser import GenbankParser
+from src.genbank_writer import GenbankWriter, slice_record
+from src.metadata_parser import FIELD_PARSERS
+
+from .synthetic import CORPORA, generate_corpus
+
+LOCUS_FIELDS = ('locus_name', 'seq_length', 'molecule_type',
+                'molecule_formation', 'division', 'modification_date_str')
+
+
+def __parse_records(filename):
+    """ Parses all records of a file to (metadata, features, sequence)
+    tuples.
+    """
+    records = []
+    with GenbankParser(filename) as parser:
+        while parser.has_record():
+            records.append((parser.parse_metadata(),
+                            parser.parse_features(), parser.parse_origin()))
+    return records
+
+
+def __write_records(filename, records):
+    """ Writes the records and returns the seconds it took """
+    begin = perf_counter()
+    with GenbankWriter(filename) as writer:
+        for record in records:
+            writer.write(*record)
+    return perf_counter() - begin
+
+
+def compare_records(expected, actual):
+    """ Compares two lists of records.
+
+    Parameters:
+        expected - list
+            The (metadata, features, sequence) tuples which have been
+            written
+        actual - list
+            The tuples which have been parsed from the written file
+    Returns:
+        A list of strings describing every difference
+    """
+    if len(expected) != len(actual):
+        return ['{} records instead of {}'.format(len(actual),
+                                                  len(expected))]
+    differences = []
+    for (metadata, features, sequence), (parsed_metadata, parsed_features,
+                                         parsed_sequence) in zip(expected,
+                                                                 actual):
+        name = metadata.locus_name
+        for field in LOCUS_FIELDS + tuple(FIELD_PARSERS):
+            value = getattr(metadata, field)
+            parsed = getattr(parsed_metadata, field)
+            if field == 'publications':
+                value = [vars(publication) for publication in value]
+                parsed = [vars(publication) for publication in parsed]
+            if value != parsed:
+                differences.append('{} {}: {!r} != {!r}'.format(
+                    name, field, value, parsed))
+        if len(features) != len(parsed_features):
+            differences.append('{}: {} features instead of {}'.format(
+                name, len(parsed_features), len(features)))
+        for feature, parsed in zip(features, parsed_features):
+            if (feature.name, str(feature.location), feature.attributes) != \
+                    (parsed.name, str(parsed.location), parsed.attributes):
+                differences.append('{}: feature {} {} differs'.format(
+                    name, feature.name, feature.location))
+        if sequence.get_sequence() != parsed_sequence.get_sequence():
+            differences.append('{}: sequence differs'.format(name))
+    return differences
+
+
+def benchmark_file(filename, directory, window):
+    """ Writes the records of a file in full and as regions, and parses
+    them again.
+
+    Parameters:
+        filename - string
+            The Genbank file
+        directory - string
+            The directory to write the output in
+        window - int
+            The amount of bases on both sides of the middle of every
+            record which are cut out as a region
+    Returns:
+        A tuple with a dictionary of the seconds spent writing and
+        slicing, and the list of differences found.
+    """
+    records = __parse_records(filename)
+    output = join(directory, 'written.gb')
+    timings = {'write': __write_records(output, records)}
+    differences = compare_records(records, __parse_records(output))
+    begin = perf_counter()
+    regions = []
+    for metadata, features, sequence in records:
+        middle = metadata.seq_length // 2
+        regions.append(slice_record(metadata, features, sequence,
+                                    middle - window, middle + window))
+    timings['slice'] = perf_counter() - begin
+    timings['write region'] = __write_records(output, regions)
+    differences += compare_records(regions, __parse_records(output))
+    return timings, differences
+
+
+def main(args=None):
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help='Synthetic corpus to run, default: all')
+    parser.add_argument('--file', action='append', default=[],
+                        help='A real Genbank file to include')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Scales the size of the synthetic corpora')
+    parser.add_argument('--window', type=int, default=50000,
+                        help='Bases on both sides of the middle of the '
+                             'region, default: 50000')
+    options = parser.parse_args(args)
+    failed = False
+    with TemporaryDirectory() as directory:
+        files = [(name, generate_corpus(directory, name, options.scale))
+                 for name in options.corpus or sorted(CORPORA)]
+        files += [(basename(filename), filename)
+                  for filename in options.file]
+        for name, filename in files:
+            timings, differences = benchmark_file(filename, directory,
+                                                  options.window)
+            print(name)
+            for step, seconds in timings.items():
+                print('  {:<16}{:>10.3f}s'.format(step, seconds))
+            for difference in differences:
+                print('  DIFFERENCE ' + difference)
+            failed = failed or bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,5 @@
+from sys import exit
+
+from .cli import main
+
+exit(main())
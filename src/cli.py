@@ -0,0 +1,482 @@
+""" The command line interface, which processes many Genbank files in
+one run:
+    python -m src convert --format fasta 'release/*.gbff' > all.fasta
+    python -m src extract --type CDS --qualifier gene=dnaA genome.gb
+    python -m src stats 'release/*.gbff'
+    python -m src index --output index.json 'release/*.gbff'
+
+The files can be given as glob patterns. Every file is a task: with
+--jobs the files are processed by a pool of processes. The output of
+every file is written in the order of the files as soon as it and the
+files before it are done, and a file which cannot be parsed is reported
+on stderr without its partial output. At the end the throughput and the
+time spent in every stage are reported on stderr.
+"""
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from json import dump, dumps
+from os import O_WRONLY, devnull, dup2, remove
+from os import open as os_open
+from os.path import exists, getsize, join
+from shutil import copyfileobj
+from sys import stderr, stdout
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from .genbank_parser import GenbankParser
+from .origin_parser import reverse_complement
+from .region_algebra import location_parts
+
+FORMATS = ('fasta', 'gff3', 'json')
+STAGES = ('metadata', 'features', 'origin', 'output')
+FASTA_LINE_LENGTH = 60
+GFF_SOURCE = 'GenBank'
+# The characters which are escaped in the columns of GFF3
+GFF_ESCAPES = {ord(char): '%{:02X}'.format(ord(char))
+               for char in '\t\n\r%;=&,'}
+# The qualifiers which name a feature in the FASTA header of 'extract',
+# in order of preference
+IDENTIFIER_QUALIFIERS = ('locus_tag', 'gene', 'protein_id')
+
+
+class RunStatistics(object):
+    """ The throughput of a run over all files. The time of the stages
+    is summed over all processes, so with multiple jobs it can exceed
+    the time of the run.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.records = 0
+        self.bytes = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.begin = perf_counter()
+
+    def add(self, result):
+        """ Adds the result of a file, as returned by 'process_file' """
+        self.files += 1
+        self.records += result['records']
+        self.bytes += result['bytes']
+        for stage, seconds in result['seconds'].items():
+            self.seconds[stage] += seconds
+
+    def __str__(self):
+        elapsed = max(perf_counter() - self.begin, 1e-9)
+        lines = ['{} files, {} records, {:.1f}MB in {:.2f}s: {:.1f} '
+                 'records/s, {:.1f}MB/s'.format(
+                     self.files, self.records, self.bytes / 1e6, elapsed,
+                     self.records / elapsed, self.bytes / 1e6 / elapsed)]
+        lines += ['  {:<10}{:>10.3f}s'.format(stage, seconds)
+                  for stage, seconds in self.seconds.items()]
+        return '\n'.join(lines)
+
+
+def expand_sources(patterns):
+    """ Expands glob patterns to the files they match.
+
+    Parameters:
+        patterns - list
+            Filenames and glob patterns
+    Returns:
+        A list of filenames in the order of the patterns, of which the
+        matches are sorted. Files matched twice are only included once.
+    Raises:
+        ValueError when a pattern does not match any file
+    """
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob(pattern)) or ([pattern] if exists(pattern)
+                                            else [])
+        if not matches:
+            raise ValueError('No files match ' + pattern)
+        filenames += [filename for filename in matches
+                      if filename not in filenames]
+    return filenames
+
+
+def process_file(command, filename, settings, output):
+    """ Runs a command over all records of a file.
+
+    Parameters:
+        command - string
+            One of 'convert', 'extract', 'stats' and 'index'
+        filename - string
+            The Genbank file
+        settings - dict
+            The options of the command: 'format', 'types' and
+            'qualifiers'
+        output - text file object
+            The file to write the output of the records to
+    Returns:
+        A dictionary with the amount of 'records', the 'bytes' of the
+        file, the 'seconds' spent in every stage and the 'summary' of
+        the file for the 'stats' and 'index' commands.
+    """
+    handle, features_needed, sequence_needed = __handler(command, settings)
+    seconds = dict.fromkeys(STAGES, 0.0)
+    summary = {'records': 0, 'bases': 0, 'gc': 0, 'features': Counter(),
+               'entries': []}
+    records = 0
+    with GenbankParser(filename, binary=True) as parser:
+        while parser.has_record():
+            start = parser.filehandle.tell()
+            begin = perf_counter()
+            metadata = parser.parse_metadata()
+            parsed = perf_counter()
+            seconds['metadata'] += parsed - begin
+            features = parser.parse_features(features_needed)
+            begin = perf_counter()
+            seconds['features'] += begin - parsed
+            sequence = parser.parse_origin(sequence_needed)
+            parsed = perf_counter()
+            seconds['origin'] += parsed - begin
+            record = (metadata, features if features_needed else None,
+                      sequence if sequence_needed else None)
+            handle(record, output, settings, summary)
+            if command == 'index':
+                summary['entries'].append(__index_entry(
+                    filename, metadata, start, parser.filehandle.tell()))
+            seconds['output'] += perf_counter() - parsed
+            records += 1
+    return {'records': records, 'bytes': getsize(filename),
+            'seconds': seconds, 'summary': summary}
+
+
+def _process_to_file(command, filename, settings, path):
+    """ Runs 'process_file' in a process of the pool, writing the output
+    to a temporary file.
+    """
+    with open(path, 'w', encoding='utf-8') as output:
+        return process_file(command, filename, settings, output)
+
+
+def __handler(command, settings):
+    """ Selects the function which handles the records of a command.
+
+    Returns:
+        A tuple with the function and whether the records need their
+        features and sequence.
+    """
+    file_format = settings.get('format')
+    if command == 'convert':
+        return (CONVERTERS[file_format], file_format != 'fasta',
+                file_format != 'gff3')
+    if command == 'extract':
+        return __extract, True, file_format == 'fasta'
+    if command == 'stats':
+        return __count, True, True
+    return __skip, False, False
+
+
+def seqid(metadata):
+    """ Returns the identifier of a record: its versioned accession, its
+    accession or its locus name.
+    """
+    if metadata.version:
+        return metadata.version[0]
+    if metadata.accession:
+        return metadata.accession.split()[0]
+    return metadata.locus_name
+
+
+def __write_fasta_entry(output, header, bases):
+    output.write('>' + header + '\n')
+    output.write(''.join(bases[start:start + FASTA_LINE_LENGTH] + '\n'
+                         for start in range(0, len(bases),
+                                            FASTA_LINE_LENGTH)))
+
+
+def __convert_fasta(record, output, settings, summary):
+    metadata, _, sequence = record
+    header = seqid(metadata)
+    if metadata.description:
+        header += ' ' + metadata.description
+    __write_fasta_entry(output, header, sequence.get_sequence())
+
+
+def __convert_gff3(record, output, settings, summary):
+    metadata, features, _ = record
+    name = seqid(metadata).translate(GFF_ESCAPES)
+    output.write('##sequence-region {} 1 {}\n'.format(name,
+                                                      metadata.seq_length))
+    for index, feature in enumerate(features):
+        output.write(''.join(format_gff3(name, feature, index)))
+
+
+def __convert_json(record, output, settings, summary):
+    metadata, features, sequence = record
+    output.write(dumps({
+        'id': seqid(metadata), 'locus_name': metadata.locus_name,
+        'length': metadata.seq_length,
+        'molecule_type': metadata.molecule_type,
+        'topology': metadata.molecule_formation,
+        'division': metadata.division, 'description': metadata.description,
+        'source': metadata.source,
+        'features': [__feature_json(feature) for feature in features],
+        'sequence': sequence.get_sequence()}) + '\n')
+
+
+# The functions which write a record in every format
+CONVERTERS = {
+    'fasta': __convert_fasta,
+    'gff3': __convert_gff3,
+    'json': __convert_json,
+}
+
+
+def __feature_json(feature):
+    return {'type': feature.name, 'location': str(feature.location),
+            'qualifiers': feature.attributes}
+
+
+def format_gff3(name, feature, index):
+    """ Formats a feature as GFF3 lines, one for every part of its
+    location. The parts of a joined location share an ID. Parts on
+    other records are left out.
+
+    Parameters:
+        name - string
+            The escaped identifier of the record
+        feature - Feature object
+            The feature to format
+        index - int
+            The position of the feature in the record, used for the ID
+    Returns:
+        A list of lines, including their newlines
+    """
+    parts = location_parts(feature.location)
+    attributes = ['{}={}'.format(key.translate(GFF_ESCAPES),
+                                 value.translate(GFF_ESCAPES) or 'true')
+                  for key, value in feature.attributes.items()]
+    if len(parts) > 1:
+        attributes.insert(0, 'ID={}.{}'.format(name, index + 1))
+    attributes = ';'.join(attributes) or '.'
+    # The phase of the first part follows from /codon_start, the parts
+    # are in the order of translation
+    phase = None
+    if feature.name == 'CDS':
+        phase = int(feature.attributes.get('codon_start', 1)) - 1
+    lines = []
+    for first, last, strand in parts:
+        lines.append('\t'.join((
+            name, GFF_SOURCE, feature.name.translate(GFF_ESCAPES),
+            str(first), str(last), '.', '-' if strand == -1 else '+',
+            '.' if phase is None else str(phase), attributes)) + '\n')
+        if phase is not None:
+            phase = (phase - (last - first + 1)) % 3
+    return lines
+
+
+def __matches(feature, settings):
+    """ Checks a feature against the types and qualifiers to extract """
+    if settings['types'] and feature.name not in settings['types']:
+        return False
+    attributes = feature.attributes
+    for key, value in settings['qualifiers']:
+        if key not in attributes or (value is not None and
+                                     attributes[key] != value):
+            return False
+    return True
+
+
+def __extract(record, output, settings, summary):
+    metadata, features, sequence = record
+    name = seqid(metadata)
+    for index, feature in enumerate(features):
+        if not __matches(feature, settings):
+            continue
+        file_format = settings['format']
+        if file_format == 'fasta':
+            identifier = next((feature.attributes[qualifier]
+                               for qualifier in IDENTIFIER_QUALIFIERS
+                               if qualifier in feature.attributes),
+                              feature.name)
+            __write_fasta_entry(output, '{} {} {}:{}'.format(
+                identifier, feature.name, name, feature.location),
+                feature_bases(feature, sequence))
+        elif file_format == 'gff3':
+            output.write(''.join(format_gff3(name.translate(GFF_ESCAPES),
+                                             feature, index)))
+        else:
+            entry = __feature_json(feature)
+            entry['id'] = name
+            output.write(dumps(entry) + '\n')
+
+
+def feature_bases(feature, sequence):
+    """ Returns the bases of a feature in the order of its annotation,
+    of which the parts on the reverse strand are complemented. Parts on
+    other records are left out.
+    """
+    bases = sequence.get_sequence()
+    parts = []
+    for first, last, strand in location_parts(feature.location):
+        part = bases[first - 1:last]
+        parts.append(reverse_complement(part) if strand == -1 else part)
+    return ''.join(parts)
+
+
+def __count(record, output, settings, summary):
+    metadata, features, sequence = record
+    bases = sequence.get_sequence()
+    summary['records'] += 1
+    summary['bases'] += len(bases)
+    summary['gc'] += (bases.count('G') + bases.count('C') +
+                      bases.count('g') + bases.count('c'))
+    summary['features'].update(feature.name for feature in features)
+
+
+def __skip(record, output, settings, summary):
+    pass
+
+
+def __index_entry(filename, metadata, start, end):
+    return {'id': seqid(metadata), 'locus_name': metadata.locus_name,
+            'length': metadata.seq_length, 'file': filename,
+            'start': start, 'end': end}
+
+
+def __write_stats(output, summaries):
+    """ Writes the counts of every file and their totals """
+    output.write('{:<40}{:>10}{:>14}{:>10}{:>8}\n'.format(
+        'file', 'records', 'bases', 'features', 'GC'))
+    total = {'records': 0, 'bases': 0, 'gc': 0, 'features': Counter()}
+    for filename, summary in summaries:
+        __write_stats_line(output, filename, summary)
+        for key in total:
+            total[key] += summary[key]
+    __write_stats_line(output, 'total', total)
+    output.write('\n'.join('{:<20}{:>10}'.format(name, count)
+                           for name, count in
+                           total['features'].most_common()) + '\n')
+
+
+def __write_stats_line(output, name, summary):
+    gc = summary['gc'] / summary['bases'] if summary['bases'] else 0
+    output.write('{:<40}{:>10}{:>14}{:>10}{:>8.1%}\n'.format(
+        name, summary['records'], summary['bases'],
+        sum(summary['features'].values()), gc))
+
+
+def __run(command, filenames, settings, jobs, output):
+    """ Processes the files, in a pool of processes when jobs is more
+    than 1. The output of every file is written to a temporary file
+    first, so the output of a file which fails is left out in both
+    modes.
+
+    Returns:
+        A generator which yields the filename with the result of
+        'process_file', or with the exception raised, in the order of
+        the files.
+    """
+    with TemporaryDirectory() as directory:
+        paths = [join(directory, '{}.out'.format(index))
+                 for index in range(len(filenames))]
+        executor = ProcessPoolExecutor(jobs) if jobs > 1 else None
+        try:
+            if executor is not None:
+                tasks = [executor.submit(_process_to_file, command,
+                                         filename, settings, path)
+                         for filename, path in zip(filenames, paths)]
+            for index, (filename, path) in enumerate(zip(filenames,
+                                                         paths)):
+                try:
+                    if executor is None:
+                        result = _process_to_file(command, filename,
+                                                  settings, path)
+                    else:
+                        result = tasks[index].result()
+                except Exception as error:
+                    # Any error of a malformed file only fails that file
+                    yield filename, error
+                    continue
+                with open(path, 'r', encoding='utf-8') as filehandle:
+                    copyfileobj(filehandle, output)
+                remove(path)
+                yield filename, result
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+
+def __parse_qualifier(argument):
+    key, _, value = argument.partition('=')
+    return key, value if _ else None
+
+
+def main(args=None):
+    parser = ArgumentParser(prog='python -m src',
+                            description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help='Convert the records to '
+                                                  'FASTA, GFF3 or JSON lines')
+    convert.add_argument('--format', choices=FORMATS, default='fasta',
+                         help='default: fasta')
+    extract = commands.add_parser('extract', help='Extract the features '
+                                                  'by type or qualifier')
+    extract.add_argument('--format', choices=FORMATS, default='fasta',
+                         help='default: fasta, the bases of the features')
+    extract.add_argument('--type', action='append', default=[],
+                         help='A feature type to extract, such as CDS')
+    extract.add_argument('--qualifier', action='append', default=[],
+                         type=__parse_qualifier, metavar='KEY[=VALUE]',
+                         help='A qualifier the features have, with the '
+                              'value when given')
+    commands.add_parser('stats', help='Count the records, bases and '
+                                      'features of every file')
+    commands.add_parser('index', help='Write a JSON index of where the '
+                                      'records are in the files')
+    for command in commands.choices.values():
+        command.add_argument('files', nargs='+',
+                             help='Genbank files or glob patterns')
+        command.add_argument('--output', help='File to write to, '
+                                              'default: stdout')
+        command.add_argument('--jobs', type=int, default=1,
+                             help='Processes to use, default: 1')
+        command.add_argument('--quiet', action='store_true',
+                             help='Do not report the throughput')
+    options = parser.parse_args(args)
+    try:
+        filenames = expand_sources(options.files)
+    except ValueError as error:
+        parser.error(str(error))
+    settings = {'format': getattr(options, 'format', None),
+                'types': frozenset(getattr(options, 'type', ())),
+                'qualifiers': getattr(options, 'qualifier', [])}
+    output = stdout
+    if options.output:
+        output = open(options.output, 'w', encoding='utf-8')
+    statistics = RunStatistics()
+    failed = False
+    summaries = []
+    try:
+        if settings['format'] == 'gff3':
+            output.write('##gff-version 3\n')
+        for filename, result in __run(options.command, filenames, settings,
+                                      options.jobs, output):
+            if isinstance(result, Exception):
+                stderr.write('error: {}: {}: {}\n'.format(
+                    filename, type(result).__name__, result))
+                failed = True
+                continue
+            statistics.add(result)
+            summaries.append((filename, result['summary']))
+        if options.command == 'stats':
+            __write_stats(output, summaries)
+        elif options.command == 'index':
+            dump({'records': [entry for _, summary in summaries
+                              for entry in summary['entries']]},
+                 output, indent=1)
+            output.write('\n')
+    except BrokenPipeError:
+        # The reader of the output (such as head) has stopped
+        dup2(os_open(devnull, O_WRONLY), stdout.fileno())
+        return 1
+    finally:
+        if output is not stdout:
+            output.close()
+    if not options.quiet:
+        stderr.write(str(statistics) + '\n')
+    return 1 if failed else 0
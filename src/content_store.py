@@ -0,0 +1,237 @@
+""" A content-addressed store which keeps every distinct sequence once,
+addressed by the digest of its bases.
+
+Many records share their sequence: plasmids, repeated assemblies and
+successive versions of a record which only differ in their annotation.
+The ORIGIN block of a record is hashed while it is read, so a sequence
+which is in the store already is never built. Records refer to their
+sequence by its digest, and every lookup of a digest returns the same
+Sequence object while it is cached.
+
+The store can be kept in a directory, which deduplicates sequences
+across files and releases. Every sequence is stored as a file with its
+upper cased bases, named by its digest:
+    directory/ab/cdef...
+"""
+from collections import OrderedDict
+from os import listdir, makedirs, remove, replace
+from os.path import exists, getsize, isdir, join
+from tempfile import NamedTemporaryFile
+
+from .genbank_parser import GenbankParser
+from .origin_parser import Sequence, sequence_digest
+
+DEFAULT_MAX_BASES = 100000000
+PREFIX_LENGTH = 2  # The length of the digest prefix of the directories
+
+
+class ContentStore(object):
+    """ Stores sequences by the digest of their bases. Without a
+    directory all sequences are kept in memory, otherwise only the
+    sequences which have been used last are cached.
+    """
+
+    def __init__(self, directory=None, max_bases=DEFAULT_MAX_BASES):
+        """ Creates a store.
+
+        Parameters:
+            directory - string. Default: None
+                The directory to keep the sequences in, which is created
+                when it does not exist. The sequences it already holds
+                are part of the store.
+            max_bases - int. Default: 100000000
+                The maximum amount of bases of the cached sequences of a
+                store with a directory. The sequence which has been used
+                last is always kept.
+        """
+        self.directory = directory
+        self.max_bases = max_bases
+        self.digests = {}  # digest -> length of the sequence
+        self.cache = OrderedDict()  # digest -> Sequence
+        self.cached_bases = 0
+        # The amount of sequences and bases which have been added,
+        # including the duplicates
+        self.added = 0
+        self.added_bases = 0
+        if directory is not None:
+            makedirs(directory, exist_ok=True)
+            self.__scan_directory()
+
+    def __scan_directory(self):
+        """ Registers the sequences which are in the directory """
+        for prefix in listdir(self.directory):
+            path = join(self.directory, prefix)
+            if len(prefix) != PREFIX_LENGTH or not isdir(path):
+                continue
+            for name in listdir(path):
+                self.digests[prefix + name] = getsize(join(path, name))
+
+    def __contains__(self, digest):
+        return digest in self.digests
+
+    def __len__(self):
+        return len(self.digests)
+
+    def stored_bases(self):
+        """ Returns the amount of bases of the distinct sequences """
+        return sum(self.digests.values())
+
+    def add(self, sequence):
+        """ Adds a parsed sequence.
+
+        Parameters:
+            sequence - Sequence object
+                The upper cased sequence, as parsed by
+                GenbankParser.parse_origin
+        Returns:
+            The digest of the sequence
+        """
+        bases = sequence.get_sequence()
+        digest = sequence_digest(bases)
+        self.__count(len(bases))
+        if digest not in self.digests:
+            if self.directory is not None:
+                with self.__new_file(digest) as filehandle:
+                    filehandle.write(bases.encode('ascii'))
+            self.digests[digest] = len(bases)
+            self.__cache(digest, sequence)
+        return digest
+
+    def add_origin(self, parser):
+        """ Reads the ORIGIN block of a record, which is the stage which
+        follows 'parse_features'. The block is read once, and the bases
+        are kept while hashing: in memory without a directory, or in a
+        temporary file with a directory. The sequence is only built or
+        stored when its digest is not in the store yet.
+
+        Parameters:
+            parser - GenbankParser object
+                The parser, of which the file pointer is at the ORIGIN
+                line
+        Returns:
+            The digest of the sequence
+        """
+        if self.directory is None:
+            # The blocks are kept while hashing and dropped when the
+            # digest turns out to be in the store already
+            blocks = []
+            digest, length = parser.hash_origin(blocks.append)
+            if digest not in self.digests:
+                self.__cache(digest,
+                             Sequence(b''.join(blocks).decode('ascii')))
+        else:
+            # The bases are written while hashing, as the digest is only
+            # known at the end
+            filehandle = self.__new_file()
+            try:
+                with filehandle:
+                    digest, length = parser.hash_origin(filehandle.write)
+            except BaseException:
+                remove(filehandle.name)
+                raise
+            if digest in self.digests:
+                remove(filehandle.name)
+            else:
+                replace(filehandle.name, self.__path(digest))
+        self.__count(length)
+        self.digests[digest] = length
+        return digest
+
+    def add_file(self, filename, binary=True):
+        """ Adds the sequences of all records of a Genbank file.
+
+        Parameters:
+            filename - string
+                The Genbank file
+            binary - boolean. Default: True
+                Whether to parse the file in binary mode
+        Returns:
+            A list with a tuple of the Metadata object and the digest of
+            the sequence of every record
+        """
+        records = []
+        with GenbankParser(filename, binary=binary) as parser:
+            while parser.has_record():
+                metadata = parser.parse_metadata()
+                parser.parse_features(False)
+                records.append((metadata, self.add_origin(parser)))
+        return records
+
+    def get(self, digest):
+        """ Retrieves a sequence by its digest.
+
+        Parameters:
+            digest - string
+                The digest of the sequence
+        Returns:
+            A Sequence object, which is the same object for every call
+            while it is cached
+        Raises:
+            KeyError when the digest is not in the store
+        """
+        sequence = self.cache.get(digest)
+        if sequence is not None:
+            self.cache.move_to_end(digest)
+            return sequence
+        if digest not in self.digests or self.directory is None:
+            raise KeyError(digest)
+        with open(self.__path(digest), 'rb') as filehandle:
+            sequence = Sequence(filehandle.read().decode('ascii'))
+        self.__cache(digest, sequence)
+        return sequence
+
+    def __count(self, length):
+        """ Counts an added sequence """
+        self.added += 1
+        self.added_bases += length
+
+    def __cache(self, digest, sequence):
+        """ Caches a sequence, evicting the sequences which have been
+        used least recently when the store has a directory.
+        """
+        self.cache[digest] = sequence
+        self.cached_bases += sequence.length()
+        if self.directory is None:
+            return
+        while self.cached_bases > self.max_bases and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bases -= evicted.length()
+
+    def __path(self, digest):
+        """ Returns the path of the file of a sequence, creating its
+        directory.
+        """
+        directory = join(self.directory, digest[:PREFIX_LENGTH])
+        if not exists(directory):
+            makedirs(directory, exist_ok=True)
+        return join(directory, digest[PREFIX_LENGTH:])
+
+    def __new_file(self, digest=None):
+        """ Opens a temporary file in the directory, which is moved to
+        the path of the digest when one is given.
+        """
+        filehandle = NamedTemporaryFile('wb', dir=self.directory,
+                                        prefix='.', delete=False)
+        if digest is None:
+            return filehandle
+        return _MovedFile(filehandle, self.__path(digest))
+
+
+class _MovedFile(object):
+    """ A temporary file which is moved to its path once it has been
+    completely written, so the store never holds a partial sequence.
+    """
+
+    def __init__(self, filehandle, path):
+        self.filehandle = filehandle
+        self.path = path
+
+    def __enter__(self):
+        return self.filehandle
+
+    def __exit__(self, error_type, *args):
+        self.filehandle.close()
+        if error_type is None:
+            replace(self.filehandle.name, self.path)
+        else:
+            remove(self.filehandle.name)
@@ -0,0 +1,322 @@
+""" Maps positions between the genome and the transcripts or CDS of a
+feature table, in both directions and in batches.
+
+For every transcript the parts of its location are stored in the order
+of the transcript, with the cumulative length of the parts in front of
+them. A batch of genome positions is sorted once and swept along the
+parts of all transcripts sorted by start, so mapping n positions onto
+m parts takes O((n + m) log(n + m)) time instead of walking the ranges
+of every location for every position.
+
+Coordinates are 1 based. The transcript coordinate of a base is its
+position in the spliced transcript, read from its 5' end. For a CDS
+the codon and the phase (0, 1 or 2) within the codon are calculated
+from the /codon_start qualifier, so CDS which are partial at their 5'
+end are read in the right frame.
+"""
+from array import array
+from bisect import bisect_right
+from heapq import heappop, heappush
+
+from .location_parser import ComplementLocation, JoinedLocation, \
+    RemoteLocation
+
+TRANSCRIPT_NAMES = ('CDS', 'mRNA')
+CODING_NAMES = frozenset(['CDS'])
+COLUMN_TYPE = 'q'  # The array type of the mapped columns
+NO_CODON = -1  # The codon and phase of bases which are not coding
+
+
+class TranscriptMap(object):
+    """ The parts of a transcript in the order of the transcript.
+
+    Attributes:
+        feature - Feature object
+            The transcript or CDS
+        parts - list
+            A (start, end, strand) tuple for every part, in transcript
+            order. Parts on another record have a start and end of None.
+        offsets - array
+            The length of the transcript in front of every part, with
+            the length of the whole transcript at the end.
+        five_prime_partial - boolean
+            Whether the transcript continues past its 5' end, marked by
+            '<' on the forward strand or '>' on the reverse strand.
+        three_prime_partial - boolean
+            Whether the transcript continues past its 3' end
+        codon_start - int
+            The transcript coordinate of the first base of the first
+            codon, None when the feature is not coding.
+    """
+
+    def __init__(self, feature):
+        """ Creates the map of a feature.
+
+        Parameters:
+            feature - Feature object
+                A transcript or CDS
+        """
+        self.feature = feature
+        parts = _transcript_parts(feature.location)
+        self.parts = [part[:3] for part in parts]
+        self.offsets = array(COLUMN_TYPE, [0])
+        for part in parts:
+            self.offsets.append(self.offsets[-1] + part[3])
+        self.five_prime_partial = bool(parts) and parts[0][4]
+        self.three_prime_partial = bool(parts) and parts[-1][5]
+        self.codon_start = None
+        if feature.name in CODING_NAMES:
+            self.codon_start = int(feature.get_attribute('codon_start')
+                                   if feature.has_attribute('codon_start')
+                                   else 1)
+
+    def length(self):
+        """ Returns the length of the spliced transcript """
+        return self.offsets[-1]
+
+    def to_transcript(self, position):
+        """ Maps a genome position to the transcript.
+
+        Parameters:
+            position - int
+                The genome position
+        Returns:
+            The transcript coordinate, or None when the position is not
+            in any of the parts.
+        """
+        for number, (start, end, strand) in enumerate(self.parts):
+            if start is not None and start <= position <= end:
+                return _transcript_coordinate(self.offsets[number], start,
+                                              end, strand, position)
+
+    def to_genome(self, coordinate):
+        """ Maps a transcript coordinate to the genome.
+
+        Parameters:
+            coordinate - int
+                The transcript coordinate
+        Returns:
+            The genome position, or None when the coordinate is outside
+            of the transcript or on another record.
+        """
+        if not 1 <= coordinate <= self.offsets[-1]:
+            return None
+        number = bisect_right(self.offsets, coordinate - 1) - 1
+        start, end, strand = self.parts[number]
+        if start is None:
+            return None
+        into = coordinate - 1 - self.offsets[number]
+        return start + into if strand != -1 else end - into
+
+    def to_codon(self, coordinate):
+        """ Calculates the codon of a transcript coordinate.
+
+        Parameters:
+            coordinate - int
+                The transcript coordinate
+        Returns:
+            A tuple with the 1 based codon and the phase within the
+            codon, or None when the feature is not coding or the
+            coordinate is in front of the first codon.
+        """
+        if self.codon_start is None or coordinate < self.codon_start:
+            return None
+        codon, phase = divmod(coordinate - self.codon_start, 3)
+        return codon + 1, phase
+
+    def codon_to_genome(self, codon, phase=0):
+        """ Maps a base of a codon to the genome.
+
+        Parameters:
+            codon - int
+                The 1 based codon
+            phase - int. Default: 0
+                The base within the codon
+        Returns:
+            The genome position, or None when the codon is outside of
+            the transcript or the feature is not coding.
+        """
+        if self.codon_start is None:
+            return None
+        return self.to_genome(self.codon_start + (codon - 1) * 3 + phase)
+
+
+class MappedPositions(object):
+    """ The result of mapping a batch of genome positions, as columns
+    with one row for every combination of a position and a transcript
+    which contains it. The rows are ordered by genome position.
+
+    Attributes:
+        position_indexes - array
+            The index of the position in the batch
+        map_indexes - array
+            The index of the TranscriptMap in CoordinateMapper.maps
+        coordinates - array
+            The transcript coordinate
+        codons - array
+            The 1 based codon, -1 when not coding
+        phases - array
+            The phase within the codon, -1 when not coding
+    """
+
+    def __init__(self):
+        self.position_indexes = array(COLUMN_TYPE)
+        self.map_indexes = array(COLUMN_TYPE)
+        self.coordinates = array(COLUMN_TYPE)
+        self.codons = array(COLUMN_TYPE)
+        self.phases = array(COLUMN_TYPE)
+
+    def __len__(self):
+        return len(self.position_indexes)
+
+    def rows(self):
+        """ Returns a generator of (position index, map index,
+        coordinate, codon, phase) tuples.
+        """
+        return zip(self.position_indexes, self.map_indexes,
+                   self.coordinates, self.codons, self.phases)
+
+
+class CoordinateMapper(object):
+    """ Maps batches of positions between the genome and all transcripts
+    of a feature table.
+    """
+
+    def __init__(self, features, names=TRANSCRIPT_NAMES):
+        """ Precomputes the maps of the transcripts.
+
+        Parameters:
+            features - list
+                A list of Feature objects
+            names - iterable. Default: ('CDS', 'mRNA')
+                The feature keys of the transcripts
+        """
+        self.maps = [TranscriptMap(feature) for feature in features
+                     if feature.name in names]
+        # The local parts of all maps sorted by start, for the sweep. The
+        # transcript coordinate of a position in a part is
+        # base + sign * position.
+        located = []
+        for map_index, transcript in enumerate(self.maps):
+            for number, (start, end, strand) in enumerate(transcript.parts):
+                if start is None:
+                    continue
+                offset = transcript.offsets[number]
+                if strand == -1:
+                    located.append((start, end, map_index, offset + end + 1,
+                                    -1))
+                else:
+                    located.append((start, end, map_index,
+                                    offset - start + 1, 1))
+        located.sort()
+        self.part_starts = array(COLUMN_TYPE, [part[0] for part in located])
+        self.part_ends = array(COLUMN_TYPE, [part[1] for part in located])
+        self.part_maps = array(COLUMN_TYPE, [part[2] for part in located])
+        self.part_bases = array(COLUMN_TYPE, [part[3] for part in located])
+        self.part_signs = array(COLUMN_TYPE, [part[4] for part in located])
+        # The codon start of every map, 0 for maps which are not coding
+        self.codon_starts = array(COLUMN_TYPE, [transcript.codon_start or 0
+                                                for transcript in self.maps])
+
+    def to_transcripts(self, positions):
+        """ Maps genome positions to all transcripts which contain them.
+
+        Parameters:
+            positions - iterable
+                Genome positions as ints, in any order
+        Returns:
+            A MappedPositions object
+        """
+        positions = array(COLUMN_TYPE, positions)
+        mapped = MappedPositions()
+        # The columns are filled in the inner loop, so look them up once
+        add_index = mapped.position_indexes.append
+        add_map = mapped.map_indexes.append
+        add_coordinate = mapped.coordinates.append
+        add_codon = mapped.codons.append
+        add_phase = mapped.phases.append
+        starts, ends, maps = self.part_starts, self.part_ends, self.part_maps
+        bases, signs = self.part_bases, self.part_signs
+        codon_starts = self.codon_starts
+        active = []  # A heap of (end, part) of the parts started
+        part = 0
+        for index in sorted(range(len(positions)),
+                            key=positions.__getitem__):
+            position = positions[index]
+            # Start the parts which start at or before the position
+            while part < len(starts) and starts[part] <= position:
+                heappush(active, (ends[part], part))
+                part += 1
+            # Drop the parts which end before the position, the others
+            # all contain the position
+            while active and active[0][0] < position:
+                heappop(active)
+            for _, contained in active:
+                map_index = maps[contained]
+                coordinate = bases[contained] + signs[contained] * position
+                codon_start = codon_starts[map_index]
+                add_index(index)
+                add_map(map_index)
+                add_coordinate(coordinate)
+                if codon_start and coordinate >= codon_start:
+                    codon, phase = divmod(coordinate - codon_start, 3)
+                    add_codon(codon + 1)
+                    add_phase(phase)
+                else:
+                    add_codon(NO_CODON)
+                    add_phase(NO_CODON)
+        return mapped
+
+    def to_genome(self, map_indexes, coordinates):
+        """ Maps transcript coordinates to the genome.
+
+        Parameters:
+            map_indexes - iterable
+                The index of the TranscriptMap of every coordinate
+            coordinates - iterable
+                Transcript coordinates as ints
+        Returns:
+            An array with the genome positions, -1 for coordinates which
+            are outside of their transcript or on another record.
+        """
+        positions = array(COLUMN_TYPE)
+        for map_index, coordinate in zip(map_indexes, coordinates):
+            position = self.maps[map_index].to_genome(coordinate)
+            positions.append(-1 if position is None else position)
+        return positions
+
+
+def _transcript_coordinate(offset, start, end, strand, position):
+    """ Calculates the transcript coordinate of a position in a part """
+    if strand == -1:
+        return offset + end - position + 1
+    return offset + position - start + 1
+
+
+def _transcript_parts(location, strand=1):
+    """ Flattens a location to its parts in transcript order.
+
+    Returns:
+        A list of (start, end, strand, length, five prime partial, three
+        prime partial) tuples. The start and end of a part on another
+        record are None.
+    """
+    if isinstance(location, ComplementLocation):
+        parts = _transcript_parts(location.locations[0], -strand)
+        parts.reverse()
+        return parts
+    if isinstance(location, JoinedLocation):
+        parts = []
+        for part in location.locations:
+            parts += _transcript_parts(part, strand)
+        return parts
+    first, last = location.get_range()
+    if isinstance(location, RemoteLocation):
+        # Only the length of the part counts for the transcript
+        return [(None, None, strand, last - first + 1, False, False)]
+    lesser = getattr(location, 'can_be_lesser', False)
+    greater = getattr(location, 'can_be_greater', False)
+    if strand == -1:
+        # The 5' end of a part on the reverse strand is its right end
+        lesser, greater = greater, lesser
+    return [(first, last, strand, last - first + 1, lesser, greater)]
@@ -1,37 +1,68 @@
-from re import split
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from re import MULTILINE, compile
+from sys import intern
 
 from .location_parser import parse_location
+from .qualifier_index import QualifierIndex
+from .readers import DEFAULT_ENCODING, read_span
+from .tokenizer import (is_feature_start, split_feature_line,
+                        split_qualifier, split_qualifier_line)
 
-FEATURE_START_SPACE = ' ' * 5
+FEATURE_START = compile(b'^ {5}[^ \r\n]', MULTILINE)
+# The lines which can follow the FEATURES block
+FEATURES_END_MARKERS = (b'ORIGIN', b'CONTIG', b'BASE COUNT', b'//')
+# The amount of chunks per worker, more chunks balance the work better
+CHUNKS_PER_WORKER = 4
+# Qualifiers which hold a sequence, the lines of these are joined
+# without a delimiter
+SEQUENCE_QUALIFIERS = frozenset(['translation', 'rpt_unit_seq'])
 
 
-def parse_features(gbp):
+def parse_features(gbp, index=None, gene_models=None):
     """ The main method which parses the FEATURES to a list with
     Feature objects.
     Parameters:
         gbp - GenbankParser object
             The parser which holds the file pointer of the genbank
             file.
+        index - QualifierIndex object. Default: None
+            An index which is filled with the qualifiers of the
+            features while they are parsed.
+        gene_models - GeneModelBuilder object. Default: None
+            A builder to which every parsed feature is added.
     Returns:
         A list of Feature objects
     """
     # The FEATURES line must be the next line
     gbp.handle_keyword('FEATURES', do_split=False, remove_keyword=False)
+    return __parse_entries(gbp, index, gene_models)
+
+
+def __parse_entries(gbp, index, gene_models):
+    """ Parses the features which follow, until a line is hit which
+    does not start a feature.
+    """
     features = []  # The list to fill
     # The old position before the line in case there is no feature
     # available anymore
     old_position = gbp.filehandle.tell()
     line = gbp.read_valid_line()  # The next line
-    len_spaces = len(FEATURE_START_SPACE)
     # Keep checking whether the file has the required spaces to be a
     # Feature
-    while ((line.startswith(FEATURE_START_SPACE) and
-            not line[len_spaces:len_spaces + 1].isspace())):
+    while is_feature_start(line):
         # Get the name and location string
-        name, location = split('\s+', line.strip())
+        name, location = split_feature_line(line)
         # Start parsing the attributes of this Feature
-        # Create a Feature object and append it to the list
-        features.append(Feature(name, location, __parse_attributes(gbp)))
+        # Create a Feature object and append it to the list, the
+        # values of the attributes are decoded later in binary mode
+        features.append(Feature(intern(gbp.decode(name)),
+                                gbp.decode(location),
+                                __parse_attributes(gbp, len(features),
+                                                   index),
+                                gbp.encoding if gbp.binary else None))
+        if gene_models is not None:
+            gene_models.add(features[-1])
         # Read the next line
         old_position = gbp.filehandle.tell()
         line = gbp.read_valid_line()
@@ -41,46 +72,172 @@ def parse_features(gbp):
     return features
 
 
-def __parse_attributes(gbp):
+def parse_features_parallel(gbp, workers, index=None, gene_models=None):
+    """ Parses the FEATURES to a list with Feature objects using
+    multiple processes, for records with very many features.
+
+    The block is split into chunks which start at a feature, the chunks
+    are parsed by a process pool and the results are merged in the
+    original order.
+
+    Parameters:
+        gbp - GenbankParser object
+            The parser which holds the file pointer of the genbank
+            file.
+        workers - int
+            The amount of worker processes
+        index - QualifierIndex object. Default: None
+            An index which is filled with the qualifiers of the
+            features.
+        gene_models - GeneModelBuilder object. Default: None
+            A builder to which every parsed feature is added.
+    Returns:
+        A list of Feature objects
+    Raises:
+        ValueError when the block contains a line which is no part of
+        a feature.
+    """
+    gbp.handle_keyword('FEATURES', do_split=False, remove_keyword=False)
+    span = read_span(gbp.filehandle, gbp.filehandle.tell(),
+                     FEATURES_END_MARKERS, skip_marker=False)
+    if span is None:
+        # The source gives no access to its bytes
+        return __parse_entries(gbp, index, gene_models)
+    chunks = __split_features(span[0], workers * CHUNKS_PER_WORKER)
+    qualifiers = None if index is None else tuple(index.qualifiers)
+    with ProcessPoolExecutor(workers) as executor:
+        results = list(executor.map(_parse_chunk, chunks,
+                                    [qualifiers] * len(chunks),
+                                    [gbp.binary] * len(chunks),
+                                    [gbp.encoding] * len(chunks)))
+    features = []
+    for chunk_features, chunk_index in results:
+        if index is not None:
+            index.merge(chunk_index, len(features))
+        features += chunk_features
+    if gene_models is not None:
+        for feature in features:
+            gene_models.add(feature)
+    return features
+
+
+def __split_features(data, count):
+    """ Splits the FEATURES block into at most count chunks of about the
+    same size, which all start at a feature.
+    """
+    starts = [found.start() for found in FEATURE_START.finditer(data)]
+    if not starts:
+        return []
+    boundaries = [starts[0]]
+    for chunk in range(1, count):
+        # The first feature at or after the ideal boundary
+        position = bisect_left(starts, len(data) * chunk // count)
+        if position < len(starts) and starts[position] > boundaries[-1]:
+            boundaries.append(starts[position])
+    boundaries.append(len(data))
+    return [bytes(data[start:end])
+            for start, end in zip(boundaries, boundaries[1:])]
+
+
+def _parse_chunk(chunk, qualifiers, binary=False,
+                 encoding=DEFAULT_ENCODING):
+    """ Parses a chunk of the FEATURES block in a worker process.
+
+    Parameters:
+        chunk - bytes
+            Lines of the FEATURES block, starting at a feature
+        qualifiers - tuple
+            The qualifiers to index, None for no index
+        binary - boolean. Default: False
+            Whether to parse the chunk in binary mode, which leaves the
+            values of the attributes undecoded.
+        encoding - string. Default: 'utf-8'
+            The encoding of the chunk
+    Returns:
+        A tuple with the list of Feature objects and a QualifierIndex
+        with positions within the chunk, or None.
+    """
+    # Imported here, as the parser itself depends on this module
+    from .genbank_parser import GenbankParser
+    index = None if qualifiers is None else QualifierIndex(qualifiers)
+    with GenbankParser(chunk, encoding=encoding, binary=binary) as parser:
+        features = __parse_entries(parser, index, None)
+        remaining = parser.decode(parser.read_valid_line())
+    if remaining.strip():
+        raise ValueError('Unexpected line in FEATURES: ' + remaining.strip())
+    return features, index
+
+
+def __parse_attributes(gbp, position, index):
     """ This method will parse the attributes of a Feature.
 
     Parameters:
         gbp - GenbankParser object
             The parser which holds the file pointer of the genbank
             file.
+        position - int
+            The position of the Feature in the list of features
+        index - QualifierIndex object
+            The index to add the attributes to, can be None
     Returns:
-        A dictionary of attributes where the values all are strings
+        A dictionary of attributes where the values all are strings,
+        or bytes in binary mode.
     """
+    quote = gbp.literal('"')
     attributes = {}
-    # Check if this is an attribute
-    attribute = gbp.handle_keyword('/', do_split=False, raise_error=False)
+    # Check if this is an attribute, the position of the line is kept to
+    # return to it when it is not
+    line_position = gbp.filehandle.tell()
+    attribute = split_qualifier_line(gbp.read_valid_line())
     while attribute is not None:
-        # Parse the key
-        key = ''
-        for char in attribute:
-            if char == '=':
-                break
-            key += char
-        # Parse the value
-        value = attribute[len(key) + 1:]
+        # Parse the key and the value, the keys are the same for many
+        # features so only keep one copy of them
+        key, value = split_qualifier(attribute)
+        key = intern(gbp.decode(key))
         # When the value is a string, parse it as a string (which can be
         # multiline)
-        if value[0:1] == '"':
-            value = __parse_string(gbp, value)
+        if value[0:1] == quote:
+            delimiter = '' if key in SEQUENCE_QUALIFIERS else ' '
+            value = __parse_string(gbp, value, gbp.literal(delimiter))
         attributes[key] = value
+        if index is not None and key in index.qualifiers:
+            index.add(position, key, gbp.decode(value))
         # Try for a next attribute
-        attribute = gbp.handle_keyword('/', do_split=False, raise_error=False)
+        line_position = gbp.filehandle.tell()
+        attribute = split_qualifier_line(gbp.read_valid_line())
+    gbp.filehandle.seek(line_position)
     return attributes
 
 
-def __parse_string(gbp, value):
-    """ Parses a string over multiple lines """
-    remaining = value[1:]
+def __parse_string(gbp, value, delimiter=' '):
+    """ Parses a string over multiple lines. The lines are collected
+    and joined once, so long values such as translations take linear
+    time.
+
+    Parameters:
+        gbp - GenbankParser object
+            The parser which holds the file pointer of the genbank
+            file.
+        value - string
+            The first line of the value, including the opening quote
+        delimiter - string. Default: ' '
+            The string to put in between the lines
+    Returns:
+        The string without the quotes
+    """
+    quote = value[:1]
+    part = value[1:]
+    parts = [part]
     # Keep reading until a " has been hit
     # TODO: a quote can be escaped in Genbank files
-    while remaining[-1] != '"':
-        remaining += ' ' + gbp.read_valid_line().strip()
-    return remaining[:-1]
+    while not part.endswith(quote):
+        part = gbp.read_valid_line().strip()
+        if not part:
+            raise ValueError('Unterminated qualifier value: ' +
+                             gbp.decode(value))
+        parts.append(part)
+    parts[-1] = part[:-1]
+    return delimiter.join(parts)
 
 
 class Feature(object):
@@ -90,7 +247,7 @@ class Feature(object):
     3. A dictionary with attributes
     """
 
-    def __init__(self, name, location, attributes):
+    def __init__(self, name, location, attributes, encoding=None):
         """ This constructor will parse the location to a Location
         object, which is more useful then the simple location string.
 
@@ -102,10 +259,35 @@ class Feature(object):
             attributes - dict
                 A dictionary full of attributes wich are related to this
                 Feature.
+            encoding - string. Default: None
+                The encoding of the values of the attributes when those
+                are bytes, which are then decoded on first access.
         """
         self.name = name
         self.location = parse_location(location)
         self.attributes = attributes
+        self.encoding = encoding
+
+    @property
+    def attributes(self):
+        if self.encoding is not None:
+            self._attributes = {key: value.decode(self.encoding)
+                                for key, value in self._attributes.items()}
+            self.encoding = None
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes):
+        self._attributes = attributes
+
+    def __reduce__(self):
+        # Pickled without its __dict__ and without parsing the location
+        # again, attributes which have not been decoded stay bytes
+        if self.encoding is None:
+            return _restore_feature, (self.name, self.location,
+                                      self.attributes)
+        return _restore_feature, (self.name, self.location,
+                                  self._attributes, self.encoding)
 
     def has_attribute(self, attribute):
         """ Checks whether an attribute aexists or not
@@ -134,3 +316,13 @@ class Feature(object):
             dictionary.
         """
         return self.attributes[attribute]
+
+
+def _restore_feature(name, location, attributes, encoding=None):
+    """ Recreates a pickled Feature around its parsed location """
+    feature = Feature.__new__(Feature)
+    feature.name = name
+    feature.location = location
+    feature.attributes = attributes
+    feature.encoding = encoding
+    return feature
@@ -1,9 +1,14 @@
-from os.path import exists
-from re import split
-
 from .features_parser import parse_features as parse_actual_features
+from .features_parser import parse_features_parallel as \
+    parse_actual_features_parallel
 from .metadata_parser import parse_metadata as parse_actual_metadata
+from .origin_parser import fetch_location as fetch_actual_location
+from .origin_parser import fetch_region as fetch_actual_region
+from .origin_parser import hash_origin as hash_actual_origin
 from .origin_parser import parse_origin as parse_actual_origin
+from .origin_parser import parse_origin_parallel as \
+    parse_actual_origin_parallel
+from .readers import DEFAULT_ENCODING, PREFETCH_BLOCK_SIZE, open_source
 
 CONTINUE_LINE_SPACING = ' ' * 12
 
@@ -28,22 +33,59 @@ class GenbankParser(object):
 
     Note that this object can be considered as file: it needs to be
     closed which is supported with a 'with' statement are a regular
-    'close' method.
+    'close' method. File objects given to the parser are not closed,
+    those are owned by the caller.
+
+    In binary mode the lines are read as bytes and the stages work on
+    those bytes, so the bulk of a file (the qualifiers and the ORIGIN
+    block) is never decoded as a whole. The fields of the header and
+    the values of the qualifiers are decoded when they are first used.
     """
 
-    def __init__(self, filename):
-        """ Creates a new parser from the given file.
+    def __init__(self, source, encoding=DEFAULT_ENCODING, binary=False,
+                 prefetch=0, prefetch_block_size=PREFETCH_BLOCK_SIZE):
+        """ Creates a new parser from the given source.
 
         Parameters:
-            filename - string
-                The name of the file pointing to the file which needs
-                to be parsed.
+            source - string, bytes-like object or file object
+                The name of the file which needs to be parsed, a
+                bytes, bytearray or memoryview object holding the
+                contents of a Genbank file, or a readable text or
+                binary file object. Buffers are parsed without copying
+                them and file objects which cannot seek (such as HTTP
+                responses) are buffered internally.
+            encoding - string. Default: 'utf-8'
+                The encoding of the source
+            binary - boolean. Default: False
+                Whether to parse the bytes of the source without
+                decoding them first. This requires a filename, a buffer
+                or a binary file object.
+            prefetch - int. Default: 0
+                The amount of blocks a background thread reads ahead of
+                the parser, 0 to read without a thread. Prefetching is
+                used for filenames and seekable binary file objects.
+            prefetch_block_size - int. Default: 1048576
+                The size of the blocks which are read ahead
         Raises:
             ValueError when the file does not exist on the filesystem.
+            TypeError when the source is of an unsupported type.
         """
-        if not exists(filename):
-            raise ValueError('File {} does not exist.'.format(filename))
-        self.filehandle = open(filename, 'r')
+        self.filehandle = open_source(source, encoding, binary, prefetch,
+                                      prefetch_block_size)
+        # The PrefetchStatistics of the reader thread, or None
+        self.prefetch_statistics = getattr(self.filehandle, 'statistics',
+                                           None)
+        self.encoding = encoding
+        self.binary = binary
+        # The keywords and other strings the lines are compared with,
+        # converted to the type of the lines
+        self.literals = {}
+        self.newline = self.literal('\n')
+        # Only close the file handle when this parser created it
+        self.close_filehandle = self.filehandle is not source
+        # The position of the first line after the ORIGIN line of the
+        # current record, used by 'fetch_region'
+        self.origin_position = None
 
     def parse_metadata(self, return_meta=True):
         """ Parses the metadata as described in the docstring of this
@@ -58,13 +100,16 @@ class GenbankParser(object):
             When return_meta is set to True, this will return a Metadata
             object. If set to False, this will simply return True.
         """
+        # A new record starts, of which the ORIGIN is not known yet
+        self.origin_position = None
         if return_meta:
             return parse_actual_metadata(self)
         # Read until the FEATURES are hit
         self.read_until('FEATURES')
         return True
 
-    def parse_features(self, return_features=True):
+    def parse_features(self, return_features=True, index=None,
+                       gene_models=None, workers=None):
         """ Parses the features as described in the docstring of this
         class.
 
@@ -73,18 +118,34 @@ class GenbankParser(object):
                 This is a boolean which determines whether to store the
                 parsed data or not. True for storing data, False for
                 not storing the data.
+            index - QualifierIndex object. Default: None
+                An index which is filled with the qualifiers of the
+                features in the same pass. Only used when
+                return_features is set to True.
+            gene_models - GeneModelBuilder object. Default: None
+                A builder which collects the features for linking
+                genes to their transcripts, CDS and exons. Only used
+                when return_features is set to True.
+            workers - int. Default: None
+                When set to more than 1, the features are parsed by
+                this amount of processes. Only worth it for records
+                with tens of thousands of features.
         Return:
             When return_features is set to True, this will return a
             list of Feature objects. If set to False, this will
             simply return True.
         """
         if return_features:
-            return parse_actual_features(self)
+            if workers and workers > 1:
+                return parse_actual_features_parallel(self, workers, index,
+                                                      gene_models)
+            return parse_actual_features(self, index, gene_models)
         # Read until the ORIGIN is hit
         self.read_until('ORIGIN')
         return True
 
-    def parse_origin(self, return_origin=True):
+    def parse_origin(self, return_origin=True, workers=None,
+                     use_processes=True):
         """ Parses the origin as described in the docstring of this
         class.
 
@@ -93,18 +154,144 @@ class GenbankParser(object):
                 This is a boolean which determines whether to store the
                 parsed data or not. True for storing data, False for
                 not storing the data.
+            workers - int. Default: None
+                When set to more than 1, the sequence is split into
+                this amount of chunks which are decoded concurrently.
+                Only worth it for sequences of many megabases.
+            use_processes - boolean. Default: True
+                Whether the workers are processes or threads
         Return:
             When return_origin is set to True, this will return a
             Sequence object. If set to False, this will simply
             return True.
         """
+        if return_origin and workers and workers > 1:
+            return parse_actual_origin_parallel(self, workers,
+                                                use_processes)
         if return_origin:
             return parse_actual_origin(self)
-        # Read until the end of the file has been reached
-        # Might be over eager, as this is actually pointless
+        self.locate_origin()
+        # Skip the sequence and its terminator, so the next record can
+        # be parsed
         self.read_until('//')
+        self.read_valid_line()
         return True
 
+    def hash_origin(self, sink=None):
+        """ Reads the origin like 'parse_origin' does, but only
+        calculates the digest of the sequence instead of building it.
+        Records with the same sequence have the same digest.
+
+        Parameters:
+            sink - callable. Default: None
+                A function which is called with every block of upper
+                cased bases as bytes, while they are hashed.
+        Return:
+            A tuple with the hexadecimal digest and the length of the
+            sequence
+        """
+        return hash_actual_origin(self, sink)
+
+    def has_record(self):
+        """ Checks whether another record follows, so the stages can be
+        repeated for every record of a file.
+
+        Returns:
+            A boolean which is False at the end of the file
+        """
+        position = self.filehandle.tell()
+        line = self.read_valid_line()
+        self.filehandle.seek(position)
+        return bool(line.strip())
+
+    def locate_origin(self):
+        """ Reads past the ORIGIN line of the current record and
+        stores the position of the first sequence line in
+        'origin_position'.
+        """
+        self.read_until('ORIGIN')
+        self.handle_keyword('ORIGIN', do_split=False, remove_keyword=False)
+        self.origin_position = self.filehandle.tell()
+
+    def fetch_region(self, start, end, strand=1):
+        """ Reads the bases of a region straight from the ORIGIN block,
+        without parsing the complete sequence. This can be used before
+        or after any of the stages, but it requires a source which can
+        seek such as a file or a buffer.
+
+        The ORIGIN block has 60 bases on every line, so the position of
+        a base can be calculated from the position of the ORIGIN line.
+        The coordinates of the lines which are read are checked, and
+        when the block does not have that layout the lines are read one
+        by one instead.
+
+        Parameters:
+            start - int
+                The first base of the region, starting at 1
+            end - int
+                The last base of the region, which is included
+            strand - int. Default: 1
+                1 for the forward strand, -1 for the reverse
+                complement of the region.
+        Returns:
+            A string with the bases of the region, upper cased like
+            'parse_origin' does.
+        Raises:
+            ValueError when the region is invalid, ends past the end of
+            the sequence or the source cannot seek.
+        """
+        if self.origin_position is None:
+            position = self.filehandle.tell()
+            self.locate_origin()
+            self.filehandle.seek(position)
+        return fetch_actual_region(self, start, end, strand)
+
+    def fetch_location(self, location):
+        """ Reads the bases of a Location straight from the ORIGIN
+        block, see 'fetch_region'.
+
+        Parameters:
+            location - Location object
+                The location to read. Complement and joined locations
+                are supported, remote locations are not.
+        Returns:
+            A string with the bases of the location
+        """
+        return fetch_actual_location(self, location)
+
+    def literal(self, text):
+        """ Converts a string to the type of the lines that are read,
+        which are bytes in binary mode.
+
+        Parameters:
+            text - string
+                The string to convert, such as a keyword
+        Returns:
+            The string, or the encoded string in binary mode
+        """
+        if not self.binary:
+            return text
+        encoded = self.literals.get(text)
+        if encoded is None:
+            encoded = self.literals[text] = text.encode(self.encoding)
+        return encoded
+
+    def decode(self, value):
+        """ Decodes a value read in binary mode.
+
+        Parameters:
+            value - string, bytes, list or None
+                A value returned by one of the 'handle' methods
+        Returns:
+            The value with all bytes decoded to strings. Other values
+            are returned as they are.
+        """
+        if isinstance(value, bytes):
+            return value.decode(self.encoding)
+        if isinstance(value, list):
+            return [self.decode(part) for part in value]
+        return value
+
     def read_until(self, keyword):
         """ Reads until a keyword has been hit. When this keyword is
         hit, it will set the file pointer back to right before the
@@ -118,8 +305,9 @@ class GenbankParser(object):
                 necessary to account for that.
 
         """
+        keyword = self.literal(keyword)
         # A variable to store the last line in
-        line = ' '
+        line = self.literal(' ')
         # A varibale to store the position in before the last read line
         last_position = 0
         # Keep checking until we have line which starts with the
@@ -143,12 +331,12 @@ class GenbankParser(object):
          Note that this method can return an empty string (without
          '\n') which means that the end of file has been reached.
         """
-        content = '\n'
-        while content == '\n':
+        content = self.newline
+        while content == self.newline:
             content = self.filehandle.readline()
             # Check if the line is full of whitespace
             if len(content) > 1 and len(content.strip()) == 0:
-                content = '\n'
+                content = self.newline
         return content
 
     def get_continuing_line(self):
@@ -163,7 +351,7 @@ class GenbankParser(object):
         # Save the position in case we don't find a valid line
         old_position = self.filehandle.tell()
         line = self.read_valid_line()
-        if line and line.startswith(CONTINUE_LINE_SPACING):
+        if line and line.startswith(self.literal(CONTINUE_LINE_SPACING)):
             return line
         # Not found, thus return to the reading of said line
         self.filehandle.seek(old_position)
@@ -193,13 +381,15 @@ class GenbankParser(object):
             whitespace is included in this setting.
             When do_split is not set, the method will return the read
             string.
+            In binary mode the values are bytes.
         """
         # Store the last position in case we need to return to before
         # this line.
         last_position = self.filehandle.tell()
+        prefix = self.literal(keyword)
         # Read the line
         line = self.read_valid_line().strip()
-        if not (line.startswith(keyword) and line):
+        if not (line.startswith(prefix) and line):
             # Raise an error dependent of the raise_error parameter
             if raise_error:
                 raise ValueError('Did not find {}'.format(keyword))
@@ -208,10 +398,10 @@ class GenbankParser(object):
             return
         # Remove the keyword dependent on the remove_keyword parameter
         if remove_keyword:
-            line = line[len(keyword):].strip()
+            line = line[len(prefix):].strip()
         # Split on whitespace dependent on the do_split parameter
         if do_split:
-            return split('\s+', line)
+            return line.split()
         return line
 
     def handle_continuing_lines(self, base, delimiter=' '):
@@ -226,6 +416,7 @@ class GenbankParser(object):
             The base string with the available lines and delimiters
             appended to it.
         """
+        delimiter = self.literal(delimiter)
         line = self.get_continuing_line()
         while line is not None:
             base += delimiter + line.strip()
@@ -267,7 +458,8 @@ class GenbankParser(object):
 
     def close(self):
         """ Closes the file handle """
-        self.filehandle.close()
+        if self.close_filehandle:
+            self.filehandle.close()
 
     def __enter__(self):
         return self
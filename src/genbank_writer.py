@@ -0,0 +1,361 @@
+""" Writes Metadata, Feature and Sequence objects as Genbank records, and
+cuts regions out of records as standalone records.
+
+The records are written in the layout the parser reads:
+    columns 0-11  -> the keywords of the header
+    columns 5-20  -> the feature keys, followed by the location
+    columns 21-   -> the qualifiers, wrapped at 79 columns
+    ORIGIN        -> 60 bases per line in blocks of 10
+The header is written in the order of the raw header of the parsed
+record, so sections the parser does not know (such as PROJECT) are
+copied as they are. Every section is written to the file as soon as it
+has been formatted, and the ORIGIN block is written in batches of lines.
+"""
+from copy import copy
+
+from .features_parser import SEQUENCE_QUALIFIERS
+from .metadata_parser import FIELD_PARSERS, Metadata
+from .origin_parser import BASES_PER_LINE, Sequence
+from .readers import DEFAULT_ENCODING
+from .region_algebra import clip_location, location_parts
+
+LINE_WIDTH = 79
+KEYWORD_WIDTH = 12
+FEATURE_KEY_WIDTH = 16
+QUALIFIER_INDENT = ' ' * 21
+# Qualifiers of which the value is written without quotes
+UNQUOTED_QUALIFIERS = frozenset([
+    'anticodon', 'citation', 'codon_start', 'compare', 'direction',
+    'estimated_length', 'mod_base', 'number', 'rpt_type', 'rpt_unit_range',
+    'tag_peptide', 'transl_except', 'transl_table'])
+# The amount of sequence lines formatted per write
+ORIGIN_LINES_PER_WRITE = 10000
+
+
+class GenbankWriter(object):
+    """ Writes records to a Genbank file. Like the parser, the writer
+    needs to be closed, which is supported with a 'with' statement.
+    File objects given to the writer are not closed.
+    """
+
+    def __init__(self, target, encoding=DEFAULT_ENCODING):
+        """ Creates a writer.
+
+        Parameters:
+            target - string or file object
+                The name of the file to write, or a writable text file
+                object
+            encoding - string. Default: 'utf-8'
+                The encoding of the file when a name is given
+        """
+        if isinstance(target, str):
+            self.filehandle = open(target, 'w', encoding=encoding,
+                                   newline='\n')
+        else:
+            self.filehandle = target
+        self.close_filehandle = self.filehandle is not target
+
+    def write(self, metadata, features, sequence=None):
+        """ Writes a record, terminated by '//'.
+
+        Parameters:
+            metadata - Metadata object
+                The header of the record
+            features - list
+                The Feature objects of the record
+            sequence - Sequence object. Default: None
+                The sequence, of which the ORIGIN block is left empty
+                when not given.
+        """
+        self.filehandle.write(''.join(format_header(metadata)))
+        self.filehandle.write('FEATURES             Location/Qualifiers\n')
+        for feature in features:
+            self.filehandle.write(''.join(format_feature(feature)))
+        self.filehandle.write('ORIGIN\n')
+        if sequence is not None:
+            self.__write_origin(sequence.get_sequence())
+        self.filehandle.write('//\n')
+
+    def write_region(self, metadata, features, sequence, start, end):
+        """ Writes a region of a record as a record of its own, see
+        'slice_record'.
+        """
+        self.write(*slice_record(metadata, features, sequence, start, end))
+
+    def __write_origin(self, bases):
+        """ Writes the bases in lines of 60, in batches of lines """
+        bases = bases.lower()
+        batch = ORIGIN_LINES_PER_WRITE * BASES_PER_LINE
+        for block in range(0, len(bases), batch):
+            lines = []
+            for start in range(block, min(block + batch, len(bases)),
+                               BASES_PER_LINE):
+                line = bases[start:start + BASES_PER_LINE]
+                lines.append('%9d %s\n' % (start + 1, ' '.join([
+                    line[0:10], line[10:20], line[20:30], line[30:40],
+                    line[40:50], line[50:60]]).rstrip()))
+            self.filehandle.write(''.join(lines))
+
+    def close(self):
+        """ Closes the file when the writer has opened it """
+        if self.close_filehandle:
+            self.filehandle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def slice_record(metadata, features, sequence, start, end):
+    """ Cuts a region out of a record. The features overlapping the
+    region are kept and shifted, the locations of the features which
+    continue past the region are truncated with the '<' and '>' partial
+    markers. A CDS which loses bases at its 5' end gets the
+    /codon_start which keeps its reading frame.
+
+    Parameters:
+        metadata - Metadata object
+            The header of the record
+        features - list
+            The Feature objects of the record
+        sequence - Sequence object
+            The sequence of the record, can be None
+        start - int
+            The first base of the region, values before the start of
+            the record are clamped to 1
+        end - int
+            The last base of the region, values past the end of the
+            record are clamped to the length of the record
+    Returns:
+        A tuple with the Metadata object, the list of Feature objects
+        and the Sequence object (or None) of the region
+    Raises:
+        ValueError when the region is empty
+    """
+    start = max(start, 1)
+    end = min(end, metadata.seq_length)
+    if start > end:
+        raise ValueError('Empty region: {}..{}'.format(start, end))
+    # A region of a circular record is linear
+    region_metadata = Metadata(metadata.locus_name, end - start + 1,
+                               metadata.molecule_type, 'linear',
+                               metadata.division,
+                               metadata.modification_date_str,
+                               header=metadata.header)
+    # Keep the fields which have been parsed, and possibly changed
+    for name in FIELD_PARSERS:
+        if name in metadata.__dict__:
+            setattr(region_metadata, name, metadata.__dict__[name])
+    region_features = []
+    for feature in features:
+        location = clip_location(feature.location, start, end)
+        if location is None:
+            continue
+        # The attributes are decoded before copying in binary mode
+        attributes = dict(feature.attributes)
+        clipped = copy(feature)
+        clipped.location = location
+        clipped.attributes = attributes
+        if clipped.has_attribute('codon_start'):
+            __shift_codon_start(clipped, feature.location, start, end)
+        region_features.append(clipped)
+    region_sequence = None
+    if sequence is not None:
+        region_sequence = Sequence(sequence.get_sequence()[start - 1:end])
+        region_sequence.set_accession(sequence.get_accession())
+    return region_metadata, region_features, region_sequence
+
+
+def __shift_codon_start(feature, location, start, end):
+    """ Updates the /codon_start of a CDS for the bases which have been
+    cut off at its 5' end, the left end for parts on the forward strand
+    and the right end for parts on the reverse strand.
+    """
+    removed = 0
+    for first, last, strand in location_parts(location):
+        if strand == -1:
+            removed += max(0, last - max(first, end + 1) + 1)
+        else:
+            removed += max(0, min(last, start - 1) - first + 1)
+    if removed:
+        codon_start = int(feature.get_attribute('codon_start'))
+        feature.attributes['codon_start'] = str(
+            (codon_start - 1 - removed) % 3 + 1)
+
+
+def format_header(metadata):
+    """ Formats the header of a record.
+
+    The sections are written in the order of the raw header of the
+    record, followed by the fields which have been set but are not in
+    the raw header. Sections the parser does not know are copied.
+
+    Parameters:
+        metadata - Metadata object
+            The header to format
+    Returns:
+        A list of lines, including their newlines
+    """
+    lines = [__format_locus(metadata)]
+    written = set()
+    header = metadata.header
+    for keyword, first, last in header.sections if header else ():
+        if keyword == 'LOCUS':
+            continue
+        if keyword not in HEADER_FORMATTERS:
+            data = header.data[first:last]
+            if isinstance(data, bytes):
+                data = data.decode(header.encoding)
+            lines.append(data if data.endswith('\n') else data + '\n')
+        elif keyword not in written:
+            written.add(keyword)
+            lines += HEADER_FORMATTERS[keyword](metadata)
+    for keyword, formatter in HEADER_FORMATTERS.items():
+        if keyword not in written:
+            lines += formatter(metadata)
+    return lines
+
+
+def __format_locus(metadata):
+    """ Formats the LOCUS line """
+    return 'LOCUS       {:<16} {:>11} bp    {:<8}{:<9}{} {}\n'.format(
+        metadata.locus_name, metadata.seq_length, metadata.molecule_type,
+        metadata.molecule_formation, metadata.division,
+        metadata.modification_date_str)
+
+
+def __format_field(keyword, value, delimiter=' '):
+    """ Formats a keyword with its value. A value joined with spaces is
+    wrapped, a value joined with newlines keeps its lines.
+    """
+    if value is None:
+        return []
+    if delimiter == ' ':
+        values = _wrap(value, LINE_WIDTH - KEYWORD_WIDTH)
+    else:
+        values = value.split(delimiter)
+    lines = [keyword.ljust(KEYWORD_WIDTH) + values[0] + '\n']
+    lines += [' ' * KEYWORD_WIDTH + value + '\n' for value in values[1:]]
+    return lines
+
+
+def __format_definition(metadata):
+    return __format_field('DEFINITION', metadata.description)
+
+
+def __format_accession(metadata):
+    return __format_field('ACCESSION', metadata.accession)
+
+
+def __format_version(metadata):
+    version = metadata.version
+    return __format_field('VERSION',
+                          None if version is None else ' '.join(version))
+
+
+def __format_dblink(metadata):
+    return __format_field('DBLINK', metadata.dblink, '\n')
+
+
+def __format_keywords(metadata):
+    return __format_field('KEYWORDS', metadata.keywords)
+
+
+def __format_source(metadata):
+    """ Formats the SOURCE with the ORGANISM and its lineage """
+    if metadata.source is None and metadata.organism is None:
+        return []
+    lines = __format_field('SOURCE', metadata.source or '')
+    return lines + __format_field('  ORGANISM', metadata.organism, '\n')
+
+
+def __format_publications(metadata):
+    """ Formats a REFERENCE section for every publication """
+    lines = []
+    for publication in metadata.publications or ():
+        lines += __format_field('REFERENCE', publication.reference)
+        lines += __format_field('  AUTHORS', publication.authors)
+        lines += __format_field('  TITLE', publication.title)
+        lines += __format_field('  JOURNAL', publication.journal)
+        lines += __format_field('   PUBMED', publication.pubmed)
+    return lines
+
+
+def __format_comment(metadata):
+    return __format_field('COMMENT', metadata.comment, '\n')
+
+
+# The formatters of the sections the parser knows, by keyword in the
+# order of a Genbank header
+HEADER_FORMATTERS = {
+    'DEFINITION': __format_definition,
+    'ACCESSION': __format_accession,
+    'VERSION': __format_version,
+    'DBLINK': __format_dblink,
+    'KEYWORDS': __format_keywords,
+    'SOURCE': __format_source,
+    'REFERENCE': __format_publications,
+    'COMMENT': __format_comment,
+}
+
+
+def format_feature(feature):
+    """ Formats a feature with its qualifiers.
+
+    The location is written on a single line, as the parser does not
+    read locations which continue on the next line. Qualifier values
+    are quoted, except for the qualifiers in UNQUOTED_QUALIFIERS and
+    qualifiers without a value (such as /pseudo).
+
+    Parameters:
+        feature - Feature object
+            The feature to format
+    Returns:
+        A list of lines, including their newlines
+    """
+    name = feature.name
+    if len(name) >= FEATURE_KEY_WIDTH:
+        name += ' '
+    lines = ['     {:<16}{}\n'.format(name, feature.location)]
+    width = LINE_WIDTH - len(QUALIFIER_INDENT)
+    for key, value in feature.attributes.items():
+        if not value:
+            qualifier = '/' + key
+        elif key in UNQUOTED_QUALIFIERS:
+            qualifier = '/{}={}'.format(key, value)
+        else:
+            qualifier = '/{}="{}"'.format(key, value)
+        if len(qualifier) <= width:
+            lines.append(QUALIFIER_INDENT + qualifier + '\n')
+        elif key in SEQUENCE_QUALIFIERS:
+            # Sequences are joined without a delimiter, so they can be
+            # cut anywhere
+            lines += [QUALIFIER_INDENT + qualifier[start:start + width] +
+                      '\n' for start in range(0, len(qualifier), width)]
+        else:
+            lines += [QUALIFIER_INDENT + part + '\n'
+                      for part in _wrap(qualifier, width)]
+    return lines
+
+
+def _wrap(text, width):
+    """ Splits a text into lines of at most width characters at its
+    spaces. Words longer than the width are kept whole, as the parser
+    joins the lines with a space.
+
+    Returns:
+        A list of lines without newlines
+    """
+    lines = []
+    while len(text) > width:
+        cut = text.rfind(' ', 0, width + 1)
+        if cut <= 0:
+            cut = text.find(' ', width)
+            if cut == -1:
+                break
+        lines.append(text[:cut])
+        text = text[cut + 1:]
+    lines.append(text)
+    return lines
@@ -0,0 +1,222 @@
+""" Links the flat list of features to gene models: every gene with its
+transcripts (mRNA and other RNA features) and the CDS and exon features
+of those transcripts.
+
+Features are linked by their /locus_tag or /gene qualifier through a
+hash lookup. Features without those qualifiers are linked to the
+innermost gene on the same strand which contains them, found with a
+binary search over the genes sorted by start. A CDS is linked to the
+transcripts with the same /transcript_id, /protein_id or /product, or
+else to the transcripts of which the exons contain it.
+"""
+from bisect import bisect_right
+
+from .region_algebra import location_parts
+
+GENE_NAMES = frozenset(['gene'])
+TRANSCRIPT_NAMES = frozenset(['mRNA', 'ncRNA', 'rRNA', 'tRNA',
+                              'misc_RNA', 'precursor_RNA'])
+PART_NAMES = frozenset(['CDS', 'exon'])
+LINK_QUALIFIERS = ('locus_tag', 'gene')
+# The qualifiers which link a CDS to its transcript, in order of
+# preference
+CDS_QUALIFIERS = ('transcript_id', 'protein_id', 'product')
+
+
+class GeneModel(object):
+    """ A gene with the features which belong to it:
+    1. transcripts - TranscriptModel objects of the transcripts
+    2. cds - the CDS features which are not in a transcript, as in
+       most prokaryotic records
+    3. exons - the exon features which are not in a transcript
+    """
+
+    def __init__(self, gene):
+        self.gene = gene
+        self.transcripts = []
+        self.cds = []
+        self.exons = []
+
+
+class TranscriptModel(object):
+    """ A transcript with its CDS and exon features. A CDS which
+    cannot be told apart from the transcripts containing it is in each
+    of them.
+    """
+
+    def __init__(self, feature):
+        self.feature = feature
+        self.cds = []
+        self.exons = []
+
+
+class GeneModelBuilder(object):
+    """ Builds GeneModel objects from features. The features are added
+    one at a time while they are parsed, by giving the builder to
+    GenbankParser.parse_features, after which 'build' links them.
+    """
+
+    def __init__(self):
+        self.genes = []
+        self.transcripts = []
+        self.parts = []
+
+    def add(self, feature):
+        """ Adds a feature, features which are no part of a gene model
+        are ignored.
+
+        Parameters:
+            feature - Feature object
+                The feature to add
+        """
+        if feature.name in GENE_NAMES:
+            self.genes.append(feature)
+        elif feature.name in TRANSCRIPT_NAMES:
+            self.transcripts.append(feature)
+        elif feature.name in PART_NAMES:
+            self.parts.append(feature)
+
+    def build(self):
+        """ Links the added features to their genes and transcripts.
+
+        Returns:
+            A tuple with a list of GeneModel objects in the order of
+            the genes, and a list of the features which could not be
+            linked to a gene.
+        """
+        models = [GeneModel(gene) for gene in self.genes]
+        finder = _GeneFinder(models)
+        orphans = []
+        for transcript in self.transcripts:
+            model = finder.find(transcript)
+            if model is None:
+                orphans.append(transcript)
+            else:
+                model.transcripts.append(TranscriptModel(transcript))
+        for part in self.parts:
+            model = finder.find(part)
+            if model is None:
+                orphans.append(part)
+            else:
+                _link_part(model, part)
+        return models, orphans
+
+
+def _link_part(model, part):
+    """ Links a CDS or exon to the transcripts of the gene which contain
+    it, or to the gene itself when no transcript contains it.
+    """
+    start, end, strand = _extent(part)
+    containing = []
+    for transcript in model.transcripts:
+        transcript_start, transcript_end, _ = _extent(transcript.feature)
+        if transcript_start <= start and end <= transcript_end:
+            containing.append(transcript)
+    if part.name == 'CDS':
+        if containing:
+            for transcript in _cds_transcripts(part, containing):
+                transcript.cds.append(part)
+        else:
+            model.cds.append(part)
+    elif containing:
+        # An exon can be shared by multiple transcripts
+        for transcript in containing:
+            transcript.exons.append(part)
+    else:
+        model.exons.append(part)
+
+
+def _cds_transcripts(cds, containing):
+    """ Chooses the transcripts of a CDS out of the transcripts which
+    contain it:
+    1. The transcripts with the same /transcript_id, /protein_id or
+       /product as the CDS
+    2. Otherwise the transcripts of which the exons contain every part
+       of the CDS
+    3. Otherwise all of them, as the CDS cannot be told apart
+    """
+    for qualifier in CDS_QUALIFIERS:
+        if cds.has_attribute(qualifier):
+            value = cds.get_attribute(qualifier)
+            same = [transcript for transcript in containing
+                    if transcript.feature.attributes.get(qualifier) ==
+                    value]
+            if same:
+                return same
+    cds_parts = location_parts(cds.location)
+    spliced = [transcript for transcript in containing
+               if _contains_parts(location_parts(transcript.feature.location),
+                                  cds_parts)]
+    return spliced or containing
+
+
+def _contains_parts(exons, parts):
+    """ Checks whether every part lies within one of the exons """
+    return all(any(exon_start <= start and end <= exon_end and
+                   exon_strand == strand
+                   for exon_start, exon_end, exon_strand in exons)
+               for start, end, strand in parts)
+
+
+class _GeneFinder(object):
+    """ Finds the gene of a feature by qualifier or by location """
+
+    def __init__(self, models):
+        self.by_qualifier = {qualifier: {} for qualifier in LINK_QUALIFIERS}
+        for model in models:
+            for qualifier in LINK_QUALIFIERS:
+                if model.gene.has_attribute(qualifier):
+                    values = self.by_qualifier[qualifier]
+                    values.setdefault(model.gene.get_attribute(qualifier),
+                                      model)
+        # The genes sorted by start, with the largest end up to each
+        # gene, so the search can stop early
+        located = sorted(((_extent(model.gene), model) for model in models),
+                         key=lambda item: item[0][0])
+        self.starts = [extent[0] for extent, _ in located]
+        self.located = located
+        self.max_ends = []
+        max_end = 0
+        for (_, end, _), _ in located:
+            max_end = max(max_end, end)
+            self.max_ends.append(max_end)
+
+    def find(self, feature):
+        """ Finds the GeneModel of a feature.
+
+        Parameters:
+            feature - Feature object
+                The feature to find the gene of
+        Returns:
+            A GeneModel object, or None when there is none
+        """
+        for qualifier in LINK_QUALIFIERS:
+            if feature.has_attribute(qualifier):
+                model = self.by_qualifier[qualifier].get(
+                    feature.get_attribute(qualifier))
+                if model is not None:
+                    return model
+        return self.__find_containing(feature)
+
+    def __find_containing(self, feature):
+        """ Finds the innermost gene on the same strand which contains
+        the feature, which is the containing gene that starts last.
+        """
+        start, end, strand = _extent(feature)
+        index = bisect_right(self.starts, start) - 1
+        # Walk back over the genes which start before the feature, as
+        # long as one of them can still reach the end of the feature
+        while index >= 0 and self.max_ends[index] >= end:
+            (_, gene_end, gene_strand), model = self.located[index]
+            if gene_end >= end and gene_strand == strand:
+                return model
+            index -= 1
+
+
+def _extent(feature):
+    """ Calculates the first base, last base and strand of a feature """
+    parts = location_parts(feature.location)
+    if not parts:
+        return 0, -1, 0
+    return (min(part[0] for part in parts), max(part[1] for part in parts),
+            parts[0][2])
@@ -0,0 +1,264 @@
+""" Incremental parsing of files with multiple Genbank records, such as
+the daily update files of NCBI which grow by appending records.
+
+An IncrementalState remembers the byte range and a checksum of every
+record of a file. When the file is parsed again, only the records which
+were appended or whose bytes changed are parsed and returned as a
+RecordDelta.
+
+Records are matched by their checksum, counting the records with the
+same bytes, so a copy of a record which is appended is new. A changed
+record replaces the removed record with the same LOCUS name.
+"""
+from collections import Counter
+from hashlib import blake2b
+from json import dump, load
+
+from .genbank_parser import GenbankParser
+
+RECORD_START = b'LOCUS'
+RECORD_END = b'//'
+DIGEST_SIZE = 16
+
+
+class RecordBoundary(object):
+    """ The byte range of a record in a file and the checksum of the
+    bytes in that range.
+    """
+
+    def __init__(self, start, end, checksum, name=None):
+        """ Creates a new boundary.
+
+        Parameters:
+            start - int
+                The offset of the LOCUS line of the record
+            end - int
+                The offset right after the // line of the record
+            checksum - string
+                The hexadecimal digest of the bytes of the record
+            name - string. Default: None
+                The name on the LOCUS line of the record
+        """
+        self.start = start
+        self.end = end
+        self.checksum = checksum
+        self.name = name
+
+    def __eq__(self, other):
+        return (isinstance(other, RecordBoundary) and
+                (self.start, self.end, self.checksum, self.name) ==
+                (other.start, other.end, other.checksum, other.name))
+
+    def __repr__(self):
+        return 'RecordBoundary({}, {}, {!r}, {!r})'.format(
+            self.start, self.end, self.checksum, self.name)
+
+
+class ParsedRecord(object):
+    """ A record which has been parsed by an incremental update. A
+    changed record has the RecordBoundary of the version it replaces as
+    'previous', which is None for other records.
+    """
+
+    def __init__(self, boundary, metadata, features, sequence,
+                 previous=None):
+        self.boundary = boundary
+        self.metadata = metadata
+        self.features = features
+        self.sequence = sequence
+        self.previous = previous
+
+
+class RecordDelta(object):
+    """ The result of an incremental update:
+    1. appended - ParsedRecord objects of the records after the last
+       parsed offset
+    2. changed - ParsedRecord objects of the records before the last
+       parsed offset whose bytes changed
+    3. removed - RecordBoundary objects of records which are no longer
+       in the file, without the records which have been replaced by a
+       changed record with the same LOCUS name
+    """
+
+    def __init__(self, appended, changed, removed):
+        self.appended = appended
+        self.changed = changed
+        self.removed = removed
+
+    def is_empty(self):
+        """ Checks whether nothing has changed """
+        return not (self.appended or self.changed or self.removed)
+
+
+class IncrementalState(object):
+    """ Remembers the record boundaries of a file between updates. The
+    state can be stored as JSON with 'save' and restored with 'load'.
+    """
+
+    def __init__(self, records=None, offset=0):
+        """ Creates a new state.
+
+        Parameters:
+            records - list. Default: None
+                A list of RecordBoundary objects, ordered by offset
+            offset - int. Default: 0
+                The offset right after the last parsed record
+        """
+        self.records = records or []
+        self.offset = offset
+
+    def update(self, filename, verify=True):
+        """ Parses the records of the file which are new or changed
+        since the last update and remembers the new boundaries.
+
+        Parameters:
+            filename - string
+                The name of the file to parse
+            verify - boolean. Default: True
+                When True, every record is checked for changes. When
+                False, only the last parsed record is checked and the
+                file is only scanned from the last parsed offset, which
+                is enough for files which only grow by appending. When
+                the last parsed record has changed, the whole file is
+                checked anyway.
+        Returns:
+            A RecordDelta object
+        """
+        with open(filename, 'rb') as filehandle:
+            if verify or not self.__last_record_unchanged(filehandle):
+                boundaries = scan_boundaries(filehandle)
+            else:
+                boundaries = self.records + scan_boundaries(filehandle,
+                                                            self.offset)
+            # Every known record matches one record with the same
+            # bytes, the records left over on either side are new or
+            # removed
+            unmatched = Counter(record.checksum for record in self.records)
+            new = []
+            for boundary in boundaries:
+                if unmatched[boundary.checksum]:
+                    unmatched[boundary.checksum] -= 1
+                else:
+                    new.append(boundary)
+            removed = []
+            for record in self.records:
+                if unmatched[record.checksum]:
+                    unmatched[record.checksum] -= 1
+                    removed.append(record)
+            appended, changed = [], []
+            for boundary in new:
+                record = parse_record(filehandle, boundary)
+                if boundary.start >= self.offset:
+                    appended.append(record)
+                    continue
+                record.previous = _take_named(removed, boundary.name)
+                changed.append(record)
+        self.records = boundaries
+        self.offset = boundaries[-1].end if boundaries else 0
+        return RecordDelta(appended, changed, removed)
+
+    def __last_record_unchanged(self, filehandle):
+        """ Checks whether the last parsed record still has the same
+        bytes.
+        """
+        if not self.records:
+            return True
+        last = self.records[-1]
+        filehandle.seek(last.start)
+        data = filehandle.read(last.end - last.start)
+        return _checksum(data) == last.checksum
+
+    def save(self, filename):
+        """ Stores the state as JSON in the given file """
+        with open(filename, 'w') as filehandle:
+            dump({'offset': self.offset,
+                  'records': [[record.start, record.end, record.checksum,
+                               record.name]
+                              for record in self.records]}, filehandle)
+
+    @classmethod
+    def load(cls, filename):
+        """ Restores a state which has been stored with 'save'.
+
+        Parameters:
+            filename - string
+                The file which holds the state
+        Returns:
+            An IncrementalState object
+        """
+        with open(filename, 'r') as filehandle:
+            data = load(filehandle)
+        return cls([RecordBoundary(*record) for record in data['records']],
+                   data['offset'])
+
+
+def scan_boundaries(filehandle, offset=0):
+    """ Finds the byte ranges of the records in a file without parsing
+    them, and calculates their checksums.
+
+    Parameters:
+        filehandle - binary file object
+            A seekable file opened in binary mode
+        offset - int. Default: 0
+            The offset to start scanning from
+    Returns:
+        A list of RecordBoundary objects. A record which has not been
+        completely written yet (no // line) is not included.
+    """
+    filehandle.seek(offset)
+    boundaries = []
+    position = offset
+    start = None
+    digest = None
+    name = None
+    for line in filehandle:
+        if start is None and line.startswith(RECORD_START):
+            start = position
+            digest = blake2b(digest_size=DIGEST_SIZE)
+            fields = line.split()
+            name = fields[1].decode('ascii', 'replace') \
+                if len(fields) > 1 else None
+        position += len(line)
+        if start is None:
+            continue
+        digest.update(line)
+        if line.startswith(RECORD_END):
+            boundaries.append(RecordBoundary(start, position,
+                                             digest.hexdigest(), name))
+            start = None
+    return boundaries
+
+
+def parse_record(filehandle, boundary):
+    """ Parses the record within the boundary.
+
+    Parameters:
+        filehandle - binary file object
+            A seekable file opened in binary mode
+        boundary - RecordBoundary object
+            The range of the record
+    Returns:
+        A ParsedRecord object
+    """
+    filehandle.seek(boundary.start)
+    data = filehandle.read(boundary.end - boundary.start)
+    with GenbankParser(data) as parser:
+        return ParsedRecord(boundary, parser.parse_metadata(),
+                            parser.parse_features(), parser.parse_origin())
+
+
+def _take_named(boundaries, name):
+    """ Removes the first boundary with the name from the list and
+    returns it, or None when there is none.
+    """
+    if name is None:
+        return None
+    for index, boundary in enumerate(boundaries):
+        if boundary.name == name:
+            return boundaries.pop(index)
+    return None
+
+
+def _checksum(data):
+    """ Calculates the checksum of the bytes of a record """
+    return blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
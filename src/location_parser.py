@@ -102,6 +102,7 @@ class Location(object):
             alt_sequence - Sequence object. Default: None
                 Should be used when this location represents a RemoteLocation
                 object and the first sequence does not have that accession.
+                A SequenceStore can be given to resolve any accession.
         Returns:
             A string sequence representing this location
         """
@@ -129,6 +130,9 @@ class SingleBaseLocation(Location):
         super(SingleBaseLocation, self).__init__(location_string)
         self.first = self.second = _convert(int, location_string)
 
+    def __reduce__(self):
+        return _single_base_location, (self.first,)
+
     def __str__(self):
         return str(self.first)
 
@@ -211,6 +215,9 @@ class AdjoiningLocation(DelimitedLocation):
             raise ValueError('Invalid adjoining location: {}^{}'
                              .format(self.first, self.second))
 
+    def __reduce__(self):
+        return _adjoining_location, (self.first, self.second, self.subtype)
+
     def __len__(self):
         return 2
 
@@ -232,9 +239,35 @@ class RangeLocation(DelimitedLocation):
     delimiter = '..'
 
     def __init__(self, string):
-        super(RangeLocation, self).__init__(string)
+        # The flags are set while parsing, so set the defaults first
         self.can_be_lesser = False
         self.can_be_greater = False
+        super(RangeLocation, self).__init__(string)
+
+    @classmethod
+    def from_range(cls, first, second, can_be_lesser=False,
+                   can_be_greater=False):
+        """ Creates a RangeLocation from its coordinates, without
+        formatting and parsing a location string.
+
+        Parameters:
+            first - int
+                The first base of the range
+            second - int
+                The last base of the range
+            can_be_lesser - boolean. Default: False
+                Whether the range can start before first ('<')
+            can_be_greater - boolean. Default: False
+                Whether the range can end after second ('>')
+        Returns:
+            A RangeLocation object
+        """
+        location = cls.__new__(cls)
+        location.first = first
+        location.second = second
+        location.can_be_lesser = can_be_lesser
+        location.can_be_greater = can_be_greater
+        return location
 
     def _parse_left(self, string):
         self.can_be_lesser = string[0] == '<'
@@ -248,8 +281,15 @@ class RangeLocation(DelimitedLocation):
             string = string[1:]
         self.second = _convert(int, string)
 
+    def __reduce__(self):
+        return _range_location, (self.first, self.second,
+                                 self.can_be_lesser, self.can_be_greater)
+
     def __str__(self):
-        return '{}..{}'.format(self.first, self.second)
+        return '{}{}..{}{}'.format('<' if self.can_be_lesser else '',
+                                   self.first,
+                                   '>' if self.can_be_greater else '',
+                                   self.second)
 
 
 class RemoteLocation(DelimitedLocation):
@@ -281,7 +321,9 @@ class RemoteLocation(DelimitedLocation):
         return self.accession
 
     def to_sequence(self, sequence, alt_sequence=None):
-        return self.location.to_sequence(sequence, alt_sequence)
+        # The sequence decides whether it holds the accession, otherwise
+        # the alternative sequence (or SequenceStore) is used
+        return sequence.get_sequence_from_location(self, alt_sequence)
 
     def __contains__(self, item):
         if isinstance(item, RemoteLocation) and \
@@ -292,6 +334,9 @@ class RemoteLocation(DelimitedLocation):
     def __len__(self):
         return len(self.location)
 
+    def __reduce__(self):
+        return _remote_location, (self.accession, self.location)
+
     def __str__(self):
         return self.accession + ':' + str(self.location)
 
@@ -358,6 +403,14 @@ class JoinedLocation(Location):
             generated_sequence += location.to_sequence(sequence, alt_sequence)
         return generated_sequence
 
+    def __reduce__(self):
+        # Also used by ComplementLocation, which has a single location
+        return type(self), tuple(self.locations)
+
+    def __str__(self):
+        return 'join({})'.format(','.join(str(location)
+                                          for location in self.locations))
+
 
 class ComplementLocation(JoinedLocation):
     def __init__(self, location):
@@ -380,6 +433,40 @@ class ComplementLocation(JoinedLocation):
                             .get_sequence_from_location(location))
         return sequences
 
+    def __str__(self):
+        return 'complement({})'.format(self.locations[0])
+
+
+def _single_base_location(first):
+    """ Recreates a pickled SingleBaseLocation without parsing it """
+    location = SingleBaseLocation.__new__(SingleBaseLocation)
+    location.first = location.second = first
+    return location
+
+
+def _adjoining_location(first, second, subtype):
+    """ Recreates a pickled AdjoiningLocation without parsing it """
+    location = AdjoiningLocation.__new__(AdjoiningLocation)
+    location.first = first
+    location.second = second
+    location.subtype = subtype
+    return location
+
+
+def _range_location(first, second, can_be_lesser, can_be_greater):
+    """ Recreates a pickled RangeLocation without parsing it """
+    return RangeLocation.from_range(first, second, can_be_lesser,
+                                    can_be_greater)
+
+
+def _remote_location(accession, remote):
+    """ Recreates a pickled RemoteLocation without parsing it """
+    location = RemoteLocation.__new__(RemoteLocation)
+    location.first = location.second = -1
+    location.accession = accession
+    location.location = remote
+    return location
+
 
 def _convert(var_type, string):
     try:
@@ -1,33 +1,78 @@
+from .tokenizer import split_keyword_line
+
+# The lines which can follow the header
+HEADER_END_MARKERS = ('FEATURES', 'ORIGIN', 'CONTIG', 'BASE COUNT', '//')
+
+
 def parse_metadata(gbp):
     """ The main method which parses the metadata to a Metadata object.
 
+    The header is read in a single pass which only records where its
+    sections (such as DEFINITION or REFERENCE) are. Only the LOCUS line
+    is parsed right away, the other fields are parsed from the raw
+    header on first access.
+
     Parameters:
         gbp - GenbankParser object
             The parser which holds the file pointer of the genbank
             file.
     Returns:
         A Metadata object
+    Raises:
+        ValueError when the header does not start with a LOCUS line
     """
-    # The order to parse
-    part_argument_gens = [__parse_locus, __parse_definition,
-                          __parse_accession_version_keywords,
-                          __parse_source, __parse_publications,
-                          __parse_comment]
-    args = []
-    # Execute each parsing part and create a Metadata object with
-    # the collected return values.
-    for argument_gen in part_argument_gens:
-        args += argument_gen(gbp)
-    return Metadata(*args)
-
-
-def __parse_locus(gbp):
+    header = __read_header(gbp)
+    locus = header.entries('LOCUS')
+    if not locus:
+        raise ValueError('Did not find LOCUS')
+    return Metadata(*__parse_locus(locus), header=header)
+
+
+def __read_header(gbp):
+    """ Reads the lines up to the FEATURES (or any other line which
+    follows the header) and records the span of every section.
+    """
+    filehandle = gbp.filehandle
+    end_markers = tuple(gbp.literal(marker) for marker in HEADER_END_MARKERS)
+    lines = []
+    sections = []
+    offset = 0
+    # The position after the last keyword line and the amount of lines
+    # read since, as telling the position of every line is slow on
+    # text files
+    position = filehandle.tell()
+    continuing = 0
+    line = gbp.read_valid_line()
+    while line and not line.startswith(end_markers):
+        # A keyword in the first column starts a section, all other
+        # lines continue it
+        if line[:1].isspace():
+            continuing += 1
+        else:
+            keyword = gbp.decode(split_keyword_line(line)[0])
+            sections.append((keyword, offset))
+            position = filehandle.tell()
+            continuing = 0
+        lines.append(line)
+        offset += len(line)
+        line = gbp.read_valid_line()
+    # Leave the line after the header to the next stage
+    filehandle.seek(position)
+    for _ in range(continuing):
+        gbp.read_valid_line()
+    ends = [start for _, start in sections[1:]] + [offset]
+    return RawHeader(gbp.literal('').join(lines),
+                     [(keyword, start, end) for (keyword, start), end
+                      in zip(sections, ends)],
+                     gbp.encoding)
+
+
+def __parse_locus(entries):
     """ Parses the LOCUS tag
 
     Parameters:
-        gbp - GenbankParser object
-            The parser which holds the file pointer of the genbank
-            file.
+        entries - list
+            The keyword lines of the LOCUS section
     Returns:
         A list with the following values:
          1. Locus name - string
@@ -37,7 +82,7 @@ def __parse_locus(gbp):
          5. Genbank division - string
          6. Modification date - string
     """
-    parts = gbp.handle_keyword('LOCUS')
+    parts = ' '.join(entries[0][1]).split()
     # Delete unnecessary parts
     del parts[2]  # Bp
     # Check if we have a type
@@ -46,122 +91,214 @@ def __parse_locus(gbp):
     return parts
 
 
-def __parse_definition(gbp):
-    """ Parses a definition which is more like a description.
+def __parse_definition(header):
+    """ Parses a definition which is more like a description """
+    return __join_section(header, 'DEFINITION', ' ')
 
-    Parameters:
-        gbp - GenbankParser object
-            The parser which holds the file pointer of the genbank
-            file.
-    Returns:
-        A list of length 1 with the description
-    """
-    return [gbp.handle_multiline_keyword('DEFINITION', do_split=False)]
 
+def __parse_accession(header):
+    """ Parses the accessions, which can be multiple in a string """
+    return __join_section(header, 'ACCESSION', ' ')
 
-def __parse_accession_version_keywords(gbp):
-    """ Parses the ACCESSION, VERSION and KEYWORDS part.
 
-    Parameters:
-        gbp - GenbankParser object
-            The parser which holds the file pointer of the genbank
-            file.
-    Returns:
-        A list with the accessions (which can be multiple in a string),
-        a tuple with the version information and a string of keywords
+def __parse_version(header):
+    """ Parses the VERSION to a tuple with the version information """
+    version = __join_section(header, 'VERSION', ' ')
+    return None if version is None else tuple(version.split())
+
+
+def __parse_dblink(header):
+    """ Parses the DBLINK cross references, one on every line """
+    return __join_section(header, 'DBLINK', '\n')
+
+
+def __parse_keywords(header):
+    """ Parses the KEYWORDS to a string """
+    return __join_section(header, 'KEYWORDS', ' ')
+
+
+def __parse_source(header):
+    """ Parses the SOURCE without its ORGANISM """
+    return __join_section(header, 'SOURCE', ' ')
+
+
+def __parse_organism(header):
+    """ Parses the ORGANISM of the SOURCE, with the lineage on the
+    lines after the organism name.
     """
-    accession = gbp.handle_keyword('ACCESSION', do_split=False)
-    versions = tuple(gbp.handle_keyword('VERSION'))
-    # only eat the dblink when it is available, currently not supported
-    gbp.handle_keyword('DBLINK', do_split=False, remove_keyword=False,
-                       raise_error=False)
-    keywords = gbp.handle_multiline_keyword('KEYWORDS', do_split=False)
-    return [accession, versions, keywords]
+    for sections in header.entries('SOURCE', all_sections=True):
+        for keyword, values in sections:
+            if keyword == 'ORGANISM':
+                return '\n'.join(values)
 
 
-def __parse_source(gbp):
-    """ Parses the SOURCE and ORGANISM keywords
+def __parse_publications(header):
+    """ Parses the REFERENCE sections to a list of Publication objects """
+    publications = []
+    for entries in header.entries('REFERENCE', all_sections=True):
+        fields = {}
+        for keyword, values in entries:
+            fields.setdefault(keyword, ' '.join(values))
+        publications.append(Publication(
+            fields['REFERENCE'], fields.get('AUTHORS'), fields.get('TITLE'),
+            fields.get('JOURNAL'), fields.get('PUBMED')))
+    return publications
 
-    Parameters:
-        gbp - GenbankParser object
-            The parser which holds the file pointer of the genbank
-            file.
-    Returns:
-        A list with the organism string and complete string of the ORGANISM
-        keyword
+
+def __parse_comment(header):
+    """ Parses the COMMENT, keeping its lines apart """
+    return __join_section(header, 'COMMENT', '\n')
+
+
+def __join_section(header, keyword, delimiter):
+    """ Joins the lines of the first line with the keyword and the lines
+    continuing it. Returns None when the header has no such keyword.
     """
-    source = gbp.handle_keyword('SOURCE', do_split=False)
-    organism = gbp.handle_multiline_keyword('ORGANISM', delimiter='\n',
-                                            do_split=False)
-    return [source, organism]
+    entries = header.entries(keyword)
+    if not entries:
+        return None
+    return delimiter.join(entries[0][1])
 
 
-def __parse_publications(gbp):
-    """ Parses the publications of this GenBank file.
+# The parsers of the fields which are parsed on first access
+FIELD_PARSERS = {
+    'description': __parse_definition,
+    'accession': __parse_accession,
+    'version': __parse_version,
+    'dblink': __parse_dblink,
+    'keywords': __parse_keywords,
+    'source': __parse_source,
+    'organism': __parse_organism,
+    'publications': __parse_publications,
+    'comment': __parse_comment,
+}
 
-    Parameters:
-        gbp - GenbankParser object
-            The parser which holds the file pointer of the genbank
-            file.
-    Returns:
-        A list in a list which contains all the publications
+
+class RawHeader(object):
+    """ The raw lines of a header, as a string or as bytes when it has
+    been read in binary mode, with the span of every section in it.
     """
-    publications = []
-    # Initialise the parsing of references; publications
-    reference = gbp.handle_multiline_keyword('REFERENCE', do_split=False,
-                                             raise_error=False)
-    # Keep parsing all references
-    while reference is not None:
-        # Parse the data of a publication
-        authors = gbp.handle_multiline_keyword('AUTHORS', do_split=False)
-        title = gbp.handle_multiline_keyword('TITLE', do_split=False)
-        journal = gbp.handle_multiline_keyword('JOURNAL', do_split=False)
-        # PUBMED is optional
-        pubmed = gbp.handle_multiline_keyword('PUBMED', do_split=False,
-                                              raise_error=False)
-        publications.append(Publication(reference, authors, title, journal,
-                                        pubmed))
-        reference = gbp.handle_multiline_keyword('REFERENCE', do_split=False,
-                                                 raise_error=False)
-    return [publications]
-
-
-def __parse_comment(gbp):
-    """ Parses the comment and PRIMARY keyword of this GenBank file.
+
+    def __init__(self, data, sections, encoding):
+        """ Creates a raw header.
 
         Parameters:
-            gbp - GenbankParser object
-                The parser which holds the file pointer of the genbank
-                file.
+            data - string or bytes
+                The lines of the header
+            sections - list
+                A (keyword, start, end) tuple for every section, which
+                starts with a keyword in the first column.
+            encoding - string
+                The encoding of the data when it is bytes
+        """
+        self.data = data
+        self.sections = sections
+        self.encoding = encoding
+
+    def __reduce__(self):
+        return RawHeader, (self.data, self.sections, self.encoding)
+
+    def entries(self, keyword, all_sections=False):
+        """ Splits the section with the keyword into its keyword lines,
+        such as AUTHORS or TITLE in a REFERENCE, with the lines which
+        continue them.
+
+        Parameters:
+            keyword - string
+                The keyword of the section
+            all_sections - boolean. Default: False
+                Whether to split all sections with the keyword
         Returns:
-            An empty list, we are currently not interested in the comments
+            A list of (keyword, values) tuples, where values is a list
+            of the stripped lines. With all_sections set to True, a
+            list with such a list for every section.
         """
-    # Only eat the comment when it is available
-    gbp.handle_multiline_keyword('COMMENT', do_split=False,
-                                 remove_keyword=False, raise_error=False)
-    gbp.handle_multiline_keyword('PRIMARY', do_split=False,
-                                 remove_keyword=False, raise_error=False)
-    return []
+        result = []
+        for section, start, end in self.sections:
+            if section != keyword:
+                continue
+            data = self.data[start:end]
+            if isinstance(data, bytes):
+                data = data.decode(self.encoding)
+            entries = []
+            for line in data.splitlines():
+                line_keyword, value = split_keyword_line(line)
+                if line_keyword or not entries:
+                    entries.append((line_keyword, [value]))
+                else:
+                    entries[-1][1].append(value)
+            if not all_sections:
+                return entries
+            result.append(entries)
+        return result
+
+
+# The attributes set by the constructor of Metadata
+LOCUS_ATTRIBUTES = frozenset([
+    'locus_name', 'seq_length', 'molecule_type', 'division',
+    'molecule_formation', 'modification_date_str', 'header'])
 
 
 class Metadata(object):
+    """ The metadata of a record. The fields of the LOCUS line are set
+    right away, the others are parsed from the raw header when they are
+    first used:
+    description, accession, version, dblink, keywords, source,
+    organism, publications and comment. A field which is not in the
+    header is None.
+    """
+
     def __init__(self, locus_name, seq_length, molecule_type, formation,
-                 gb_division, modification_date, description, accession,
-                 version, keywords, source, organism,
-                 publications):
+                 gb_division, modification_date, description=None,
+                 accession=None, version=None, keywords=None, source=None,
+                 organism=None, publications=None, header=None):
+        """ Creates the metadata of a record. The fields after the
+        modification date are optional, the fields which are given are
+        used instead of parsing them from the header.
+        """
         self.locus_name = locus_name
         self.seq_length = int(seq_length)
         self.molecule_type = molecule_type
         self.division = gb_division
         self.molecule_formation = formation
         self.modification_date_str = modification_date
-        self.description = description
-        self.accession = accession
-        self.version = version
-        self.keywords = keywords
-        self.source = source
-        self.organism = organism
-        self.publications = publications
+        self.header = header
+        fields = (('description', description), ('accession', accession),
+                  ('version', version), ('keywords', keywords),
+                  ('source', source), ('organism', organism),
+                  ('publications', publications))
+        for name, value in fields:
+            if value is not None:
+                setattr(self, name, value)
+
+    def __reduce__(self):
+        # The fields which have been parsed (or set) are kept as the
+        # state, the others are parsed from the header when used
+        fields = {name: value for name, value in self.__dict__.items()
+                  if name not in LOCUS_ATTRIBUTES}
+        return _restore_metadata, ((self.locus_name, self.seq_length,
+                                    self.molecule_type,
+                                    self.molecule_formation, self.division,
+                                    self.modification_date_str),
+                                   self.header), fields or None
+
+    def __getattr__(self, name):
+        # Only called for attributes which have not been set, which
+        # includes the fields which have not been parsed yet
+        parse = FIELD_PARSERS.get(name)
+        if parse is None:
+            raise AttributeError(name)
+        header = self.__dict__.get('header')
+        value = None if header is None else parse(header)
+        setattr(self, name, value)
+        return value
+
+
+def _restore_metadata(locus, header):
+    """ Restores pickled Metadata, of which the parsed fields are set
+    from the pickled state.
+    """
+    return Metadata(*locus, header=header)
 
 
 class Publication(object):
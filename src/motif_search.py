@@ -0,0 +1,304 @@
+""" Searches a Sequence for exact and IUPAC degenerate motifs, such as
+primers and restriction sites, on both strands.
+
+The reverse strand is searched by looking for the reverse complement of
+the motif on the forward strand, so the sequence itself is never
+complemented. Without an index the sequence is scanned with str.find
+(exact motifs) or a regular expression (degenerate motifs). A
+KmerIndex makes the search independent of the length of the sequence:
+it maps every k-mer to its positions, so only the positions starting
+with the first k bases of the motif have to be checked. A motif shorter
+than k is the prefix of a contiguous range of k-mers.
+"""
+from array import array
+from itertools import accumulate, product
+from re import compile, escape
+from struct import Struct
+from sys import byteorder
+
+from .location_parser import ComplementLocation, RangeLocation
+from .origin_parser import reverse_complement
+
+# The bases every IUPAC code stands for
+IUPAC_BASES = {'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T',
+               'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT', 'K': 'GT',
+               'M': 'AC', 'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG',
+               'N': 'ACGT'}
+EXACT_BASES = frozenset('ACGT')
+DEFAULT_K = 8
+# The most k-mers a degenerate motif is expanded to in an index lookup,
+# more degenerate motifs are searched by scanning the sequence
+MAX_EXPANSIONS = 256
+MAGIC = b'GBKMER01'
+# The magic, followed by k, the length of the sequence and the amount
+# of positions of which the k-mer is not indexed
+HEADER = Struct('<8sIQQ')
+# Positions are stored in 4 bytes, which holds sequences up to 4G bases
+POSITION_TYPE = 'I'
+MAX_K = 12
+# Translation of the bases to their 2 bit code, other bytes become 4
+BASE_CODES = bytes(b'ACGT'.find(byte) % 5 for byte in range(256))
+INVALID_CODE = 4
+
+
+def search(sequence, motif, strand=0, index=None):
+    """ Finds all occurrences of a motif, including overlapping ones.
+
+    Parameters:
+        sequence - Sequence object
+            The upper cased sequence to search, as parsed by
+            GenbankParser.parse_origin
+        motif - string
+            The motif, which may contain IUPAC codes such as N or R
+        strand - int. Default: 0
+            1 for the forward strand, -1 for the reverse strand and 0
+            for both strands
+        index - KmerIndex object. Default: None
+            An index of the sequence, which is used unless the motif is
+            very degenerate
+    Returns:
+        A list of RangeLocation objects for hits on the forward strand
+        and ComplementLocation objects for hits on the reverse strand,
+        sorted by their first base. A palindromic motif, such as the
+        GAATTC site of EcoRI, is found on both strands.
+    Raises:
+        ValueError when the motif is empty or contains other characters
+        than IUPAC codes, or when the strand is invalid.
+    """
+    motif = motif.upper()
+    if not motif or not set(motif) <= IUPAC_BASES.keys():
+        raise ValueError('Invalid motif: {}'.format(motif))
+    if strand not in (0, 1, -1):
+        raise ValueError('Strand must be 1, -1 or 0')
+    bases = sequence.get_sequence()
+    hits = []
+    if strand != -1:
+        hits += [(start, 1) for start in __find(bases, motif, index)]
+    if strand != 1:
+        hits += [(start, -1) for start in
+                 __find(bases, reverse_complement(motif), index)]
+    hits.sort()
+    locations = []
+    for start, hit_strand in hits:
+        location = RangeLocation.from_range(start + 1, start + len(motif))
+        if hit_strand == -1:
+            location = ComplementLocation(location)
+        locations.append(location)
+    return locations
+
+
+def count(sequence, motif, strand=0, index=None):
+    """ Counts the occurrences of a motif, see 'search'.
+
+    Returns:
+        The amount of hits as int
+    """
+    return len(search(sequence, motif, strand, index))
+
+
+def __find(bases, motif, index):
+    """ Finds the 0 based starts of a motif on the forward strand """
+    if index is not None:
+        starts = index.find(motif)
+        if starts is not None:
+            return starts
+    if set(motif) <= EXACT_BASES:
+        starts = []
+        start = bases.find(motif)
+        while start != -1:
+            starts.append(start)
+            start = bases.find(motif, start + 1)
+        return starts
+    # A lookahead finds overlapping hits as well
+    pattern = compile('(?={})'.format(motif_pattern(motif)))
+    return [found.start() for found in pattern.finditer(bases)]
+
+
+def motif_pattern(motif):
+    """ Creates a regular expression for a motif with IUPAC codes.
+
+    Parameters:
+        motif - string
+            The upper cased motif
+    Returns:
+        The pattern as string, in which every degenerate code is a
+        character class.
+    """
+    return ''.join(escape(IUPAC_BASES[code]) if len(IUPAC_BASES[code]) == 1
+                   else '[{}]'.format(IUPAC_BASES[code]) for code in motif)
+
+
+class KmerIndex(object):
+    """ Maps every k-mer of a sequence to the positions it starts at.
+
+    The positions of all k-mers are kept in one array sorted by k-mer,
+    with an array of offsets into it for every possible k-mer, so the
+    index takes 4 bytes for every base plus 4 bytes for every possible
+    k-mer. K-mers with other bases than A, C, G and T, and the last
+    k - 1 positions, are kept apart as unindexed positions. The index
+    can be stored with 'save' and restored with 'load'.
+    """
+
+    def __init__(self, sequence, k=DEFAULT_K):
+        """ Builds the index of a sequence.
+
+        Parameters:
+            sequence - Sequence object
+                The upper cased sequence to index
+            k - int. Default: 8
+                The length of the k-mers, at most 12. Longer k-mers
+                make the lookup of long motifs faster, but the index
+                holds 4 ** k offsets.
+        Raises:
+            ValueError when k is out of range
+        """
+        if not 1 <= k <= MAX_K:
+            raise ValueError('k must be in between 1 and {}'.format(MAX_K))
+        self.k = k
+        self.bases = sequence.get_sequence()
+        self.offsets, self.positions, self.unindexed = self.__build()
+
+    def __build(self):
+        """ Sorts the positions by k-mer with a counting sort """
+        k = self.k
+        mask = (1 << 2 * k) - 1
+        # The code of the k-mer starting at every position, -1 for
+        # k-mers with other bases
+        window_codes = array('i', [-1]) * max(len(self.bases) - k + 1, 0)
+        counts = array(POSITION_TYPE, [0]) * (mask + 2)
+        code = 0
+        valid = 0  # The amount of valid bases up to the position
+        for position, base in enumerate(
+                self.bases.encode('ascii').translate(BASE_CODES)):
+            if base == INVALID_CODE:
+                valid = 0
+                continue
+            code = (code << 2 | base) & mask
+            valid += 1
+            if valid >= k:
+                window_codes[position - k + 1] = code
+                counts[code + 1] += 1
+        offsets = array(POSITION_TYPE, accumulate(counts))
+        next_slot = array(POSITION_TYPE, offsets)
+        positions = array(POSITION_TYPE, [0]) * offsets[-1]
+        unindexed = array(POSITION_TYPE)
+        for start, code in enumerate(window_codes):
+            if code >= 0:
+                positions[next_slot[code]] = start
+                next_slot[code] += 1
+            else:
+                unindexed.append(start)
+        unindexed.extend(range(len(window_codes), len(self.bases)))
+        return offsets, positions, unindexed
+
+    def find(self, motif):
+        """ Finds the starts of a motif on the forward strand.
+
+        Parameters:
+            motif - string
+                The upper cased motif, which may contain IUPAC codes
+        Returns:
+            A sorted list with the 0 based starts of the motif, or None
+            when the first k bases of the motif expand to more than
+            MAX_EXPANSIONS k-mers.
+        """
+        k = self.k
+        choices = [IUPAC_BASES[code] for code in motif[:k]]
+        expansions = 1
+        for bases in choices:
+            expansions *= len(bases)
+        if expansions > MAX_EXPANSIONS:
+            return None
+        # A motif shorter than k matches the range of k-mers it is the
+        # prefix of
+        shift = 2 * (k - len(choices))
+        starts = []
+        for kmer in product(*choices):
+            code = 0
+            for base in kmer:
+                code = code << 2 | BASE_CODES[ord(base)]
+            starts += self.positions[self.offsets[code << shift]:
+                                     self.offsets[(code + 1) << shift]]
+        if shift:
+            # The motif can also be at a position of which the k-mer
+            # has not been indexed
+            pattern = compile(motif_pattern(motif))
+            starts += [start for start in self.unindexed
+                       if pattern.match(self.bases, start)]
+        if expansions > 1 or shift:
+            starts.sort()
+        # Check the rest of the motif at every candidate
+        rest = motif[k:]
+        if rest and set(rest) <= EXACT_BASES:
+            starts = [start for start in starts
+                      if self.bases.startswith(rest, start + k)]
+        elif rest:
+            pattern = compile(motif_pattern(rest))
+            starts = [start for start in starts
+                      if pattern.match(self.bases, start + k)]
+        return starts
+
+    def save(self, filename):
+        """ Stores the index in a binary file.
+
+        Parameters:
+            filename - string
+                The file to write to
+        """
+        with open(filename, 'wb') as filehandle:
+            filehandle.write(HEADER.pack(MAGIC, self.k, len(self.bases),
+                                         len(self.unindexed)))
+            for column in (self.offsets, self.positions, self.unindexed):
+                _little_endian(column).tofile(filehandle)
+
+    @classmethod
+    def load(cls, filename, sequence):
+        """ Restores an index which has been stored with 'save'.
+
+        Parameters:
+            filename - string
+                The file to read from
+            sequence - Sequence object
+                The sequence which has been indexed
+        Returns:
+            A KmerIndex object
+        Raises:
+            ValueError when the file is no index or the index belongs
+            to a sequence of another length.
+        """
+        bases = sequence.get_sequence()
+        with open(filename, 'rb') as filehandle:
+            magic, k, length, unindexed_count = HEADER.unpack(
+                filehandle.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('{} is no k-mer index'.format(filename))
+            if length != len(bases):
+                raise ValueError('The index of {} bases does not belong to '
+                                 'a sequence of {} bases'
+                                 .format(length, len(bases)))
+            offsets = array(POSITION_TYPE)
+            offsets.fromfile(filehandle, (1 << 2 * k) + 1)
+            offsets = _little_endian(offsets)
+            positions = array(POSITION_TYPE)
+            positions.fromfile(filehandle, offsets[-1])
+            positions = _little_endian(positions)
+            unindexed = array(POSITION_TYPE)
+            unindexed.fromfile(filehandle, unindexed_count)
+            unindexed = _little_endian(unindexed)
+        index = cls.__new__(cls)
+        index.k = k
+        index.bases = bases
+        index.offsets = offsets
+        index.positions = positions
+        index.unindexed = unindexed
+        return index
+
+
+def _little_endian(column):
+    """ Converts an array between the native and little endian byte
+    order, which is the order of the stored index.
+    """
+    if byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
@@ -1,6 +1,37 @@
-from re import match, split, IGNORECASE
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from hashlib import blake2b
+from re import match, IGNORECASE
 
-from .location_parser import RemoteLocation
+from .location_parser import ComplementLocation, JoinedLocation, \
+    RemoteLocation
+from .readers import NEWLINE, read_span, read_span_blocks
+from .tokenizer import split_origin_line
+
+BASES_PER_LINE = 60
+# The size of the digest which addresses a sequence by its content
+SEQUENCE_DIGEST_SIZE = 32
+# The amount of bytes of the ORIGIN block hashed at once
+HASH_BLOCK_SIZE = 1 << 20
+# The amount of lines hashed at once for sources without access to
+# their bytes
+HASH_LINES = 10000
+# Translation of the raw bytes of the ORIGIN block to bases: upper case
+# the letters and delete the coordinates and whitespace
+UPPER_BYTES = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz',
+                              b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+DELETE_BYTES = b' \t\r\n0123456789'
+COMPLEMENT = str.maketrans('ACGTUNRYKMBVDHacgtunrykmbvdh',
+                           'TGCAANYRMKVBHDtgcaanyrmkvbhd')
+# Packing of bases in 2 bits: the codes of the bases, of which all other
+# characters get the code of A and are kept as exceptions
+PACK_BYTES = bytes(max(b'ACGT'.find(byte), 0) for byte in range(256))
+UNPACK_BYTES = bytes.maketrans(b'\x00\x01\x02\x03', b'ACGT')
+# Marks the exceptions with 1
+EXCEPTION_BYTES = bytes(int(byte not in b'ACGT') for byte in range(256))
+# Sequences which are shorter, or which have more than one run of
+# exceptions per this amount of bases, are not packed
+MIN_PACKED_LENGTH = 256
+BASES_PER_EXCEPTION = 64
 
 
 def parse_origin(gbp):
@@ -15,16 +46,391 @@ def parse_origin(gbp):
     """
     # Check if the header is there
     gbp.handle_keyword('ORIGIN', do_split=False, remove_keyword=False)
-    sequence = ''
-    # Keep reading lines when they start with a number
-    line = gbp.read_valid_line().strip()
-    while match('^\d+.*', line):
-        # Remove the whitespace
-        splitted = split('\s+', line)
-        del splitted[0]  # Removes the number which is irrelevant to us
-        sequence += ''.join(splitted).upper()
-        line = gbp.read_valid_line().strip()
-    return Sequence(sequence)
+    gbp.origin_position = gbp.filehandle.tell()
+    if gbp.binary:
+        # Decode the raw bytes of the block at once instead of line by
+        # line
+        span = read_span(gbp.filehandle, gbp.origin_position, (b'//',))
+        if span is not None:
+            return __assemble([_decode_chunk(bytes(span[0]))])
+    return __read_sequence_lines(gbp)
+
+
+def __read_sequence_lines(gbp):
+    """ Reads the lines of the ORIGIN block one by one """
+    parts = []
+    # Keep reading lines when they start with a number, the number
+    # itself is irrelevant to us
+    coordinate, bases = split_origin_line(gbp.read_valid_line())
+    while coordinate is not None:
+        parts.append(bases)
+        coordinate, bases = split_origin_line(gbp.read_valid_line())
+    return Sequence(gbp.decode(gbp.literal('').join(parts).upper()))
+
+
+def hash_origin(gbp, sink=None):
+    """ Calculates the digest of the sequence in the ORIGIN block while
+    reading it, without building the sequence. The digest is the same as
+    'sequence_digest' gives for the parsed sequence.
+
+    Parameters:
+        gbp - GenbankParser object
+            The parser which holds the file pointer of the genbank
+            file.
+        sink - callable. Default: None
+            A function which is called with every block of upper cased
+            bases (as bytes), for instance the write method of a file.
+    Returns:
+        A tuple with the hexadecimal digest and the length of the
+        sequence
+    """
+    gbp.handle_keyword('ORIGIN', do_split=False, remove_keyword=False)
+    gbp.origin_position = gbp.filehandle.tell()
+    digest = blake2b(digest_size=SEQUENCE_DIGEST_SIZE)
+    length = 0
+    for bases in __origin_blocks(gbp):
+        digest.update(bases)
+        length += len(bases)
+        if sink is not None:
+            sink(bases)
+    return digest.hexdigest(), length
+
+
+def __origin_blocks(gbp):
+    """ Yields the upper cased bases of the ORIGIN block in blocks """
+    blocks = read_span_blocks(gbp.filehandle, gbp.origin_position, (b'//',),
+                              HASH_BLOCK_SIZE)
+    if blocks is not None:
+        for block in blocks:
+            yield bytes(block).translate(UPPER_BYTES, DELETE_BYTES)
+        return
+    # The source gives no access to its bytes, so read it line by line
+    empty = gbp.literal('')
+    parts = []
+    coordinate, bases = split_origin_line(gbp.read_valid_line())
+    while coordinate is not None:
+        parts.append(bases)
+        if len(parts) == HASH_LINES:
+            yield __encode_bases(gbp, empty.join(parts))
+            parts = []
+        coordinate, bases = split_origin_line(gbp.read_valid_line())
+    if parts:
+        yield __encode_bases(gbp, empty.join(parts))
+
+
+def __encode_bases(gbp, bases):
+    """ Upper cases bases read from lines and converts them to bytes """
+    if gbp.binary:
+        return bases.translate(UPPER_BYTES)
+    return bases.upper().encode('ascii')
+
+
+def sequence_digest(bases):
+    """ Calculates the digest which addresses a sequence by its content.
+
+    Parameters:
+        bases - string
+            The upper cased bases, as parsed by 'parse_origin'
+    Returns:
+        The hexadecimal digest as string
+    """
+    return blake2b(bases.encode('ascii'),
+                   digest_size=SEQUENCE_DIGEST_SIZE).hexdigest()
+
+
+def parse_origin_parallel(gbp, workers, use_processes=True):
+    """ Parses the ORIGIN to a Sequence object by splitting the block
+    into chunks of lines which are decoded concurrently. This pays off
+    for very large sequences, such as plant chromosomes.
+
+    Parameters:
+        gbp - GenbankParser object
+            The parser which holds the file pointer of the genbank
+            file.
+        workers - int
+            The amount of chunks and workers
+        use_processes - boolean. Default: True
+            Whether to decode in a process pool. A thread pool is used
+            otherwise, which only decodes concurrently on Python builds
+            without a global interpreter lock.
+    Returns:
+        A Sequence object.
+    Raises:
+        ValueError when the coordinates of the lines do not match the
+        decoded bases, which means a chunk is missing or out of order.
+    """
+    gbp.handle_keyword('ORIGIN', do_split=False, remove_keyword=False)
+    gbp.origin_position = gbp.filehandle.tell()
+    span = read_span(gbp.filehandle, gbp.origin_position, (b'//',))
+    if span is None:
+        # The source gives no access to its bytes
+        return __read_sequence_lines(gbp)
+    chunks = __split_lines(span[0], workers)
+    pool = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool(workers) as executor:
+        decoded = list(executor.map(_decode_chunk, chunks))
+    return __assemble(decoded)
+
+
+def __assemble(decoded):
+    """ Assembles the decoded chunks in one buffer, checking they follow
+    each other.
+    """
+    sequence = bytearray(sum(len(bases) for _, bases in decoded))
+    position = 0
+    for first, bases in decoded:
+        if first is None:
+            continue
+        if first != position + 1:
+            raise ValueError('ORIGIN line {} was expected, found {}'
+                             .format(position + 1, first))
+        sequence[position:position + len(bases)] = bases
+        position += len(bases)
+    return Sequence(sequence.decode('ascii'))
+
+
+def __split_lines(data, count):
+    """ Splits data into at most count chunks of whole lines """
+    size = len(data) // count + 1
+    chunks = []
+    start = 0
+    while start < len(data):
+        newline = NEWLINE.search(data, start + size)
+        end = newline.end() if newline else len(data)
+        chunks.append(bytes(data[start:end]))
+        start = end
+    return chunks
+
+
+def _decode_chunk(chunk):
+    """ Decodes a chunk of lines of the ORIGIN block.
+
+    Parameters:
+        chunk - bytes
+            Complete lines of the ORIGIN block
+    Returns:
+        A tuple with the coordinate of the first line and the bases of
+        the chunk. The coordinate is None for a chunk without lines.
+    Raises:
+        ValueError when the coordinate of the last line does not match
+        the amount of bases in the chunk.
+    """
+    lines = chunk.strip()
+    if not lines:
+        return None, b''
+    bases = chunk.translate(UPPER_BYTES, DELETE_BYTES)
+    first = int(lines.split(None, 1)[0])
+    last_line = lines.rsplit(b'\n', 1)[-1]
+    last = int(last_line.split(None, 1)[0])
+    # The last line must start right after the bases in front of it
+    last_bases = len(last_line.translate(None, DELETE_BYTES))
+    if first + len(bases) - last_bases != last:
+        raise ValueError('ORIGIN lines {}..{} do not hold the expected '
+                         'amount of bases'.format(first, last))
+    return first, bases
+
+
+def fetch_region(gbp, start, end, strand=1):
+    """ Reads the bases of a region from the ORIGIN block by seeking
+    to the lines which hold them.
+
+    Parameters:
+        gbp - GenbankParser object
+            The parser of which the 'origin_position' has been set
+        start - int
+            The first base of the region, starting at 1
+        end - int
+            The last base of the region, which is included
+        strand - int. Default: 1
+            1 for the forward strand, -1 for the reverse complement
+    Returns:
+        A string with the upper cased bases of the region
+    Raises:
+        ValueError when the region or strand is invalid, or when the
+        region ends past the end of the sequence
+    """
+    if start < 1 or end < start:
+        raise ValueError('Invalid region: {}..{}'.format(start, end))
+    if strand not in (1, -1):
+        raise ValueError('Strand must be 1 or -1')
+    filehandle = gbp.filehandle
+    position = filehandle.tell()
+    empty = gbp.literal('')
+    try:
+        bases = __read_region(filehandle, gbp.origin_position, start, end,
+                              empty)
+        if bases is None:
+            bases = __scan_region(filehandle, gbp.origin_position, start,
+                                  end, empty)
+    finally:
+        filehandle.seek(position)
+    if len(bases) != end - start + 1:
+        raise ValueError('Region {}..{} ends past the end of the sequence'
+                         .format(start, end))
+    bases = gbp.decode(bases).upper()
+    if strand == -1:
+        return reverse_complement(bases)
+    return bases
+
+
+def __read_region(filehandle, origin_position, start, end, empty):
+    """ Reads the region by calculating the position of its lines.
+    Returns None when the ORIGIN block does not have the standard
+    layout, such as lines of another length, or when the region is not
+    complete.
+    """
+    # The length of a line (in the units of the file position) follows
+    # from the position after the first line
+    filehandle.seek(origin_position)
+    coordinate, bases = split_origin_line(filehandle.readline())
+    if coordinate is None or int(coordinate) != 1 or \
+            len(bases) != BASES_PER_LINE:
+        return None
+    line_length = filehandle.tell() - origin_position
+    first_line = (start - 1) // BASES_PER_LINE
+    last_line = (end - 1) // BASES_PER_LINE
+    filehandle.seek(origin_position + first_line * line_length)
+    lines = filehandle.read((last_line - first_line + 1) *
+                            line_length).splitlines()
+    # Text files which translate newlines can return more lines
+    del lines[last_line - first_line + 1:]
+    parts = []
+    # Check that every line has the expected coordinate and length, a
+    # line of another length moves the lines after it
+    for number, line in enumerate(lines, first_line):
+        coordinate, bases = split_origin_line(line)
+        if coordinate is None or \
+                int(coordinate) != number * BASES_PER_LINE + 1:
+            return None
+        if number != last_line and len(bases) != BASES_PER_LINE:
+            return None
+        parts.append(bases)
+    offset = first_line * BASES_PER_LINE
+    bases = empty.join(parts)[start - 1 - offset:end - offset]
+    # A region which ends past the sequence is checked by the scan
+    return bases if len(bases) == end - start + 1 else None
+
+
+def __scan_region(filehandle, origin_position, start, end, empty):
+    """ Reads the region by reading the ORIGIN block line by line,
+    for blocks which do not have the standard layout. The bases are
+    counted like 'parse_origin' does, so wrong coordinates are ignored.
+    """
+    filehandle.seek(origin_position)
+    parts = []
+    first = 1  # The position of the first base of the parts
+    line_start = 1
+    coordinate, bases = split_origin_line(filehandle.readline())
+    while coordinate is not None:
+        if line_start + len(bases) > start:
+            if not parts:
+                first = line_start
+            parts.append(bases)
+        line_start += len(bases)
+        if line_start > end:
+            break
+        coordinate, bases = split_origin_line(filehandle.readline())
+    return empty.join(parts)[start - first:end - first + 1]
+
+
+def fetch_location(gbp, location):
+    """ Reads the bases of a Location from the ORIGIN block.
+
+    Parameters:
+        gbp - GenbankParser object
+            The parser to read with
+        location - Location object
+            The location to read
+    Returns:
+        A string with the bases of the location
+    Raises:
+        ValueError for a RemoteLocation, which is not in this record
+    """
+    if isinstance(location, RemoteLocation):
+        raise ValueError('Cannot fetch remote location ' + str(location))
+    if isinstance(location, ComplementLocation):
+        return reverse_complement(fetch_location(gbp, location.locations[0]))
+    if isinstance(location, JoinedLocation):
+        return ''.join(fetch_location(gbp, part)
+                       for part in location.locations)
+    first, last = location.get_range()
+    return gbp.fetch_region(first, last)
+
+
+def reverse_complement(sequence):
+    """ Creates the reverse complement of a DNA or RNA string,
+    including the IUPAC ambiguity codes.
+
+    Parameters:
+        sequence - string
+            The sequence to complement
+    Returns:
+        The reverse complement as string
+    """
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+def pack_bases(bases):
+    """ Packs a DNA sequence into 2 bits per base, which is used to
+    pickle Sequence objects. Runs of other characters (such as N or
+    lower case bases) are kept as exceptions, sequences with too many
+    of them (such as proteins) are not packed.
+
+    Parameters:
+        bases - string
+            The sequence to pack
+    Returns:
+        A (length, packed bytes, exceptions) tuple, where exceptions is
+        a tuple of (position, string) runs. Or the string itself when
+        it is not packed.
+    """
+    if len(bases) < MIN_PACKED_LENGTH or not bases.isascii():
+        return bases
+    data = bases.encode('ascii')
+    max_exceptions = len(data) // BASES_PER_EXCEPTION
+    exceptions = []
+    if data.translate(None, b'ACGT'):
+        # Find the runs of exceptions with fast searches for the marks
+        flags = data.translate(EXCEPTION_BYTES)
+        start = flags.find(1)
+        while start != -1:
+            if len(exceptions) == max_exceptions:
+                return bases
+            end = flags.find(0, start)
+            if end == -1:
+                end = len(data)
+            exceptions.append((start, data[start:end].decode('ascii')))
+            start = flags.find(1, end)
+    codes = data.translate(PACK_BYTES) + bytes(-len(data) % 4)
+    # Every code fits in 2 bits of a byte, so the 4 codes of a packed
+    # byte are combined by shifting big integers of every 4th code
+    packed = 0
+    for index in range(4):
+        packed |= int.from_bytes(codes[index::4], 'little') << 2 * index
+    return (len(data), packed.to_bytes(len(codes) // 4, 'little'),
+            tuple(exceptions))
+
+
+def unpack_bases(packed):
+    """ Unpacks a sequence packed by 'pack_bases'.
+
+    Returns:
+        The sequence as string
+    """
+    if isinstance(packed, str):
+        return packed
+    length, data, exceptions = packed
+    value = int.from_bytes(data, 'little')
+    mask = int.from_bytes(b'\x03' * len(data), 'little')
+    codes = bytearray(len(data) * 4)
+    for index in range(4):
+        codes[index::4] = ((value >> 2 * index) & mask).to_bytes(
+            len(data), 'little')
+    del codes[length:]
+    bases = codes.translate(UNPACK_BYTES)
+    for position, run in exceptions:
+        bases[position:position + len(run)] = run.encode('ascii')
+    return bases.decode('ascii')
 
 
 class Sequence(object):
@@ -55,6 +461,12 @@ class Sequence(object):
         self.sequence = sequence
         self.accession = None
 
+    def __reduce__(self):
+        # Also pickles subclasses (such as a SharedSequence) as a
+        # Sequence of its bases
+        return _restore_sequence, (pack_bases(self.get_sequence()),
+                                   self.accession)
+
     def get_sequence(self):
         """ Retrieves the string sequence of this object """
         return self.sequence
@@ -144,3 +556,10 @@ class Sequence(object):
             elif char == 'G':
                 reverse = 'C' + reverse
         return Sequence(reverse)
+
+
+def _restore_sequence(packed, accession):
+    """ Recreates a pickled Sequence from its packed bases """
+    sequence = Sequence(unpack_bases(packed))
+    sequence.accession = accession
+    return sequence
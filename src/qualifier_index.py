@@ -0,0 +1,156 @@
+""" A hash index over the identifier qualifiers of features, so a
+feature can be found by for instance its /locus_tag without scanning
+all features.
+"""
+from json import dump, load
+
+DEFAULT_QUALIFIERS = ('locus_tag', 'gene', 'protein_id', 'db_xref')
+DB_XREF = 'db_xref'
+
+
+class QualifierIndex(object):
+    """ Maps the values of selected qualifiers to the positions of the
+    features in the list returned by 'parse_features'.
+
+    The index is filled while the features are parsed, by giving it to
+    GenbankParser.parse_features. Every occurrence of a qualifier is
+    indexed, so features with multiple /db_xref qualifiers can be found
+    by each of them. The /db_xref values are split into a database and
+    an identifier.
+    """
+
+    def __init__(self, qualifiers=DEFAULT_QUALIFIERS):
+        """ Creates an empty index.
+
+        Parameters:
+            qualifiers - iterable. Default: DEFAULT_QUALIFIERS
+                The names of the qualifiers to index
+        """
+        self.qualifiers = {qualifier: {} for qualifier in qualifiers}
+
+    def add(self, position, key, value):
+        """ Adds a qualifier of a feature to the index. Qualifiers
+        which are not indexed are ignored.
+
+        Parameters:
+            position - int
+                The position of the feature
+            key - string
+                The name of the qualifier
+            value - string
+                The value of the qualifier
+        """
+        values = self.qualifiers.get(key)
+        if values is None:
+            return
+        if key == DB_XREF:
+            value = split_db_xref(value)
+        positions = values.get(value)
+        if positions is None:
+            values[value] = [position]
+        elif positions[-1] != position:
+            positions.append(position)
+
+    def merge(self, other, offset):
+        """ Adds the entries of another index, of which the positions
+        are relative to a later part of the features.
+
+        Parameters:
+            other - QualifierIndex object
+                The index to add
+            offset - int
+                The position of the first feature of the other index
+        """
+        for key, values in other.qualifiers.items():
+            merged = self.qualifiers.setdefault(key, {})
+            for value, positions in values.items():
+                merged.setdefault(value, []).extend(
+                    position + offset for position in positions)
+
+    def lookup(self, key, value):
+        """ Looks up the features with the given qualifier value.
+
+        Parameters:
+            key - string
+                The name of the qualifier
+            value - string
+                The value of the qualifier. For /db_xref this can be
+                the 'database:identifier' string or a tuple of the
+                database and the identifier.
+        Returns:
+            A list with the positions of the features, which is empty
+            when there are none.
+        Raises:
+            KeyError when the qualifier is not indexed
+        """
+        if key == DB_XREF and isinstance(value, str):
+            value = split_db_xref(value)
+        return list(self.qualifiers[key].get(value, ()))
+
+    def lookup_features(self, features, key, value):
+        """ Looks up the features with the given qualifier value.
+
+        Parameters:
+            features - list
+                The list of Feature objects which has been indexed
+            key - string
+                The name of the qualifier
+            value - string
+                The value of the qualifier
+        Returns:
+            A list of Feature objects
+        """
+        return [features[position] for position in self.lookup(key, value)]
+
+    def save(self, filename):
+        """ Stores the index as JSON, for instance next to a record
+        cache, so lookups can be done without loading the features.
+
+        Parameters:
+            filename - string
+                The file to write to
+        """
+        data = {}
+        for key, values in self.qualifiers.items():
+            if key == DB_XREF:
+                values = {':'.join(value): positions
+                          for value, positions in values.items()}
+            data[key] = values
+        with open(filename, 'w') as filehandle:
+            dump(data, filehandle)
+
+    @classmethod
+    def load(cls, filename):
+        """ Restores an index which has been stored with 'save'.
+
+        Parameters:
+            filename - string
+                The file to read from
+        Returns:
+            A QualifierIndex object
+        """
+        with open(filename, 'r') as filehandle:
+            data = load(filehandle)
+        index = cls(data.keys())
+        for key, values in data.items():
+            if key == DB_XREF:
+                values = {split_db_xref(value): positions
+                          for value, positions in values.items()}
+            index.qualifiers[key] = values
+        return index
+
+
+def split_db_xref(value):
+    """ Splits a /db_xref value into its database and identifier.
+
+    Parameters:
+        value - string
+            A value like 'GeneID:2'
+    Returns:
+        A tuple with the database and the identifier. The database is
+        an empty string when the value has no database.
+    """
+    database, separator, identifier = value.partition(':')
+    if not separator:
+        return '', value
+    return database, identifier
@@ -0,0 +1,687 @@
+""" Line readers which give the GenbankParser the same readline, tell
+and seek interface for every kind of source it can parse:
+    - a filename, which is opened as a regular text file
+    - bytes, bytearray or memoryview objects
+    - readable text or binary file objects, seekable or not
+
+In binary mode the lines are returned as bytes instead, without
+decoding them.
+"""
+from io import BufferedIOBase, RawIOBase
+from os.path import exists
+from queue import Empty, Queue
+from re import compile, escape
+from threading import Event, Thread
+from time import perf_counter
+
+DEFAULT_ENCODING = 'utf-8'
+DEFAULT_BLOCK_SIZE = 1 << 16
+SPAN_BLOCK_SIZE = 1 << 24
+MARKER_LOOKBACK = 64
+NEWLINE = compile(b'\n')
+PREFETCH_BLOCK_SIZE = 1 << 20
+
+
+def open_source(source, encoding=DEFAULT_ENCODING, binary=False, prefetch=0,
+                prefetch_block_size=PREFETCH_BLOCK_SIZE):
+    """ Creates the object the GenbankParser reads its lines from.
+
+    Parameters:
+        source - string, bytes-like object or file object
+            A filename, an in-memory buffer or a readable file object
+        encoding - string. Default: 'utf-8'
+            The encoding used to decode binary sources
+        binary - boolean. Default: False
+            Whether the lines are returned as bytes, which requires a
+            source holding bytes.
+        prefetch - int. Default: 0
+            The amount of blocks a PrefetchReader reads ahead, 0 to
+            read without a reader thread. Only used for filenames and
+            seekable binary file objects.
+        prefetch_block_size - int. Default: 1048576
+            The size of the blocks read ahead
+    Returns:
+        An object with the readline, tell, seek and close methods of a
+        text file, or of a binary file in binary mode. When the source
+        is a seekable file object of the right kind, the source itself
+        is returned.
+    Raises:
+        ValueError when a filename does not exist on the filesystem
+        TypeError when the source is of an unsupported type
+    """
+    if isinstance(source, str):
+        if not exists(source):
+            raise ValueError('File {} does not exist.'.format(source))
+        if prefetch:
+            return PrefetchReader(open(source, 'rb', buffering=0), encoding,
+                                  binary, prefetch, prefetch_block_size,
+                                  close_file=True)
+        if binary:
+            return open(source, 'rb')
+        return open(source, 'r', encoding=encoding)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BufferReader(source, encoding, binary)
+    if not hasattr(source, 'read'):
+        raise TypeError('Cannot parse from {}'.format(type(source).__name__))
+    # Reading 0 characters tells whether this is a text or binary file
+    returns_bytes = isinstance(source.read(0), bytes)
+    if binary and not returns_bytes:
+        raise TypeError('Binary mode requires a binary file object')
+    seekable = getattr(source, 'seekable', None)
+    if seekable is not None and seekable():
+        if returns_bytes and prefetch:
+            return PrefetchReader(source, encoding, binary, prefetch,
+                                  prefetch_block_size)
+        if returns_bytes and not binary:
+            return BinaryFileReader(source, encoding)
+        return source
+    return StreamReader(source, encoding, binary=binary)
+
+
+def read_span(filehandle, position, markers, skip_marker=True):
+    """ Reads the bytes from a position up to the first line which starts
+    with one of the markers, without decoding them.
+
+    Parameters:
+        filehandle - object returned by open_source
+            The file handle of a parser
+        position - int
+            The position to start reading from, as returned by 'tell'
+        markers - tuple
+            The bytes a line which ends the span can start with, such
+            as (b'//',)
+        skip_marker - boolean. Default: True
+            Whether the file handle continues after the line with the
+            marker, or at the start of that line.
+    Returns:
+        A tuple with a bytes-like object holding the span and the
+        position the file handle has been set to. When there is no
+        line with a marker, the span runs to the end of the source.
+        When the source has no access to its bytes (streams and
+        StringIO), None is returned instead and the file handle is not
+        moved.
+    """
+    pattern = __marker_pattern(markers)
+    if isinstance(filehandle, BufferReader):
+        data = filehandle.buffer[position:]
+    else:
+        data = _read_raw_span(filehandle, position, pattern)
+        if data is None:
+            return None
+    end = _find_line(pattern, data)
+    if end == -1:
+        end = after = len(data)
+    else:
+        after = end
+        if skip_marker:
+            newline = NEWLINE.search(data, end)
+            after = newline.end() if newline else len(data)
+    # Let the file handle continue after the span
+    filehandle.seek(position + after)
+    return data[:end], position + after
+
+
+def read_span_blocks(filehandle, position, markers,
+                     block_size=DEFAULT_BLOCK_SIZE):
+    """ Reads the bytes from a position up to the first line which starts
+    with one of the markers in blocks of whole lines, so a long span is
+    never held in memory as a whole. See 'read_span'.
+
+    Parameters:
+        filehandle - object returned by open_source
+            The file handle of a parser
+        position - int
+            The position to start reading from, as returned by 'tell'
+        markers - tuple
+            The bytes a line which ends the span can start with
+        block_size - int. Default: 65536
+            The amount of bytes to read at once
+    Returns:
+        A generator which yields bytes-like objects with whole lines of
+        the span. Once it is exhausted, the file handle continues after
+        the line with the marker. When the source has no access to its
+        bytes, None is returned instead.
+    """
+    if isinstance(filehandle, BufferReader):
+        # The buffer is in memory already
+        span = read_span(filehandle, position, markers)
+        return iter([span[0]])
+    raw = _raw_file(filehandle)
+    if raw is None:
+        return None
+    return __iterate_span(filehandle, raw, position,
+                          __marker_pattern(markers), block_size)
+
+
+def __iterate_span(filehandle, raw, position, pattern, block_size):
+    """ Yields the blocks of lines of a span, see 'read_span_blocks' """
+    raw.seek(position)
+    pending = b''  # The start of a line which continues in the next block
+    while True:
+        block = raw.read(block_size)
+        data = pending + block
+        # Only whole lines are checked for a marker, which makes every
+        # block start at the start of a line
+        cut = len(data) if not block else data.rfind(b'\n') + 1
+        lines, pending = data[:cut], data[cut:]
+        end = _find_line(pattern, lines)
+        if end != -1:
+            newline = lines.find(b'\n', end)
+            after = newline + 1 if newline != -1 else len(lines)
+            if end:
+                yield lines[:end]
+            filehandle.seek(position + after)
+            return
+        if lines:
+            yield lines
+        position += cut
+        if not block:
+            filehandle.seek(position)
+            return
+
+
+def __marker_pattern(markers):
+    """ Compiles the pattern of a line which starts with a marker """
+    # Matching the newline in front of a marker is much faster than
+    # matching the start of a line with MULTILINE
+    return compile(b'\n(?:' + b'|'.join(escape(marker)
+                                          for marker in markers) + b')')
+
+
+def _raw_file(filehandle):
+    """ Returns the binary file object under a file handle, or None
+    when the source gives no access to its bytes.
+    """
+    if isinstance(filehandle, BinaryFileReader):
+        return filehandle.filehandle
+    if isinstance(filehandle, PrefetchReader):
+        # The file itself is used by the reader thread
+        return _PrefetchedFile(filehandle)
+    if isinstance(filehandle, (BufferedIOBase, RawIOBase)):
+        # A binary file, as used in binary mode
+        return filehandle
+    # A text file, of which the position is a byte offset as long as
+    # the decoder is at the start of a line
+    raw = getattr(filehandle, 'buffer', None)
+    if raw is None or not raw.seekable():
+        return None
+    return raw
+
+
+def _read_raw_span(filehandle, position, pattern):
+    """ Reads the bytes of a file from position in blocks, until a line
+    matching the pattern and the line after it have been read.
+    """
+    raw = _raw_file(filehandle)
+    if raw is None:
+        return None
+    raw.seek(position)
+    data = bytearray()
+    # Start small as most spans are short, and grow the blocks for the
+    # long ones
+    block_size = DEFAULT_BLOCK_SIZE
+    while True:
+        block = raw.read(block_size)
+        block_size = min(block_size * 2, SPAN_BLOCK_SIZE)
+        # Only search the new block, and the end of the previous block
+        # in which a marker could start
+        search_from = max(len(data) - MARKER_LOOKBACK, 0)
+        data += block
+        found = _find_line(pattern, data, search_from)
+        if not block or (found != -1 and data.find(b'\n', found) != -1):
+            return data
+
+
+def _find_line(pattern, data, start=0):
+    """ Finds the first line at or after start which matches a pattern
+    starting with a newline.
+
+    Returns:
+        The position of the line, or -1 when there is none
+    """
+    if start == 0 and pattern.match(b'\n' + bytes(data[:MARKER_LOOKBACK])):
+        return 0
+    found = pattern.search(data, max(start - 1, 0))
+    return -1 if found is None else found.start() + 1
+
+
+class BufferReader(object):
+    """ Reads lines from an in-memory buffer without copying the
+    buffer. Only the lines which are read are decoded, unless the
+    reader is in binary mode.
+    """
+
+    def __init__(self, buffer, encoding=DEFAULT_ENCODING, binary=False):
+        """ Creates a reader over the buffer.
+
+        Parameters:
+            buffer - bytes-like object
+                The buffer which holds the contents of a Genbank file
+            encoding - string. Default: 'utf-8'
+                The encoding of the buffer
+            binary - boolean. Default: False
+                Whether to return the lines as bytes
+        """
+        view = memoryview(buffer)
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast('B')
+        self.buffer = view
+        self.encoding = encoding
+        self.binary = binary
+        self.position = 0
+
+    def readline(self):
+        """ Reads the next line, including the newline character.
+        Returns an empty string at the end of the buffer.
+        """
+        found = NEWLINE.search(self.buffer, self.position)
+        end = found.end() if found else len(self.buffer)
+        line = self.__get(end)
+        self.position = end
+        return line if self.binary else _translate_newline(line)
+
+    def read(self, size):
+        """ Reads at most size bytes as a string, or as bytes in binary
+        mode.
+        """
+        end = min(self.position + size, len(self.buffer))
+        data = self.__get(end)
+        self.position = end
+        return data
+
+    def __get(self, end):
+        """ Copies the bytes up to end, decoded unless in binary mode """
+        if self.binary:
+            return bytes(self.buffer[self.position:end])
+        return str(self.buffer[self.position:end], self.encoding)
+
+    def tell(self):
+        return self.position
+
+    def seek(self, position):
+        self.position = position
+
+    def close(self):
+        """ Releases the view on the buffer, the buffer itself is left
+        untouched.
+        """
+        self.buffer.release()
+
+
+class BinaryFileReader(object):
+    """ Reads decoded lines from a seekable binary file object """
+
+    def __init__(self, filehandle, encoding=DEFAULT_ENCODING):
+        """ Creates a reader over the binary file.
+
+        Parameters:
+            filehandle - binary file object
+                A seekable file object which returns bytes
+            encoding - string. Default: 'utf-8'
+                The encoding of the file
+        """
+        self.filehandle = filehandle
+        self.encoding = encoding
+
+    def readline(self):
+        return _translate_newline(self.filehandle.readline()
+                                  .decode(self.encoding))
+
+    def read(self, size):
+        """ Reads at most size bytes as a string """
+        return self.filehandle.read(size).decode(self.encoding)
+
+    def tell(self):
+        return self.filehandle.tell()
+
+    def seek(self, position):
+        self.filehandle.seek(position)
+
+    def close(self):
+        """ The file object is owned by the caller, so it is left open """
+        pass
+
+
+class StreamReader(object):
+    """ Reads lines from a stream which cannot seek, such as a socket,
+    a pipe or an HTTP response.
+
+    The stream is read in blocks which are split into lines. Lines are
+    kept in memory from the moment 'tell' has been called, so the
+    reader can seek back to the last position returned by 'tell'. That
+    is the only kind of seeking the parsers do.
+    """
+
+    def __init__(self, stream, encoding=DEFAULT_ENCODING,
+                 block_size=DEFAULT_BLOCK_SIZE, binary=False):
+        """ Creates a reader over the stream.
+
+        Parameters:
+            stream - file object
+                Any object with a 'read' method returning either str
+                or bytes.
+            encoding - string. Default: 'utf-8'
+                The encoding used when the stream returns bytes
+            block_size - int. Default: 65536
+                The amount of data to read from the stream at once
+            binary - boolean. Default: False
+                Whether to return the lines of a stream returning bytes
+                as bytes, without decoding them.
+        """
+        self.stream = stream
+        self.encoding = encoding
+        self.binary = binary
+        self.block_size = block_size
+        self.block = None  # The last block read from the stream
+        self.offset = 0  # The offset of the next line in the block
+        self.position = 0
+        self.mark = 0  # The position returned by the last 'tell' call
+        self.read_since_mark = []
+        self.unread = []  # Lines pushed back by 'seek', in reverse
+
+    def readline(self):
+        """ Reads the next line, including the newline character.
+        Returns an empty string at the end of the stream.
+        """
+        if self.unread:
+            line = self.unread.pop()
+        else:
+            line = self.__read_stream_line()
+        self.read_since_mark.append(line)
+        self.position += len(line)
+        return line
+
+    def __read_stream_line(self):
+        """ Splits the next line from the blocks of the stream """
+        if self.block is None:
+            self.block = self.stream.read(self.block_size)
+        newline = b'\n' if isinstance(self.block, bytes) else '\n'
+        end = self.block.find(newline, self.offset)
+        # Keep reading blocks until the line is complete
+        while end == -1:
+            data = self.stream.read(self.block_size)
+            if not data:
+                break
+            self.block = self.block[self.offset:] + data
+            self.offset = 0
+            end = self.block.find(newline, self.offset)
+        end = len(self.block) if end == -1 else end + 1
+        line = self.block[self.offset:end]
+        self.offset = end
+        if self.binary:
+            return line
+        if isinstance(line, bytes):
+            line = line.decode(self.encoding)
+        return _translate_newline(line)
+
+    def tell(self):
+        """ Returns the current position and remembers it, so it can be
+        used with 'seek'.
+        """
+        self.mark = self.position
+        self.read_since_mark = []
+        return self.position
+
+    def seek(self, position):
+        """ Sets the reader back to the position returned by the last
+        'tell' call.
+
+        Raises:
+            ValueError when the position is not the one returned by the
+            last 'tell' call.
+        """
+        if position == self.position:
+            return
+        if position != self.mark:
+            raise ValueError('A stream can only seek back to the last '
+                             'position returned by tell')
+        self.unread.extend(reversed(self.read_since_mark))
+        self.read_since_mark = []
+        self.position = self.mark
+
+    def close(self):
+        """ The stream is owned by the caller, so it is left open """
+        self.block = None
+
+
+class PrefetchStatistics(object):
+    """ Counters which show whether parsing with a PrefetchReader waits
+    for the file or for the parser.
+
+    Attributes:
+        blocks - int
+            The amount of blocks which have been read
+        bytes - int
+            The amount of bytes which have been read
+        read_seconds - float
+            The time the reader thread spent reading
+        parser_stall_seconds - float
+            The time the parser waited for a block. When this is the
+            larger stall, parsing is I/O bound.
+        reader_stall_seconds - float
+            The time the reader thread waited for room in the full
+            queue. When this is the larger stall, parsing is CPU bound.
+        restarts - int
+            The amount of seeks outside of the blocks read, which
+            restart the reader thread
+    """
+
+    def __init__(self):
+        self.blocks = 0
+        self.bytes = 0
+        self.read_seconds = 0.0
+        self.parser_stall_seconds = 0.0
+        self.reader_stall_seconds = 0.0
+        self.restarts = 0
+
+    def bound(self):
+        """ Returns 'I/O' when the parser waited longer for the reader
+        than the other way around, 'CPU' otherwise.
+        """
+        if self.parser_stall_seconds > self.reader_stall_seconds:
+            return 'I/O'
+        return 'CPU'
+
+    def __str__(self):
+        return ('{} blocks, {:.1f}MB read in {:.3f}s, parser stalled '
+                '{:.3f}s, reader stalled {:.3f}s ({} bound)'
+                .format(self.blocks, self.bytes / 1e6, self.read_seconds,
+                        self.parser_stall_seconds,
+                        self.reader_stall_seconds, self.bound()))
+
+
+class PrefetchReader(object):
+    """ Reads lines from a seekable binary file while a background
+    thread reads the next blocks of the file into a bounded queue. The
+    parser works on one block while the next ones are read, and the
+    reader thread waits when the queue is full.
+
+    The blocks are kept from the position returned by the last 'tell'
+    call, so seeking back to it (which the parsers do) stays within the
+    blocks read. Seeking elsewhere restarts the reader thread.
+    """
+
+    def __init__(self, filehandle, encoding=DEFAULT_ENCODING, binary=False,
+                 depth=4, block_size=PREFETCH_BLOCK_SIZE, close_file=False):
+        """ Creates a reader and starts its thread.
+
+        Parameters:
+            filehandle - binary file object
+                A seekable file object which returns bytes
+            encoding - string. Default: 'utf-8'
+                The encoding of the file
+            binary - boolean. Default: False
+                Whether to return the lines as bytes
+            depth - int. Default: 4
+                The amount of blocks which are read ahead
+            block_size - int. Default: 1048576
+                The size of the blocks
+            close_file - boolean. Default: False
+                Whether to close the file object in 'close'
+        """
+        self.filehandle = filehandle
+        self.encoding = encoding
+        self.binary = binary
+        self.depth = depth
+        self.block_size = block_size
+        self.close_file = close_file
+        self.statistics = PrefetchStatistics()
+        self.data = bytearray()  # The bytes read since the mark
+        self.data_start = filehandle.tell()  # The position of data
+        self.offset = 0  # The offset of the next line in data
+        self.mark = self.data_start  # The position of the last 'tell'
+        self.at_end = False
+        self.__start()
+
+    def __start(self):
+        """ Starts reading ahead from the end of data """
+        self.filehandle.seek(self.data_start + len(self.data))
+        self.queue = Queue(self.depth)
+        self.stopping = Event()
+        self.thread = Thread(target=self.__read_ahead, daemon=True)
+        self.thread.start()
+
+    def __read_ahead(self):
+        """ Reads blocks into the queue until the end of the file, runs
+        in the reader thread. An error is passed on to the parser.
+        """
+        statistics = self.statistics
+        queue, stopping = self.queue, self.stopping
+        while not stopping.is_set():
+            begin = perf_counter()
+            try:
+                block = self.filehandle.read(self.block_size)
+            except Exception as error:
+                block = error
+            waiting = perf_counter()
+            queue.put(block)
+            statistics.reader_stall_seconds += perf_counter() - waiting
+            statistics.read_seconds += waiting - begin
+            if not block or isinstance(block, Exception):
+                return
+            statistics.blocks += 1
+            statistics.bytes += len(block)
+
+    def __stop(self):
+        """ Stops the reader thread, emptying the queue so it is not
+        blocked.
+        """
+        self.stopping.set()
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.01)
+            except Empty:
+                pass
+        self.thread.join()
+
+    def __next_block(self):
+        """ Adds the next block to data.
+
+        Returns:
+            False at the end of the file
+        """
+        if self.at_end:
+            return False
+        begin = perf_counter()
+        block = self.queue.get()
+        self.statistics.parser_stall_seconds += perf_counter() - begin
+        if isinstance(block, Exception):
+            self.at_end = True
+            raise block
+        if not block:
+            self.at_end = True
+            return False
+        # Only keep the bytes from the mark, or the current line
+        keep = max(min(self.mark - self.data_start, self.offset), 0)
+        del self.data[:keep]
+        self.data_start += keep
+        self.offset -= keep
+        self.data += block
+        return True
+
+    def readline(self):
+        """ Reads the next line, including the newline character.
+        Returns an empty string at the end of the file.
+        """
+        end = self.data.find(b'\n', self.offset)
+        while end == -1:
+            searched = len(self.data) - self.offset
+            if not self.__next_block():
+                end = len(self.data) - 1
+                break
+            end = self.data.find(b'\n', self.offset + searched)
+        line = bytes(self.data[self.offset:end + 1])
+        self.offset = end + 1
+        if self.binary:
+            return line
+        return _translate_newline(line.decode(self.encoding))
+
+    def read_bytes(self, size):
+        """ Reads at most size bytes as bytes """
+        while len(self.data) - self.offset < size and self.__next_block():
+            pass
+        with memoryview(self.data) as view:
+            data = bytes(view[self.offset:self.offset + size])
+        self.offset += len(data)
+        return data
+
+    def read(self, size):
+        """ Reads at most size bytes as a string, or as bytes in binary
+        mode.
+        """
+        data = self.read_bytes(size)
+        return data if self.binary else data.decode(self.encoding)
+
+    def tell(self):
+        """ Returns the current position and remembers it, so the bytes
+        from here are kept for 'seek'.
+        """
+        self.mark = self.data_start + self.offset
+        return self.mark
+
+    def seek(self, position):
+        """ Sets the reader to a position. Positions outside of the
+        blocks read restart the reader thread there.
+        """
+        if self.data_start <= position <= self.data_start + len(self.data):
+            self.offset = position - self.data_start
+            return
+        self.statistics.restarts += 1
+        self.__stop()
+        self.data = bytearray()
+        self.data_start = self.mark = position
+        self.offset = 0
+        self.at_end = False
+        self.__start()
+
+    def close(self):
+        """ Stops the reader thread, the file is only closed when the
+        reader opened it.
+        """
+        self.__stop()
+        if self.close_file:
+            self.filehandle.close()
+
+
+class _PrefetchedFile(object):
+    """ The binary file interface of a PrefetchReader, which is used to
+    read spans of bytes through the blocks read ahead.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def read(self, size):
+        return self.reader.read_bytes(size)
+
+    def seek(self, position):
+        self.reader.seek(position)
+
+
+def _translate_newline(line):
+    """ Translates a Windows newline to a regular newline like a text
+    file would do.
+    """
+    if line.endswith('\r\n'):
+        return line[:-2] + '\n'
+    return line
@@ -0,0 +1,446 @@
+""" Finds what changed between two versions of a record: the added,
+removed and modified features and the edits of the sequence.
+
+Every feature is hashed once (its key, location and qualifiers) and the
+features of both versions are matched through dictionaries, which takes
+linear time instead of comparing all pairs:
+  1. Features with the same digest are unchanged.
+  2. Features with the same key and location, after shifting the old
+     location past the sequence edits, are modified or only shifted.
+  3. Features with the same key and identifier (such as /locus_tag)
+     are modified.
+  4. The remaining features have been removed or added.
+
+The sequences are compared by cutting them into chunks at the
+occurrences of an anchor motif, so the chunks after an insertion or a
+deletion are the same in both versions. Only the chunks which differ
+are compared base by base, which finds the edits of multi-megabase
+sequences without aligning them.
+"""
+from bisect import bisect_right
+from collections import defaultdict, deque
+from difflib import SequenceMatcher
+from hashlib import blake2b
+
+from .genbank_parser import GenbankParser
+from .region_algebra import location_parts
+
+DIGEST_SIZE = 16
+# The sequences are cut in front of this motif, which is palindromic so
+# the chunks are the same for both strands
+ANCHOR = 'GATC'
+MIN_CHUNK_SIZE = 1024
+MAX_CHUNK_SIZE = 16384
+# The qualifiers which identify a feature when its location changed,
+# in order of preference
+IDENTIFIERS = ('locus_tag', 'protein_id', 'transcript_id', 'gene')
+
+
+class FeatureChange(object):
+    """ A feature which is in both versions but differs.
+
+    Attributes:
+        old - Feature object
+            The feature in the old version
+        new - Feature object
+            The feature in the new version
+        changes - list
+            'location' when the location differs, followed by the keys
+            of the qualifiers which have been added, removed or changed
+    """
+
+    def __init__(self, old, new, changes):
+        self.old = old
+        self.new = new
+        self.changes = changes
+
+    def __repr__(self):
+        return 'FeatureChange({} {}: {})'.format(self.new.name,
+                                                 self.new.location,
+                                                 ', '.join(self.changes))
+
+
+class SequenceEdit(object):
+    """ A region of the sequence which differs between the versions.
+
+    The coordinates are 1 based and inclusive. The end of an empty side
+    is one less than its start: an insertion in front of base 10 of the
+    old sequence has an old_start of 10 and an old_end of 9.
+
+    Attributes:
+        old_start, old_end - int
+            The region in the old sequence
+        new_start, new_end - int
+            The region in the new sequence
+        old_bases, new_bases - string
+            The bases of the regions
+    """
+
+    def __init__(self, old_start, old_end, new_start, new_end, old_bases,
+                 new_bases):
+        self.old_start = old_start
+        self.old_end = old_end
+        self.new_start = new_start
+        self.new_end = new_end
+        self.old_bases = old_bases
+        self.new_bases = new_bases
+
+    def kind(self):
+        """ Returns 'insertion', 'deletion' or 'substitution' """
+        if not self.old_bases:
+            return 'insertion'
+        if not self.new_bases:
+            return 'deletion'
+        return 'substitution'
+
+    def __repr__(self):
+        return 'SequenceEdit({} {}..{} -> {}..{})'.format(
+            self.kind(), self.old_start, self.old_end, self.new_start,
+            self.new_end)
+
+
+class RecordDiff(object):
+    """ The differences between two versions of a record.
+
+    Attributes:
+        added - list
+            The Feature objects which are only in the new version
+        removed - list
+            The Feature objects which are only in the old version
+        modified - list
+            FeatureChange objects for the features which differ
+        shifted - list
+            (old, new) Feature tuples of the features which only moved
+            because of the sequence edits
+        unchanged - int
+            The amount of identical features
+        edits - list
+            The SequenceEdit objects, ordered by position. Empty when
+            no sequences have been compared.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.modified = []
+        self.shifted = []
+        self.unchanged = 0
+        self.edits = []
+
+    def is_empty(self):
+        """ Checks whether the versions are the same """
+        return not (self.added or self.removed or self.modified or
+                    self.shifted or self.edits)
+
+    def __str__(self):
+        return ('{} added, {} removed, {} modified, {} shifted and {} '
+                'unchanged features, {} sequence edits'
+                .format(len(self.added), len(self.removed),
+                        len(self.modified), len(self.shifted),
+                        self.unchanged, len(self.edits)))
+
+
+def diff_files(old_filename, new_filename, binary=True):
+    """ Compares the first record of two Genbank files.
+
+    Parameters:
+        old_filename - string
+            The file with the old version
+        new_filename - string
+            The file with the new version
+        binary - boolean. Default: True
+            Whether to parse the files in binary mode
+    Returns:
+        A RecordDiff object
+    """
+    records = []
+    for filename in (old_filename, new_filename):
+        with GenbankParser(filename, binary=binary) as parser:
+            parser.parse_metadata(False)
+            records.append((parser.parse_features(), parser.parse_origin()))
+    (old_features, old_sequence), (new_features, new_sequence) = records
+    return diff_records(old_features, new_features, old_sequence,
+                        new_sequence)
+
+
+def diff_records(old_features, new_features, old_sequence=None,
+                 new_sequence=None):
+    """ Compares two versions of a record.
+
+    Parameters:
+        old_features - list
+            The Feature objects of the old version
+        new_features - list
+            The Feature objects of the new version
+        old_sequence - Sequence object. Default: None
+            The sequence of the old version
+        new_sequence - Sequence object. Default: None
+            The sequence of the new version. The sequences are only
+            compared when both are given.
+    Returns:
+        A RecordDiff object
+    """
+    diff = RecordDiff()
+    if old_sequence is not None and new_sequence is not None:
+        diff.edits = diff_sequences(old_sequence.get_sequence(),
+                                    new_sequence.get_sequence())
+    # 1. Identical features
+    unmatched = defaultdict(deque)
+    for feature in old_features:
+        unmatched[feature_digest(feature)].append(feature)
+    added = []
+    matched = set()
+    for feature in new_features:
+        same = unmatched.get(feature_digest(feature))
+        if same:
+            matched.add(id(same.popleft()))
+            diff.unchanged += 1
+        else:
+            added.append(feature)
+    removed = [feature for feature in old_features
+               if id(feature) not in matched]
+    # 2. The same location, after shifting past the sequence edits
+    shift = _CoordinateShift(diff.edits)
+    pairs, removed, added = __match(
+        removed, added,
+        lambda feature: __shifted_key(feature, shift),
+        lambda feature: (feature.name, _parts(feature.location)))
+    for old, new in pairs:
+        changes = __changes(old, new)
+        if changes == ['location'] and \
+                _parts(old.location) != _parts(new.location):
+            diff.shifted.append((old, new))
+        else:
+            diff.modified.append(FeatureChange(old, new, changes))
+    # 3. The same identifier
+    pairs, removed, added = __match(removed, added, __identifier,
+                                    __identifier)
+    diff.modified += [FeatureChange(old, new, __changes(old, new))
+                      for old, new in pairs]
+    diff.removed = removed
+    diff.added = added
+    return diff
+
+
+def __match(old_features, new_features, old_key, new_key):
+    """ Pairs features with the same key, in the order of the features.
+    A key of None never matches.
+
+    Returns:
+        A tuple with the list of (old, new) pairs and the lists of the
+        old and new features which have not been paired
+    """
+    candidates = defaultdict(deque)
+    for feature in old_features:
+        key = old_key(feature)
+        if key is not None:
+            candidates[key].append(feature)
+    pairs = []
+    paired = set()
+    unpaired = []
+    for feature in new_features:
+        key = new_key(feature)
+        same = candidates.get(key) if key is not None else None
+        if same:
+            old = same.popleft()
+            paired.add(id(old))
+            pairs.append((old, feature))
+        else:
+            unpaired.append(feature)
+    return (pairs, [feature for feature in old_features
+                    if id(feature) not in paired], unpaired)
+
+
+def __shifted_key(feature, shift):
+    """ Returns the key and the shifted parts of an old feature """
+    parts = shift.parts(feature.location)
+    return None if parts is None else (feature.name, parts)
+
+
+def __identifier(feature):
+    """ Returns the key and first identifying qualifier of a feature """
+    attributes = feature.attributes
+    for qualifier in IDENTIFIERS:
+        if qualifier in attributes:
+            return feature.name, qualifier, attributes[qualifier]
+    return None
+
+
+def __changes(old, new):
+    """ Lists what differs between two features """
+    changes = []
+    if str(old.location) != str(new.location):
+        changes.append('location')
+    old_attributes, new_attributes = old.attributes, new.attributes
+    changes += sorted(key for key in old_attributes.keys() |
+                      new_attributes.keys()
+                      if old_attributes.get(key) != new_attributes.get(key))
+    return changes
+
+
+def feature_digest(feature):
+    """ Hashes the key, the location and the qualifiers of a feature. The
+    location is hashed in the form it is printed in after parsing, so
+    differences in whitespace do not count.
+
+    Parameters:
+        feature - Feature object
+            The feature to hash
+    Returns:
+        The hexadecimal digest as string
+    """
+    digest = blake2b(digest_size=DIGEST_SIZE)
+    digest.update('{}\t{}'.format(feature.name, feature.location)
+                  .encode('utf-8'))
+    attributes = feature.attributes
+    for key in sorted(attributes):
+        digest.update('\n{}={}'.format(key, attributes[key])
+                      .encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _parts(location):
+    """ Returns the parts of a location as a hashable tuple """
+    return tuple(location_parts(location))
+
+
+class _CoordinateShift(object):
+    """ Maps positions of the old sequence to the new sequence, past
+    the sequence edits.
+    """
+
+    def __init__(self, edits):
+        self.edit_ends = [edit.old_end for edit in edits]
+        self.edit_starts = [edit.old_start for edit in edits]
+        # The shift of the positions after every edit
+        self.shifts = [0]
+        for edit in edits:
+            self.shifts.append(edit.new_end - edit.old_end)
+
+    def position(self, position):
+        """ Maps an old position, None when it has been edited """
+        number = bisect_right(self.edit_ends, position - 1)
+        if number < len(self.edit_starts) and \
+                self.edit_starts[number] <= position:
+            return None
+        return position + self.shifts[number]
+
+    def parts(self, location):
+        """ Maps the parts of a location, None when one of them has
+        been edited.
+        """
+        parts = []
+        for start, end, strand in location_parts(location):
+            start, end = self.position(start), self.position(end)
+            if start is None or end is None:
+                return None
+            parts.append((start, end, strand))
+        return tuple(parts)
+
+
+def sequence_chunks(bases):
+    """ Cuts a sequence into chunks in front of the anchor motif. Chunks
+    are at least MIN_CHUNK_SIZE bases, unless at the end, and at most
+    MAX_CHUNK_SIZE bases.
+
+    Parameters:
+        bases - string
+            The upper cased sequence
+    Returns:
+        A list of (start, end, digest) tuples with the 0 based, end
+        exclusive range of every chunk
+    """
+    chunks = []
+    start = 0
+    anchor = bases.find(ANCHOR, MIN_CHUNK_SIZE)
+    while start < len(bases):
+        if anchor == -1 or anchor - start > MAX_CHUNK_SIZE:
+            end = min(start + MAX_CHUNK_SIZE, len(bases))
+        else:
+            end = anchor
+        chunks.append((start, end,
+                       blake2b(bases[start:end].encode('ascii'),
+                               digest_size=DIGEST_SIZE).digest()))
+        start = end
+        if anchor != -1 and anchor < start + MIN_CHUNK_SIZE:
+            anchor = bases.find(ANCHOR, start + MIN_CHUNK_SIZE)
+    return chunks
+
+
+def diff_sequences(old_bases, new_bases):
+    """ Finds the edits between two sequences through their chunks.
+
+    Parameters:
+        old_bases - string
+            The old sequence
+        new_bases - string
+            The new sequence
+    Returns:
+        A list of SequenceEdit objects ordered by position. Edits in
+        the same pair of differing chunks are reported as one edit
+        covering the first up to the last differing base.
+    """
+    old_chunks = sequence_chunks(old_bases)
+    new_chunks = sequence_chunks(new_bases)
+    matcher = SequenceMatcher(None, [chunk[2] for chunk in old_chunks],
+                              [chunk[2] for chunk in new_chunks],
+                              autojunk=False)
+    edits = []
+    for operation, old_first, old_last, new_first, new_last in \
+            matcher.get_opcodes():
+        if operation == 'equal':
+            continue
+        edit = __refine(old_bases, __span(old_chunks, old_first, old_last),
+                        new_bases, __span(new_chunks, new_first, new_last))
+        if edit is not None:
+            edits.append(edit)
+    return edits
+
+
+def __span(chunks, first, last):
+    """ Returns the 0 based range of bases of a range of chunks """
+    if first == last:
+        # No chunks, the span is empty in front of the next chunk
+        position = chunks[first][0] if first < len(chunks) else \
+            (chunks[-1][1] if chunks else 0)
+        return position, position
+    return chunks[first][0], chunks[last - 1][1]
+
+
+def __refine(old_bases, old_span, new_bases, new_span):
+    """ Trims the bases two spans have in common at their start and end,
+    returning a SequenceEdit or None when the spans are the same.
+    """
+    old_start, old_end = old_span
+    new_start, new_end = new_span
+    length = min(old_end - old_start, new_end - new_start)
+    prefix = __common_length(
+        lambda size: old_bases[old_start:old_start + size] ==
+        new_bases[new_start:new_start + size], length)
+    old_start += prefix
+    new_start += prefix
+    length -= prefix
+    suffix = __common_length(
+        lambda size: old_bases[old_end - size:old_end] ==
+        new_bases[new_end - size:new_end], length)
+    old_end -= suffix
+    new_end -= suffix
+    if old_start == old_end and new_start == new_end:
+        return None
+    return SequenceEdit(old_start + 1, old_end, new_start + 1, new_end,
+                        old_bases[old_start:old_end],
+                        new_bases[new_start:new_end])
+
+
+def __common_length(same, length):
+    """ Finds the largest size up to length for which same(size) holds,
+    with a binary search as the comparison of slices is fast.
+    """
+    low, high = 0, length
+    while low < high:
+        middle = (low + high + 1) // 2
+        if same(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
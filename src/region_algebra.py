@@ -0,0 +1,555 @@
+""" Genome wide computations on the regions of a feature table:
+introns, intergenic regions, set operations and coverage depth.
+
+Regions are tuples of (start, end, strand) with 1 based, inclusive
+coordinates and a strand of 1, -1 or 0 (unknown or both strands). All
+computations sort the coordinates once and sweep over them, so they take
+O(n log n) time for n regions.
+
+On a circular genome a region can cross the origin. Such a region is
+returned with a start greater than its end, for instance (4900, 100, 1)
+on a genome of 5000 bases covers 4900..5000 and 1..100. The set
+operations and the coverage accept such regions when they are given the
+genome length and circular=True, and split them at the origin before
+sweeping.
+"""
+from array import array
+from itertools import groupby
+
+from .location_parser import AdjoiningLocation, AdjoiningLocationType, \
+    ComplementLocation, JoinedLocation, RangeLocation, RemoteLocation, \
+    SingleBaseLocation
+
+TRANSCRIPT_NAMES = ('mRNA', 'CDS')
+GENE_NAMES = ('gene',)
+
+
+def location_parts(location, strand=1):
+    """ Flattens a location to the regions of its parts.
+
+    Parameters:
+        location - Location object
+            The location to flatten
+        strand - int. Default: 1
+            The strand of the location itself
+    Returns:
+        A list of (start, end, strand) tuples in the order of the
+        annotation. Parts on another record (RemoteLocation) are left
+        out.
+    """
+    if isinstance(location, RemoteLocation):
+        return []
+    if isinstance(location, ComplementLocation):
+        parts = location_parts(location.locations[0], -strand)
+        # The parts of a complement are read in reverse
+        parts.reverse()
+        return parts
+    if isinstance(location, JoinedLocation):
+        parts = []
+        for part in location.locations:
+            parts += location_parts(part, strand)
+        return parts
+    first, last = location.get_range()
+    return [(first, last, strand)]
+
+
+def feature_regions(features, names=None):
+    """ Collects the regions of the parts of all features.
+
+    Parameters:
+        features - list
+            A list of Feature objects
+        names - iterable. Default: None
+            The feature keys to include, for instance ('CDS',). All
+            features are included when not given.
+    Returns:
+        A list of (start, end, strand) tuples
+    """
+    regions = []
+    for feature in features:
+        if names is None or feature.name in names:
+            regions += location_parts(feature.location)
+    return regions
+
+
+def introns(features, names=TRANSCRIPT_NAMES, genome_length=None,
+            circular=False):
+    """ Calculates the introns of every transcript, which are the gaps
+    in between the parts of a joined location.
+
+    Parameters:
+        features - list
+            A list of Feature objects
+        names - iterable. Default: ('mRNA', 'CDS')
+            The feature keys of the transcripts
+        genome_length - int. Default: None
+            The length of the sequence, required for circular genomes
+        circular - boolean. Default: False
+            Whether the genome is circular, so a transcript can cross
+            the origin.
+    Returns:
+        A list of tuples with the Feature object and a list of the
+        (start, end, strand) tuples of its introns
+    """
+    result = []
+    for feature in features:
+        if feature.name not in names:
+            continue
+        parts = location_parts(feature.location)
+        if len(parts) < 2:
+            result.append((feature, []))
+            continue
+        strand = parts[0][2]
+        spans = __unwrap(parts, genome_length, circular)
+        gaps = []
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            if start > end + 1:
+                gaps.append(__wrap(end + 1, start - 1, strand,
+                                   genome_length, circular))
+        result.append((feature, gaps))
+    return result
+
+
+def __unwrap(parts, genome_length, circular):
+    """ Sorts the parts of a location along the genome. On a circular
+    genome, the parts after the origin are moved past the end of the
+    genome so the parts are consecutive.
+    """
+    # Parts on the reverse strand are annotated from right to left
+    if parts[0][2] == -1:
+        parts = parts[::-1]
+    spans = [(start, end) for start, end, _ in parts]
+    if circular and genome_length:
+        # A part which starts before its predecessor lies past the
+        # origin
+        shift = 0
+        unwrapped = [spans[0]]
+        for previous, span in zip(spans, spans[1:]):
+            if span[0] < previous[0]:
+                shift = genome_length
+            unwrapped.append((span[0] + shift, span[1] + shift))
+        return unwrapped
+    return sorted(spans)
+
+
+def __wrap(start, end, strand, genome_length, circular):
+    """ Maps an unwrapped region back to genome coordinates """
+    if circular and genome_length:
+        start = (start - 1) % genome_length + 1
+        end = (end - 1) % genome_length + 1
+    return start, end, strand
+
+
+def merge(regions, stranded=False, genome_length=None, circular=False):
+    """ Calculates the union of regions, merging overlapping and
+    adjacent regions.
+
+    Parameters:
+        regions - iterable
+            (start, end, strand) tuples
+        stranded - boolean. Default: False
+            Whether to merge the strands separately. When False, the
+            strand of the result is 0.
+        genome_length - int. Default: None
+            The length of the sequence, required for circular genomes
+        circular - boolean. Default: False
+            Whether the genome is circular, so regions can cross the
+            origin.
+    Returns:
+        A sorted list of (start, end, strand) tuples which do not
+        overlap
+    Raises:
+        ValueError for a region which crosses the origin of a genome
+        which is not circular
+    """
+    regions = __split_origin(regions, genome_length, circular)
+    return __join_origin(__merge(regions, stranded), genome_length,
+                         circular)
+
+
+def __merge(regions, stranded):
+    """ Merges regions which do not cross the origin """
+    merged = []
+    for strand, group in __by_strand(regions, stranded):
+        current_start = current_end = None
+        for start, end in group:
+            if current_end is not None and start <= current_end + 1:
+                current_end = max(current_end, end)
+                continue
+            if current_end is not None:
+                merged.append((current_start, current_end, strand))
+            current_start, current_end = start, end
+        if current_end is not None:
+            merged.append((current_start, current_end, strand))
+    merged.sort()
+    return merged
+
+
+def __split_origin(regions, genome_length, circular):
+    """ Splits the regions which cross the origin into the part up to
+    the end of the genome and the part from its first base.
+    """
+    split = []
+    for region in regions:
+        start, end = region[:2]
+        if start <= end:
+            split.append(region)
+        elif circular and genome_length:
+            split.append((start, genome_length) + tuple(region[2:]))
+            split.append((1, end) + tuple(region[2:]))
+        else:
+            raise ValueError('Region {}..{} crosses the origin, which '
+                             'requires a circular genome and its length'
+                             .format(start, end))
+    return split
+
+
+def __join_origin(regions, genome_length, circular):
+    """ Joins a sorted region which ends at the end of a circular genome
+    with the region of the same strand (and depth) which starts at its
+    first base, into a region which crosses the origin.
+    """
+    if not (circular and genome_length):
+        return regions
+    regions = list(regions)
+    for last in [region for region in regions
+                 if region[1] == genome_length]:
+        first = next((region for region in regions
+                      if region[0] == 1 and region[2:] == last[2:]), None)
+        if first is not None and first is not last:
+            regions.remove(first)
+            regions.remove(last)
+            regions.append((last[0], first[1]) + tuple(last[2:]))
+    regions.sort()
+    return regions
+
+
+def __by_strand(regions, stranded):
+    """ Groups regions by strand, yielding the strand and the sorted
+    (start, end) tuples of that strand.
+    """
+    if not stranded:
+        yield 0, sorted((start, end) for start, end, _ in regions)
+        return
+    keyed = sorted((strand, start, end) for start, end, strand in regions)
+    for strand, group in groupby(keyed, key=lambda region: region[0]):
+        yield strand, [(start, end) for _, start, end in group]
+
+
+def union(first, second, stranded=False, genome_length=None,
+          circular=False):
+    """ Calculates the regions which are in either set of regions.
+
+    Parameters:
+        first - iterable
+            (start, end, strand) tuples
+        second - iterable
+            (start, end, strand) tuples
+        stranded - boolean. Default: False
+            Whether the strands are kept apart
+        genome_length - int. Default: None
+            The length of the sequence, required for circular genomes
+        circular - boolean. Default: False
+            Whether the genome is circular, see 'merge'
+    Returns:
+        A sorted list of (start, end, strand) tuples
+    """
+    return merge(list(first) + list(second), stranded, genome_length,
+                 circular)
+
+
+def intersection(first, second, stranded=False, genome_length=None,
+                 circular=False):
+    """ Calculates the regions which are in both sets of regions.
+
+    Parameters:
+        first - iterable
+            (start, end, strand) tuples
+        second - iterable
+            (start, end, strand) tuples
+        stranded - boolean. Default: False
+            Whether only regions on the same strand intersect
+        genome_length - int. Default: None
+            The length of the sequence, required for circular genomes
+        circular - boolean. Default: False
+            Whether the genome is circular, see 'merge'
+    Returns:
+        A sorted list of (start, end, strand) tuples
+    """
+    return __combine(first, second, stranded, True, genome_length,
+                     circular)
+
+
+def subtract(first, second, stranded=False, genome_length=None,
+             circular=False):
+    """ Calculates the regions of the first set which are not in the
+    second set.
+
+    Parameters:
+        first - iterable
+            (start, end, strand) tuples
+        second - iterable
+            (start, end, strand) tuples to remove
+        stranded - boolean. Default: False
+            Whether only regions on the same strand are removed
+        genome_length - int. Default: None
+            The length of the sequence, required for circular genomes
+        circular - boolean. Default: False
+            Whether the genome is circular, see 'merge'
+    Returns:
+        A sorted list of (start, end, strand) tuples
+    """
+    return __combine(first, second, stranded, False, genome_length,
+                     circular)
+
+
+def __combine(first, second, stranded, keep_overlap, genome_length,
+              circular):
+    """ Sweeps over two merged sets of regions at once, keeping either
+    the overlapping parts or the parts of the first set which do not
+    overlap.
+    """
+    first = __merge(__split_origin(first, genome_length, circular),
+                    stranded)
+    second = __merge(__split_origin(second, genome_length, circular),
+                     stranded)
+    result = []
+    for strand in sorted(set(region[2] for region in first)):
+        lefts = [region for region in first if region[2] == strand]
+        rights = [region for region in second if region[2] == strand]
+        index = 0
+        for start, end, _ in lefts:
+            # Skip the regions which end before this region
+            while index < len(rights) and rights[index][1] < start:
+                index += 1
+            position = start
+            other = index
+            while other < len(rights) and rights[other][0] <= end:
+                right_start, right_end, _ = rights[other]
+                if keep_overlap:
+                    result.append((max(start, right_start),
+                                   min(end, right_end), strand))
+                elif right_start > position:
+                    result.append((position, right_start - 1, strand))
+                position = max(position, right_end + 1)
+                other += 1
+            if not keep_overlap and position <= end:
+                result.append((position, end, strand))
+    result.sort()
+    return __join_origin(result, genome_length, circular)
+
+
+def intergenic(features, genome_length, names=GENE_NAMES, circular=False):
+    """ Calculates the regions in between genes, on either strand.
+
+    Parameters:
+        features - list
+            A list of Feature objects
+        genome_length - int
+            The length of the sequence
+        names - iterable. Default: ('gene',)
+            The feature keys which are considered genes
+        circular - boolean. Default: False
+            Whether the genome is circular, in which case the region
+            in between the last and the first gene crosses the origin.
+    Returns:
+        A sorted list of (start, end, 0) tuples
+    """
+    extents = []
+    for feature in features:
+        if feature.name not in names:
+            continue
+        parts = location_parts(feature.location)
+        if not parts:
+            continue
+        spans = __unwrap(parts, genome_length, circular)
+        start = min(span[0] for span in spans)
+        end = max(span[1] for span in spans)
+        if end > genome_length:
+            # The gene crosses the origin
+            extents.append((start, genome_length, 0))
+            extents.append((1, end - genome_length, 0))
+        else:
+            extents.append((start, end, 0))
+    gaps = subtract([(1, genome_length, 0)], extents)
+    if (circular and len(gaps) > 1 and gaps[0][0] == 1 and
+            gaps[-1][1] == genome_length):
+        # Join the gaps at both ends into a region crossing the origin
+        gaps = gaps[1:-1] + [(gaps[-1][0], gaps[0][1], 0)]
+    return gaps
+
+
+def coverage(regions, stranded=False, genome_length=None, circular=False):
+    """ Calculates the coverage depth with a sweep line over the start
+    and end positions of the regions.
+
+    Parameters:
+        regions - iterable
+            (start, end, strand) tuples
+        stranded - boolean. Default: False
+            Whether to calculate the depth of each strand separately
+        genome_length - int. Default: None
+            The length of the sequence, required for circular genomes
+        circular - boolean. Default: False
+            Whether the genome is circular, see 'merge'
+    Returns:
+        A sorted list of (start, end, strand, depth) tuples, one for
+        every run of bases with the same depth greater than 0.
+    Raises:
+        ValueError for a region which crosses the origin of a genome
+        which is not circular
+    """
+    regions = __split_origin(regions, genome_length, circular)
+    runs = []
+    for strand, group in __by_strand(regions, stranded):
+        events = []
+        for start, end in group:
+            events.append((start, 1))
+            events.append((end + 1, -1))
+        events.sort()
+        depth = 0
+        previous = None
+        for position, change in events:
+            if depth > 0 and previous is not None and position > previous:
+                runs.append((previous, position - 1, strand, depth))
+            depth += change
+            previous = position
+    runs.sort()
+    return __join_origin(runs, genome_length, circular)
+
+
+def coverage_array(regions, genome_length, circular=False):
+    """ Calculates the coverage depth of every base.
+
+    Parameters:
+        regions - iterable
+            (start, end, strand) tuples
+        genome_length - int
+            The length of the sequence
+        circular - boolean. Default: False
+            Whether the genome is circular, so regions can cross the
+            origin.
+    Returns:
+        An array of ints where index i holds the depth of base i + 1
+    Raises:
+        ValueError for a region which crosses the origin of a genome
+        which is not circular
+    """
+    depths = array('i', bytes(4 * (genome_length + 1)))
+    for start, end, _ in __split_origin(regions, genome_length, circular):
+        depths[start - 1] += 1
+        depths[min(end, genome_length)] -= 1
+    depth = 0
+    for index in range(genome_length):
+        depth += depths[index]
+        depths[index] = depth
+    del depths[genome_length]
+    return depths
+
+
+def to_location(region, genome_length=None):
+    """ Creates a Location object for a region.
+
+    Parameters:
+        region - tuple
+            A (start, end, strand) tuple
+        genome_length - int. Default: None
+            The length of the sequence, required for regions which
+            cross the origin.
+    Returns:
+        A RangeLocation, a JoinedLocation for a region crossing the
+        origin, or a ComplementLocation around those for the reverse
+        strand.
+    """
+    start, end, strand = region[:3]
+    if start > end:
+        if not genome_length:
+            raise ValueError('The genome length is required for a '
+                             'region crossing the origin')
+        location = JoinedLocation(
+            RangeLocation.from_range(start, genome_length),
+            RangeLocation.from_range(1, end))
+    else:
+        location = RangeLocation.from_range(start, end)
+    if strand == -1:
+        return ComplementLocation(location)
+    return location
+
+
+def clip_location(location, start, end):
+    """ Truncates a location to a window of the sequence and shifts it,
+    so the first base of the window becomes base 1.
+
+    A location which continues past the window gets a partial marker
+    on the truncated side: '<' on its first base or '>' on its last
+    base. Parts on another record are kept as they are, as long as the
+    location has a part in the window.
+
+    Parameters:
+        location - Location object
+            The location to truncate
+        start - int
+            The first base of the window
+        end - int
+            The last base of the window
+    Returns:
+        A new Location object, or None when the location has no part in
+        the window.
+    """
+    parts = location_parts(location)
+    inside = [(max(first, start), min(last, end)) for first, last, _ in parts
+              if first <= end and last >= start]
+    if not inside:
+        return None
+    # The bases at the ends of the truncated location get a partial
+    # marker when the location continues past the window
+    truncated = (
+        min(first for first, _ in inside)
+        if any(first < start for first, _, _ in parts) else None,
+        max(last for _, last in inside)
+        if any(last > end for _, last, _ in parts) else None)
+    return __clip(location, start, end, truncated)
+
+
+def __clip(location, start, end, truncated):
+    """ Truncates and shifts a location, see 'clip_location' """
+    if isinstance(location, RemoteLocation):
+        return None
+    if isinstance(location, ComplementLocation):
+        clipped = __clip(location.locations[0], start, end, truncated)
+        return None if clipped is None else ComplementLocation(clipped)
+    if isinstance(location, JoinedLocation):
+        parts = []
+        local = False
+        for part in location.locations:
+            if isinstance(part, RemoteLocation):
+                parts.append(part)
+                continue
+            clipped = __clip(part, start, end, truncated)
+            if clipped is not None:
+                parts.append(clipped)
+                local = True
+        if not local:
+            return None
+        return parts[0] if len(parts) == 1 else JoinedLocation(*parts)
+    first, last = location.get_range()
+    if first > end or last < start:
+        return None
+    offset = start - 1
+    if isinstance(location, AdjoiningLocation):
+        # The site in between two bases is only kept with both bases
+        if (first < start or last > end or
+                location.subtype == AdjoiningLocationType.circulair):
+            return None
+        return AdjoiningLocation('{}^{}'.format(first - offset,
+                                                last - offset))
+    can_be_lesser = getattr(location, 'can_be_lesser', False) or \
+        max(first, start) == truncated[0]
+    can_be_greater = getattr(location, 'can_be_greater', False) or \
+        min(last, end) == truncated[1]
+    if (isinstance(location, SingleBaseLocation) and
+            not (can_be_lesser or can_be_greater)):
+        return SingleBaseLocation(str(first - offset))
+    return RangeLocation.from_range(max(first, start) - offset,
+                                    min(last, end) - offset,
+                                    can_be_lesser, can_be_greater)
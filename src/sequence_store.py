@@ -0,0 +1,180 @@
+""" A store which resolves the accessions of RemoteLocation objects to
+the sequences of other Genbank records.
+
+The store indexes where the records of a set of Genbank files are,
+without parsing them. A sequence is only parsed when a location refers
+to it, and the parsed sequences are kept in a least recently used cache
+which is bounded by the total amount of bases. The records are keyed by
+their versioned accession, the accession without version is an alias,
+so both share one cached sequence.
+"""
+from collections import OrderedDict
+from glob import glob
+from os.path import isdir, join
+
+from .genbank_parser import GenbankParser
+from .location_parser import RemoteLocation
+
+DEFAULT_MAX_BASES = 100000000
+DEFAULT_PATTERNS = ('*.gb', '*.gbk', '*.gbff', '*.genbank')
+
+
+class SequenceStore(object):
+    """ Resolves accessions to Sequence objects. It can be given as
+    'alt_sequence' to the 'to_sequence' method of a Location, so a
+    JoinedLocation with both local and remote parts can be turned into
+    a sequence:
+        location.to_sequence(sequence, store)
+    """
+
+    def __init__(self, max_bases=DEFAULT_MAX_BASES):
+        """ Creates an empty store.
+
+        Parameters:
+            max_bases - int. Default: 100000000
+                The maximum amount of bases of all cached sequences
+                together. The sequence which has been used last is
+                always kept, even when it is larger than this.
+        """
+        self.max_bases = max_bases
+        self.records = {}  # versioned accession -> (filename, start, end)
+        self.aliases = {}  # accession -> versioned accession
+        self.cache = OrderedDict()  # versioned accession -> Sequence
+        self.cached_bases = 0
+
+    def add_file(self, filename):
+        """ Indexes the records of a Genbank file by their accession
+        and versioned accession.
+
+        Parameters:
+            filename - string
+                The Genbank file, which may contain multiple records
+        Returns:
+            The amount of records which have been indexed
+        """
+        records = 0
+        for accession, version, start, end in _scan_records(filename):
+            # A record without VERSION is keyed by its accession
+            key = version or accession
+            if key is None:
+                continue
+            self.records[key] = (filename, start, end)
+            self.aliases[key] = key
+            if accession is not None:
+                self.aliases[accession] = key
+            records += 1
+        return records
+
+    def add_directory(self, directory, patterns=DEFAULT_PATTERNS):
+        """ Indexes all Genbank files in a directory.
+
+        Parameters:
+            directory - string
+                The directory to look in
+            patterns - iterable. Default: DEFAULT_PATTERNS
+                The glob patterns of the filenames to index
+        Returns:
+            The amount of records which have been indexed
+        """
+        if not isdir(directory):
+            raise ValueError('Directory {} does not exist.'
+                             .format(directory))
+        records = 0
+        for pattern in patterns:
+            for filename in sorted(glob(join(directory, pattern))):
+                records += self.add_file(filename)
+        return records
+
+    def __contains__(self, accession):
+        return accession in self.aliases
+
+    def get(self, accession):
+        """ Retrieves the sequence of an accession, which is parsed
+        when it is not cached.
+
+        Parameters:
+            accession - string
+                The accession, with or without version
+        Returns:
+            A Sequence object with the versioned accession set
+        Raises:
+            KeyError when the accession is not in any of the files
+        """
+        key = self.aliases[accession]
+        sequence = self.cache.get(key)
+        if sequence is not None:
+            self.cache.move_to_end(key)
+            return sequence
+        filename, start, end = self.records[key]
+        with open(filename, 'rb') as filehandle:
+            filehandle.seek(start)
+            data = filehandle.read(end - start)
+        with GenbankParser(data) as parser:
+            parser.parse_metadata(False)
+            parser.parse_features(False)
+            sequence = parser.parse_origin()
+        sequence.set_accession(key)
+        self.cache[key] = sequence
+        self.cached_bases += sequence.length()
+        self.__evict()
+        return sequence
+
+    def __evict(self):
+        """ Removes the least recently used sequences until the cache
+        fits in the maximum amount of bases again.
+        """
+        while self.cached_bases > self.max_bases and len(self.cache) > 1:
+            _, sequence = self.cache.popitem(last=False)
+            self.cached_bases -= sequence.length()
+
+    def get_sequence_from_location(self, location, sequence=None):
+        """ Gets the sequence of a RemoteLocation, which is the same
+        method a Sequence object has.
+
+        Parameters:
+            location - RemoteLocation object
+                The location to get the sequence of
+            sequence - Sequence object. Default: None
+                Not used, exists to be compatible with Sequence
+        Returns:
+            A string sequence representing the sequence for the
+            location.
+        Raises:
+            ValueError when the location is not a RemoteLocation
+            KeyError when the accession is not in any of the files
+        """
+        if not isinstance(location, RemoteLocation):
+            raise ValueError('Only a RemoteLocation can be resolved')
+        remote = self.get(location.accession)
+        return remote.get_sequence_from_location(location)
+
+
+def _scan_records(filename):
+    """ Finds the records in a file and their accessions without
+    parsing them.
+
+    Parameters:
+        filename - string
+            The Genbank file
+    Returns:
+        A generator which yields a tuple with the accession, the
+        versioned accession (either can be None), the start and the end
+        position of each record.
+    """
+    with open(filename, 'rb') as filehandle:
+        position = 0
+        start = None
+        accessions = {}
+        for line in filehandle:
+            if line.startswith(b'LOCUS'):
+                start = position
+                accessions = {}
+            elif line.startswith((b'ACCESSION', b'VERSION')):
+                fields = line.split()
+                if len(fields) > 1:
+                    accessions[fields[0]] = fields[1].decode('ascii')
+            position += len(line)
+            if line.startswith(b'//') and start is not None:
+                yield (accessions.get(b'ACCESSION'),
+                       accessions.get(b'VERSION'), start, position)
+                start = None
@@ -0,0 +1,355 @@
+""" Publishes a parsed Genbank record into shared memory, so multiple
+processes can use a single copy of the record.
+
+The record is stored in one shared memory block with this layout:
+    header        -> magic and the sizes of the sections below
+    metadata      -> the pickled Metadata object
+    feature table -> flat columns of string ids for the feature names,
+                     locations and qualifiers
+    string table  -> offsets into the string blob for every string id
+    string blob   -> all distinct strings, UTF-8 encoded
+    sequence      -> the ASCII bytes of the sequence
+
+Processes which attach to the record get read-only views which behave
+like Feature and Sequence objects, and only decode what is accessed.
+"""
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pickle import dumps, loads
+from struct import Struct
+
+from .features_parser import Feature
+from .location_parser import parse_location
+from .origin_parser import Sequence
+
+MAGIC = b'GBSHM001'
+# The magic, followed by the size of the metadata, the amount of
+# features, qualifiers and strings, the size of the string blob and
+# the length of the sequence.
+HEADER = Struct('<8s6Q')
+ID_TYPE = 'q'  # The array type of the columns and the string table
+# The names of the blocks published by this process (or the process it
+# has been forked from), which the resource tracker already tracks
+_PUBLISHED_NAMES = set()
+
+
+def publish_record(metadata, features, sequence, name=None):
+    """ Publishes a parsed record into a new shared memory block.
+
+    Parameters:
+        metadata - Metadata object
+            The metadata of the record
+        features - list
+            A list of Feature objects
+        sequence - Sequence object
+            The sequence of the record
+        name - string. Default: None
+            The name of the shared memory block, when not given a
+            unique name will be generated.
+    Returns:
+        A SharedRecord object which owns the block. The block stays
+        available until 'unlink' has been called on this object.
+    """
+    strings = _StringTable()
+    names, locations, qualifier_starts = array(ID_TYPE), array(ID_TYPE), \
+        array(ID_TYPE, [0])
+    keys, values = array(ID_TYPE), array(ID_TYPE)
+    # Fill the columns of the feature table
+    for feature in features:
+        names.append(strings.add(feature.name))
+        locations.append(strings.add(str(feature.location)))
+        for key, value in feature.attributes.items():
+            keys.append(strings.add(key))
+            values.append(strings.add(value))
+        qualifier_starts.append(len(keys))
+    meta_bytes = dumps(metadata)
+    blob = strings.blob()
+    sequence_bytes = sequence.get_sequence().encode('ascii')
+    sections = [HEADER.pack(MAGIC, len(meta_bytes), len(names), len(keys),
+                            len(strings), len(blob), len(sequence_bytes)),
+                meta_bytes, names.tobytes(), locations.tobytes(),
+                qualifier_starts.tobytes(), keys.tobytes(),
+                values.tobytes(), strings.offsets.tobytes(), blob,
+                sequence_bytes]
+    size = sum(len(section) for section in sections)
+    memory = SharedMemory(name=name, create=True, size=max(size, 1))
+    # Copy the sections into the block
+    position = 0
+    for section in sections:
+        memory.buf[position:position + len(section)] = section
+        position += len(section)
+    _PUBLISHED_NAMES.add(memory.name)
+    return SharedRecord(memory, owner=True)
+
+
+def attach_record(name):
+    """ Attaches to a record which has been published by another
+    process.
+
+    Parameters:
+        name - string
+            The name of the shared memory block, available as 'name' on
+            the SharedRecord of the publishing process.
+    Returns:
+        A read-only SharedRecord object
+    Raises:
+        FileNotFoundError when no block with the name exists
+        ValueError when the block does not contain a record
+    """
+    try:
+        memory = SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attached block is tracked and would
+        # be removed when this process exits, which is up to the owner.
+        # The block of the owner is left registered, as unregistering
+        # it would fail when the owner unlinks it.
+        memory = SharedMemory(name=name)
+        if memory.name not in _PUBLISHED_NAMES:
+            resource_tracker.unregister(memory._name, 'shared_memory')
+    return SharedRecord(memory, owner=False)
+
+
+class SharedRecord(object):
+    """ A record in shared memory. Gives access to the metadata, the
+    features and the sequence of the record through the attributes
+    'metadata', 'features' and 'sequence'.
+
+    Like a GenbankParser, this object needs to be closed which is
+    supported with a 'with' statement or the regular 'close' method.
+    """
+
+    def __init__(self, memory, owner):
+        """ Creates the views on the shared memory block.
+
+        Parameters:
+            memory - SharedMemory object
+                The block which holds the record
+            owner - boolean
+                Whether this process created the block
+        Raises:
+            ValueError when the block does not contain a record
+        """
+        self.memory = memory
+        self.owner = owner
+        self.name = memory.name
+        view = memory.buf.toreadonly()
+        (magic, meta_size, feature_count, qualifier_count, string_count,
+         blob_size, sequence_length) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Shared memory {} does not hold a record'
+                             .format(self.name))
+        self.__view = view
+        self.__position = HEADER.size
+        self.__metadata_view = self.__take(meta_size)
+        columns = [self.__take_ids(feature_count),
+                   self.__take_ids(feature_count),
+                   self.__take_ids(feature_count + 1),
+                   self.__take_ids(qualifier_count),
+                   self.__take_ids(qualifier_count)]
+        strings = _StringView(self.__take_ids(string_count + 1),
+                              self.__take(blob_size))
+        self.features = SharedFeatureTable(strings, *columns)
+        self.sequence = SharedSequence(self.__take(sequence_length))
+        self.__metadata = None
+
+    def __take(self, size):
+        """ Takes the next section of the block as a memoryview """
+        section = self.__view[self.__position:self.__position + size]
+        self.__position += size
+        return section
+
+    def __take_ids(self, count):
+        """ Takes the next column of the block as a memoryview of ids """
+        return self.__take(count * array(ID_TYPE).itemsize).cast(ID_TYPE)
+
+    @property
+    def metadata(self):
+        """ The Metadata object, which is unpickled on first access """
+        if self.__metadata is None:
+            self.__metadata = loads(self.__metadata_view)
+        return self.__metadata
+
+    def close(self):
+        """ Closes the access to the block. The views which have been
+        handed out can no longer be used after this.
+        """
+        self.features.release()
+        self.sequence.release()
+        self.__metadata_view.release()
+        self.__view.release()
+        self.memory.close()
+
+    def unlink(self):
+        """ Removes the block, which can only be done by the owner. The
+        block is freed when all processes have closed it.
+        """
+        if not self.owner:
+            raise ValueError('Only the owner can unlink a shared record')
+        self.memory.unlink()
+        _PUBLISHED_NAMES.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SharedFeatureTable(object):
+    """ A read-only list of SharedFeature objects over the columns of
+    the feature table.
+    """
+
+    def __init__(self, strings, names, locations, qualifier_starts, keys,
+                 values):
+        self.strings = strings
+        self.names = names
+        self.locations = locations
+        self.qualifier_starts = qualifier_starts
+        self.keys = keys
+        self.values = values
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Feature index out of range')
+        return SharedFeature(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield SharedFeature(self, index)
+
+    def release(self):
+        """ Releases the views on the shared memory block """
+        for column in (self.names, self.locations, self.qualifier_starts,
+                       self.keys, self.values):
+            column.release()
+        self.strings.release()
+
+
+class SharedFeature(Feature):
+    """ A Feature which reads its name, location and attributes from a
+    SharedFeatureTable. The location and attributes are created on first
+    access.
+    """
+
+    encoding = None  # The attributes are strings
+
+    def __init__(self, table, index):
+        """ Creates the view on the feature.
+
+        Parameters:
+            table - SharedFeatureTable object
+                The table which holds the feature
+            index - int
+                The position of the feature in the table
+        """
+        self.table = table
+        self.index = index
+        self.__location = None
+        self.__attributes = None
+
+    @property
+    def name(self):
+        return self.table.strings[self.table.names[self.index]]
+
+    @property
+    def location(self):
+        if self.__location is None:
+            self.__location = parse_location(
+                self.table.strings[self.table.locations[self.index]])
+        return self.__location
+
+    @property
+    def attributes(self):
+        if self.__attributes is None:
+            table = self.table
+            start = table.qualifier_starts[self.index]
+            end = table.qualifier_starts[self.index + 1]
+            self.__attributes = {table.strings[table.keys[i]]:
+                                 table.strings[table.values[i]]
+                                 for i in range(start, end)}
+        return self.__attributes
+
+
+class SharedSequence(Sequence):
+    """ A Sequence over the bytes in a shared memory block. Only the
+    parts of the sequence which are requested are decoded.
+    """
+
+    def __init__(self, view):
+        """ Creates the view on the sequence.
+
+        Parameters:
+            view - memoryview
+                The ASCII bytes of the sequence
+        """
+        self.view = view
+        self.accession = None
+
+    @property
+    def sequence(self):
+        """ The complete sequence as a string, which is a copy """
+        return str(self.view, 'ascii')
+
+    def length(self):
+        return len(self.view)
+
+    def get_sequence_from_location(self, location, sequence=None):
+        if (getattr(location, 'accession', self.accession) !=
+                self.accession and sequence is not None):
+            return sequence.get_sequence_from_location(location)
+        first, last = location.get_range()
+        return str(self.view[first - 1:last], 'ascii')
+
+    def release(self):
+        """ Releases the view on the shared memory block """
+        self.view.release()
+
+
+class _StringTable(object):
+    """ Collects distinct strings and gives each one an id """
+
+    def __init__(self):
+        self.ids = {}
+        self.parts = []
+        self.offsets = array(ID_TYPE, [0])
+
+    def add(self, string):
+        """ Returns the id of the string, adding it when it is new """
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = self.ids[string] = len(self.parts)
+            encoded = string.encode('utf-8')
+            self.parts.append(encoded)
+            self.offsets.append(self.offsets[-1] + len(encoded))
+        return string_id
+
+    def blob(self):
+        return b''.join(self.parts)
+
+    def __len__(self):
+        return len(self.parts)
+
+
+class _StringView(object):
+    """ Decodes strings from the string table in shared memory """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, string_id):
+        return str(self.blob[self.offsets[string_id]:
+                             self.offsets[string_id + 1]], 'utf-8')
+
+    def release(self):
+        self.offsets.release()
+        self.blob.release()
@@ -0,0 +1,289 @@
+""" Loads Genbank records into a normalized SQLite database:
+    records       -> one row with the metadata of every record
+    features      -> one row for every feature, by record
+    feature_parts -> the ranges of the location of every feature
+    qualifiers    -> the qualifiers of every feature
+    sequences     -> the sequence of every record
+
+The rows are inserted with executemany in batches, in one transaction
+per group of records and in WAL mode. The indexes are dropped while
+loading and created once all records have been inserted, which is much
+faster than keeping them up to date for every row.
+"""
+import sqlite3
+from time import perf_counter
+
+from .genbank_parser import GenbankParser
+from .region_algebra import location_parts
+
+DEFAULT_RECORDS_PER_TRANSACTION = 100
+DEFAULT_BATCH_SIZE = 10000
+TABLES = ('records', 'features', 'feature_parts', 'qualifiers',
+          'sequences')
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    locus_name TEXT,
+    accession TEXT,
+    version TEXT,
+    description TEXT,
+    organism TEXT,
+    seq_length INTEGER,
+    molecule_type TEXT,
+    molecule_formation TEXT,
+    division TEXT,
+    modification_date TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS features (
+    id INTEGER PRIMARY KEY,
+    record_id INTEGER NOT NULL REFERENCES records (id),
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    location TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feature_parts (
+    feature_id INTEGER NOT NULL REFERENCES features (id),
+    part INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    strand INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS qualifiers (
+    feature_id INTEGER NOT NULL REFERENCES features (id),
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    record_id INTEGER PRIMARY KEY REFERENCES records (id),
+    sequence TEXT NOT NULL
+);
+'''
+# The indexes, which are created after loading
+INDEXES = {
+    'records_accession': 'records (accession)',
+    'features_record': 'features (record_id, position)',
+    'features_name': 'features (name)',
+    'feature_parts_feature': 'feature_parts (feature_id)',
+    'feature_parts_range': 'feature_parts (start, end)',
+    'qualifiers_feature': 'qualifiers (feature_id)',
+    'qualifiers_key_value': 'qualifiers (key, value)',
+}
+INSERTS = {
+    'records': 'INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, '
+               '?, ?)',
+    'features': 'INSERT INTO features VALUES (?, ?, ?, ?, ?)',
+    'feature_parts': 'INSERT INTO feature_parts VALUES (?, ?, ?, ?, ?)',
+    'qualifiers': 'INSERT INTO qualifiers VALUES (?, ?, ?)',
+    'sequences': 'INSERT INTO sequences VALUES (?, ?)',
+}
+
+
+class LoadStatistics(object):
+    """ The amount of records and rows which have been loaded and the
+    time it took.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.rows = dict.fromkeys(TABLES, 0)
+        self.seconds = 0.0
+        self.index_seconds = 0.0
+
+    def total_rows(self):
+        """ Returns the amount of rows in all tables """
+        return sum(self.rows.values())
+
+    def rows_per_second(self):
+        """ Returns the amount of rows loaded per second, including the
+        creation of the indexes.
+        """
+        if not self.seconds:
+            return 0.0
+        return self.total_rows() / self.seconds
+
+    def __str__(self):
+        return ('{} records, {} rows in {:.1f}s ({:.0f} rows/s, indexes '
+                '{:.1f}s)'.format(self.records, self.total_rows(),
+                                  self.seconds, self.rows_per_second(),
+                                  self.index_seconds))
+
+
+class SqliteLoader(object):
+    """ Loads the records of Genbank files into a SQLite database. The
+    indexes are created by 'close', which should be called once all
+    files have been loaded. It can be used in a 'with' statement.
+    """
+
+    def __init__(self, database, store_sequences=True,
+                 records_per_transaction=DEFAULT_RECORDS_PER_TRANSACTION,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        """ Opens the database and creates the tables.
+
+        Parameters:
+            database - string
+                The filename of the database, which may already hold
+                records from earlier loads.
+            store_sequences - boolean. Default: True
+                Whether to store the sequences, which are skipped
+                without parsing them otherwise.
+            records_per_transaction - int. Default: 100
+                The amount of records committed at once
+            batch_size - int. Default: 10000
+                The amount of rows of a table which are inserted with a
+                single executemany call.
+        """
+        self.store_sequences = store_sequences
+        self.records_per_transaction = records_per_transaction
+        self.batch_size = batch_size
+        self.statistics = LoadStatistics()
+        # Transactions are started and committed explicitly
+        self.connection = sqlite3.connect(database, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(SCHEMA)
+        for name in INDEXES:
+            self.connection.execute('DROP INDEX IF EXISTS ' + name)
+        # The ids are assigned here, so rows referring to them can be
+        # inserted in batches
+        self.next_record_id = self.__next_id('records')
+        self.next_feature_id = self.__next_id('features')
+        self.pending = {table: [] for table in TABLES}
+        self.pending_records = 0
+
+    def __next_id(self, table):
+        """ Returns the id after the largest id of a table """
+        return self.connection.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1 FROM ' + table).fetchone()[0]
+
+    def load_file(self, filename):
+        """ Loads all records of a Genbank file.
+
+        Parameters:
+            filename - string
+                The Genbank file
+        Returns:
+            The amount of records which have been loaded
+        """
+        begin = perf_counter()
+        records = 0
+        with GenbankParser(filename, binary=True) as parser:
+            while parser.has_record():
+                metadata = parser.parse_metadata()
+                features = parser.parse_features()
+                sequence = parser.parse_origin(self.store_sequences)
+                self.add_record(metadata, features,
+                                sequence if self.store_sequences else None)
+                records += 1
+        self.statistics.seconds += perf_counter() - begin
+        return records
+
+    def add_record(self, metadata, features, sequence=None):
+        """ Adds a parsed record. The rows are written once enough rows
+        have been collected.
+
+        Parameters:
+            metadata - Metadata object
+                The metadata of the record
+            features - list
+                The Feature objects of the record
+            sequence - Sequence object. Default: None
+                The sequence of the record, which is not stored when
+                not given.
+        """
+        record_id = self.next_record_id
+        self.next_record_id += 1
+        self.__queue('records', (
+            record_id, metadata.locus_name, metadata.accession,
+            ' '.join(metadata.version or ()), metadata.description,
+            metadata.organism, metadata.seq_length, metadata.molecule_type,
+            metadata.molecule_formation, metadata.division,
+            metadata.modification_date_str, metadata.source))
+        for position, feature in enumerate(features):
+            feature_id = self.next_feature_id
+            self.next_feature_id += 1
+            self.__queue('features', (feature_id, record_id, position,
+                                      feature.name, str(feature.location)))
+            for part, (start, end, strand) in enumerate(
+                    location_parts(feature.location)):
+                self.__queue('feature_parts',
+                             (feature_id, part, start, end, strand))
+            for key, value in feature.attributes.items():
+                self.__queue('qualifiers', (feature_id, key, value))
+        if sequence is not None:
+            self.__queue('sequences', (record_id, sequence.get_sequence()))
+        self.statistics.records += 1
+        self.pending_records += 1
+        if self.pending_records >= self.records_per_transaction:
+            self.flush()
+
+    def __queue(self, table, row):
+        """ Queues a row, and inserts the rows of the table when the
+        batch is full.
+        """
+        rows = self.pending[table]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.__insert(table)
+
+    def __insert(self, table):
+        """ Inserts the queued rows of a table """
+        rows = self.pending[table]
+        if not rows:
+            return
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN')
+        self.connection.executemany(INSERTS[table], rows)
+        self.statistics.rows[table] += len(rows)
+        self.pending[table] = []
+
+    def flush(self):
+        """ Inserts all queued rows and commits the transaction """
+        for table in TABLES:
+            self.__insert(table)
+        if self.connection.in_transaction:
+            self.connection.execute('COMMIT')
+        self.pending_records = 0
+
+    def create_indexes(self):
+        """ Creates the indexes, which have been dropped while loading """
+        self.flush()
+        begin = perf_counter()
+        for name, columns in INDEXES.items():
+            self.connection.execute('CREATE INDEX IF NOT EXISTS {} ON {}'
+                                    .format(name, columns))
+        self.connection.execute('ANALYZE')
+        elapsed = perf_counter() - begin
+        self.statistics.index_seconds += elapsed
+        self.statistics.seconds += elapsed
+
+    def close(self):
+        """ Writes the remaining rows, creates the indexes and closes the
+        database.
+        """
+        self.create_indexes()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_files(filenames, database, **kwargs):
+    """ Loads Genbank files into a SQLite database.
+
+    Parameters:
+        filenames - iterable
+            The Genbank files
+        database - string
+            The filename of the database
+        kwargs - the options of SqliteLoader
+    Returns:
+        A LoadStatistics object
+    """
+    with SqliteLoader(database, **kwargs) as loader:
+        for filename in filenames:
+            loader.load_file(filename)
+    return loader.statistics
@@ -0,0 +1,147 @@
+""" A small tokenizer for the fixed-column layout of a Genbank file.
+
+A Genbank file is laid out in columns:
+    columns 0-11  -> a keyword (such as LOCUS or   AUTHORS)
+    columns 12-   -> the value of the keyword
+In the FEATURES block:
+    columns 5-20  -> the feature key (such as CDS or gene)
+    columns 21-   -> the location of the feature or its qualifiers
+In the ORIGIN block:
+    columns 0-8   -> the right aligned coordinate of the first base
+    columns 10-   -> the bases in blocks of 10
+
+The functions in this module slice lines by those column offsets
+instead of splitting them with regular expressions. When a line does
+not follow the layout (for instance a keyword which runs into the
+value columns) the functions fall back to splitting on whitespace.
+
+All functions accept both strings and bytes, and return parts of the
+same type as the line.
+"""
+
+KEYWORD_END = 12
+FEATURE_KEY_START = 5
+FEATURE_KEY_END = 21
+QUALIFIER_START = 21
+ORIGIN_SEQUENCE_START = 10
+
+
+def split_keyword_line(line):
+    """ Splits a header line into its keyword and its value.
+
+    Parameters:
+        line - string or bytes
+            A line of the header of a Genbank file
+    Returns:
+        A tuple with the keyword and the value, both without
+        surrounding whitespace. The keyword is an empty string when
+        the line is a continuing line.
+    """
+    # The keyword must be separated from the value by the last
+    # column of the keyword area
+    if line[KEYWORD_END - 1:KEYWORD_END].isspace():
+        return line[:KEYWORD_END].strip(), line[KEYWORD_END:].strip()
+    parts = line.split(None, 1)
+    if len(parts) == 1:
+        # An empty value of the same type as the line
+        return parts[0], line[:0]
+    return parts[0], parts[1].strip()
+
+
+def split_feature_line(line):
+    """ Splits the first line of a feature into its key and location.
+
+    Parameters:
+        line - string or bytes
+            The line which starts a feature
+    Returns:
+        A tuple with the feature key and the location string
+    Raises:
+        ValueError when the line does not contain a key and a location
+    """
+    if line[FEATURE_KEY_END - 1:FEATURE_KEY_END].isspace():
+        key = line[FEATURE_KEY_START:FEATURE_KEY_END].strip()
+        location = line[FEATURE_KEY_END:].strip()
+        if key and location:
+            return key, location
+    parts = line.split()
+    if len(parts) != 2:
+        raise ValueError('Invalid feature line: {}'.format(line.strip()))
+    return parts[0], parts[1]
+
+
+def split_qualifier_line(line):
+    """ Takes the qualifier out of a line of the FEATURES block. The
+    '/' of a qualifier is in the first column after the feature key.
+
+    Parameters:
+        line - string or bytes
+            A line of the FEATURES block
+    Returns:
+        The qualifier without the leading '/' and surrounding
+        whitespace, or None when the line does not start a qualifier.
+    """
+    slash = '/' if isinstance(line, str) else b'/'
+    # No feature line has a '/' in that column, as locations do not
+    # start with one
+    if line[QUALIFIER_START:QUALIFIER_START + 1] == slash:
+        return line[QUALIFIER_START + 1:].rstrip()
+    line = line.strip()
+    if line[:1] == slash:
+        return line[1:].strip()
+    return None
+
+
+def split_qualifier(qualifier):
+    """ Splits a qualifier into its key and its value.
+
+    Parameters:
+        qualifier - string or bytes
+            The qualifier without the leading '/', for instance
+            'gene="AXL2"'
+    Returns:
+        A tuple with the key and the value. The value is an empty
+        string for qualifiers without a value, such as /pseudo.
+    """
+    key, _, value = qualifier.partition(
+        '=' if isinstance(qualifier, str) else b'=')
+    return key, value
+
+
+def split_origin_line(line):
+    """ Splits a line of the ORIGIN block into its coordinate and its
+    bases. The coordinate is right aligned in the first 9 columns and
+    the bases start at column 10 in blocks of 10.
+
+    Parameters:
+        line - string or bytes
+            A line of the ORIGIN block
+    Returns:
+        A tuple with the coordinate string and the bases without any
+        whitespace. When the line is not a sequence line, a tuple of
+        two None values is returned.
+    """
+    if line[ORIGIN_SEQUENCE_START - 1:ORIGIN_SEQUENCE_START].isspace():
+        coordinate = line[:ORIGIN_SEQUENCE_START - 1].strip()
+        if coordinate.isdigit():
+            return coordinate, line[:0].join(
+                line[ORIGIN_SEQUENCE_START:].split())
+    parts = line.split()
+    if parts and parts[0].isdigit():
+        return parts[0], line[:0].join(parts[1:])
+    return None, None
+
+
+def is_feature_start(line):
+    """ Checks whether a line starts a new feature: five spaces
+    followed by a non space character.
+
+    Parameters:
+        line - string or bytes
+            The line to check
+    Returns:
+        A boolean which is True when the line starts a feature
+    """
+    start = line[FEATURE_KEY_START:FEATURE_KEY_START + 1]
+    return (len(start) == 1 and not start.isspace() and
+            line[:FEATURE_KEY_START].isspace())
@@ -0,0 +1,179 @@
+""" Builds small Genbank records for the tests. The records have a
+header with references, gene and CDS features (part of them joined or
+on the complement strand, with multiline translations) and a random
+sequence.
+"""
+from random import Random
+
+from src.genbank_parser import GenbankParser
+
+BASES = b'acgt' * 64  # Translation table from random bytes to bases
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+QUALIFIER_SPACING = ' ' * 21
+LINE_WIDTH = 79
+
+
+def synthetic_record(length=1000, feature_count=6, seed=1,
+                     locus_name='TEST00001'):
+    """ Writes a synthetic record with genes and CDS features on both
+    strands, some of them joined.
+
+    Parameters:
+        length - int. Default: 1000
+            The length of the sequence
+        feature_count - int. Default: 6
+            The amount of genes, plus one for the source feature
+        seed - int. Default: 1
+            The seed of the random sequence and translations
+        locus_name - string. Default: 'TEST00001'
+            The name of the locus, also used as accession
+    Returns:
+        The text of the record
+    """
+    rng = Random(seed)
+    lines = []
+    write = lines.append
+    write('LOCUS       {:<16}{:>12} bp    DNA     linear   BCT 01-JAN-2020\n'
+          .format(locus_name, length))
+    write('DEFINITION  Synthetic record {} for benchmarking, complete\n'
+          '            sequence.\n'.format(locus_name))
+    write('ACCESSION   {}\n'.format(locus_name))
+    write('VERSION     {}.1\n'.format(locus_name))
+    write('KEYWORDS    .\n')
+    write('SOURCE      Synthetic organism\n')
+    write('  ORGANISM  Synthetic organism\n'
+          '            Bacteria; Synthetic.\n')
+    for reference in range(1, 3):
+        write('REFERENCE   {}  (bases 1 to {})\n'.format(reference, length))
+        write('  AUTHORS   Doe,J. and Roe,R.\n')
+        write('  TITLE     A synthetic publication which has a title that\n'
+              '            spans multiple lines\n')
+        write('  JOURNAL   Unpublished\n')
+    write('FEATURES             Location/Qualifiers\n')
+    write('     source          1..{}\n'.format(length))
+    write('                     /organism="Synthetic organism"\n')
+    write('                     /mol_type="genomic DNA"\n')
+    for index in range(1, feature_count):
+        __write_gene(write, locus_name, index, length, feature_count, rng)
+    write('ORIGIN      \n')
+    sequence = rng.randbytes(length).translate(BASES).decode('ascii')
+    write(''.join(origin_lines(sequence, [60])))
+    write('//\n')
+    return ''.join(lines)
+
+
+def __write_gene(write, locus_name, index, length, feature_count, rng):
+    """ Writes a gene and its CDS """
+    # Spread the genes evenly over the sequence
+    span = max(length // feature_count, 20)
+    start = (index - 1) * span + 1
+    end = min(start + rng.randint(span // 2, span - 1), length)
+    middle = (start + end) // 2
+    if index % 3 == 0:
+        location = 'join({}..{},{}..{})'.format(start, middle - 5,
+                                                middle + 5, end)
+    else:
+        location = '{}..{}'.format(start, end)
+    if index % 2 == 0:
+        location = 'complement({})'.format(location)
+    locus_tag = '{}_{:05d}'.format(locus_name, index)
+    write('     gene            {}..{}\n'.format(start, end))
+    write('                     /locus_tag="{}"\n'.format(locus_tag))
+    write('     CDS             {}\n'.format(location))
+    write('                     /locus_tag="{}"\n'.format(locus_tag))
+    write('                     /codon_start=1\n')
+    write('                     /product="hypothetical protein"\n')
+    write('                     /protein_id="{}.1"\n'.format(locus_tag))
+    write('                     /db_xref="GeneID:{}"\n'.format(index))
+    translation = ''.join(rng.choice(AMINO_ACIDS)
+                          for _ in range((end - start) // 3))
+    qualifier = '/translation="{}"'.format(translation)
+    width = LINE_WIDTH - len(QUALIFIER_SPACING)
+    for part in range(0, len(qualifier), width):
+        write(QUALIFIER_SPACING + qualifier[part:part + width] + '\n')
+
+
+def origin_lines(bases, line_lengths):
+    """ Formats bases as the lines of an ORIGIN block.
+
+    Parameters:
+        bases - string
+            The bases
+        line_lengths - list
+            The amount of bases of every line, of which the last one is
+            repeated
+    Returns:
+        A list of lines
+    """
+    lines = []
+    start = 0
+    while start < len(bases):
+        length = line_lengths[min(len(lines), len(line_lengths) - 1)]
+        line = bases[start:start + length].lower()
+        lines.append('{:>9} {}\n'.format(start + 1, ' '.join(
+            line[i:i + 10] for i in range(0, len(line), 10))))
+        start += length
+    return lines
+
+
+def with_origin_lines(text, bases, line_lengths):
+    """ Replaces the ORIGIN block of a record by lines of the given
+    lengths, see 'origin_lines'.
+    """
+    head = text[:text.index('ORIGIN')]
+    return head + 'ORIGIN\n' + ''.join(origin_lines(bases, line_lengths)) + \
+        '//\n'
+
+
+def parse_record(text, binary=False):
+    """ Parses the first record of a text.
+
+    Returns:
+        A tuple with the Metadata object, the list of Feature objects
+        and the Sequence object
+    """
+    with GenbankParser(text.encode('utf-8'), binary=binary) as parser:
+        return (parser.parse_metadata(), parser.parse_features(),
+                parser.parse_origin())
+
+
+def parse_records(source, binary=False, **options):
+    """ Parses all records of a source to comparable values.
+
+    Returns:
+        A list with a tuple of the LOCUS fields, the description, the
+        publications, the (key, location, qualifiers) of every feature
+        and the sequence of every record
+    """
+    records = []
+    with GenbankParser(source, binary=binary, **options) as parser:
+        while parser.has_record():
+            metadata = parser.parse_metadata()
+            features = parser.parse_features()
+            sequence = parser.parse_origin()
+            records.append((
+                (metadata.locus_name, metadata.seq_length,
+                 metadata.molecule_type, metadata.molecule_formation,
+                 metadata.division, metadata.modification_date_str),
+                metadata.description,
+                [vars(publication) for publication in metadata.publications],
+                [(feature.name, str(feature.location), feature.attributes)
+                 for feature in features],
+                sequence.get_sequence()))
+    return records
+
+
+class Stream(object):
+    """ A binary stream which cannot seek, like a pipe or an HTTP
+    response.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def read(self, size=-1):
+        end = len(self.data) if size < 0 else self.position + size
+        data = self.data[self.position:end]
+        self.position += len(data)
+        return data
@@ -0,0 +1,128 @@
+from contextlib import redirect_stderr
+from io import StringIO
+from json import load, loads
+from os.path import getsize, join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.cli import main
+from src.origin_parser import reverse_complement
+
+from .records import parse_records, synthetic_record
+
+
+class CliTest(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.first = join(self.directory.name, 'first.gb')
+        self.second = join(self.directory.name, 'second.gb')
+        with open(self.first, 'w') as filehandle:
+            filehandle.write(synthetic_record() + synthetic_record(
+                2000, seed=2, locus_name='TEST00002'))
+        with open(self.second, 'w') as filehandle:
+            filehandle.write(synthetic_record(500, seed=3,
+                                              locus_name='TEST00003'))
+        self.expected = (parse_records(self.first) +
+                         parse_records(self.second))
+        self.output = join(self.directory.name, 'output')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_command(self, *args, status=0):
+        errors = StringIO()
+        with patch('src.cli.stderr', errors):
+            self.assertEqual(main(list(args) + ['--output', self.output]),
+                             status)
+        with open(self.output, encoding='utf-8') as filehandle:
+            return filehandle.read(), errors.getvalue()
+
+    def test_convert_fasta(self):
+        output, errors = self.run_command(
+            'convert', join(self.directory.name, '*.gb'), '--jobs', '2')
+        entries = output.split('>')[1:]
+        self.assertEqual([entry.split(' ', 1)[0] for entry in entries],
+                         ['TEST00001.1', 'TEST00002.1', 'TEST00003.1'])
+        self.assertEqual([''.join(entry.split('\n')[1:])
+                          for entry in entries],
+                         [record[4] for record in self.expected])
+        self.assertTrue(errors.startswith('2 files, 3 records'))
+
+    def test_convert_json(self):
+        output, _ = self.run_command('convert', '--format', 'json',
+                                     '--quiet', self.first, self.second)
+        records = [loads(line) for line in output.splitlines()]
+        self.assertEqual([(record['locus_name'], record['sequence'])
+                          for record in records],
+                         [(record[0][0], record[4])
+                          for record in self.expected])
+        self.assertEqual([[(feature['type'], feature['location'],
+                            feature['qualifiers'])
+                           for feature in record['features']]
+                          for record in records],
+                         [record[3] for record in self.expected])
+
+    def test_convert_gff3(self):
+        output, _ = self.run_command('convert', '--format', 'gff3',
+                                     '--quiet', self.second)
+        lines = output.splitlines()
+        self.assertEqual(lines[:2], ['##gff-version 3',
+                                     '##sequence-region TEST00003.1 1 500'])
+        # A line for every part of the locations
+        self.assertEqual(len(lines) - 2, sum(
+            feature[1].count('..') for feature in self.expected[2][3]))
+
+    def test_extract(self):
+        output, _ = self.run_command(
+            'extract', '--type', 'CDS', '--qualifier',
+            'locus_tag=TEST00001_00002', '--quiet', self.first)
+        header, *lines = output.splitlines()
+        self.assertEqual(header, '>TEST00001_00002 CDS '
+                                 'TEST00001.1:complement(167..306)')
+        self.assertEqual(''.join(lines),
+                         reverse_complement(self.expected[0][4][166:306]))
+        output, _ = self.run_command('extract', '--format', 'json',
+                                     '--qualifier', 'db_xref', '--quiet',
+                                     self.first)
+        self.assertEqual(len(output.splitlines()), 10)
+
+    def test_stats(self):
+        output, _ = self.run_command('stats', '--quiet', self.first,
+                                     self.second)
+        lines = output.splitlines()
+        self.assertEqual(lines[3].split()[:4], ['total', '3', '3500', '33'])
+        self.assertEqual(lines[4].split(), ['gene', '15'])
+        self.assertEqual(lines[6].split(), ['source', '3'])
+
+    def test_index(self):
+        output, _ = self.run_command('index', '--quiet', '--jobs', '2',
+                                     self.first, self.second)
+        with open(self.output) as filehandle:
+            entries = load(filehandle)['records']
+        self.assertEqual([(entry['id'], entry['file'])
+                          for entry in entries],
+                         [('TEST00001.1', self.first),
+                          ('TEST00002.1', self.first),
+                          ('TEST00003.1', self.second)])
+        self.assertEqual(entries[1]['start'], entries[0]['end'])
+        self.assertEqual(entries[1]['end'], getsize(self.first))
+        with open(self.first, 'rb') as filehandle:
+            filehandle.seek(entries[1]['start'])
+            self.assertTrue(filehandle.read(21).startswith(
+                b'LOCUS       TEST00002'))
+
+    def test_errors(self):
+        broken = join(self.directory.name, 'broken.gb')
+        with open(broken, 'w') as filehandle:
+            # The second record has no ORIGIN
+            filehandle.write(synthetic_record() + synthetic_record(
+                locus_name='TEST00002').replace('ORIGIN', 'ORIGXN'))
+        output, errors = self.run_command('convert', '--quiet', broken,
+                                          self.second, status=1)
+        # The broken file is reported without its partial output
+        self.assertEqual(output.count('>'), 1)
+        self.assertTrue(errors.startswith('error: ' + broken))
+        with redirect_stderr(StringIO()), self.assertRaises(SystemExit):
+            main(['stats', join(self.directory.name, 'missing*.gb')])
@@ -0,0 +1,69 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.content_store import ContentStore
+from src.genbank_parser import GenbankParser
+from src.origin_parser import sequence_digest
+
+from .records import (Stream, parse_record, synthetic_record,
+                      with_origin_lines)
+
+
+class ContentStoreTest(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        first = synthetic_record()
+        second = synthetic_record(seed=2)
+        self.bases = [parse_record(text)[2].get_sequence()
+                      for text in (first, second)]
+        # The first sequence is repeated, once with another layout
+        self.filename = join(self.directory.name, 'records.gb')
+        with open(self.filename, 'w') as filehandle:
+            filehandle.write(first + second + first.replace(
+                'TEST00001', 'COPY00001') + with_origin_lines(
+                first, self.bases[0], [50]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check_store(self, store):
+        for binary in (True, False):
+            records = store.add_file(self.filename, binary)
+            digests = [digest for _, digest in records]
+            self.assertEqual(digests, [sequence_digest(self.bases[0]),
+                                       sequence_digest(self.bases[1]),
+                                       digests[0], digests[0]])
+            self.assertEqual(records[2][0].locus_name, 'COPY00001')
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store.stored_bases(), 2000)
+            self.assertEqual([store.get(digest).get_sequence()
+                              for digest in digests[:2]], self.bases)
+            self.assertIs(store.get(digests[0]), store.get(digests[3]))
+
+    def test_in_memory(self):
+        self.check_store(ContentStore())
+
+    def test_directory(self):
+        self.check_store(ContentStore(join(self.directory.name, 'store')))
+        # The sequences are found again from the directory
+        store = ContentStore(join(self.directory.name, 'store'))
+        self.assertEqual(store.get(sequence_digest(self.bases[1]))
+                         .get_sequence(), self.bases[1])
+
+    def test_stream(self):
+        # The ORIGIN block of a stream can only be read once
+        with open(self.filename, 'rb') as filehandle:
+            data = filehandle.read()
+        store = ContentStore()
+        digests = []
+        for binary in (True, False):
+            with GenbankParser(Stream(data), binary=binary) as parser:
+                while parser.has_record():
+                    parser.parse_metadata(False)
+                    parser.parse_features(False)
+                    digests.append(store.add_origin(parser))
+        self.assertEqual(digests[:4], digests[4:])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get(digests[1]).get_sequence(), self.bases[1])
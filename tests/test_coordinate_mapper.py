@@ -0,0 +1,80 @@
+from unittest import TestCase
+
+from src.coordinate_mapper import NO_CODON, CoordinateMapper
+from src.features_parser import Feature
+
+
+class CoordinateMapperTest(TestCase):
+
+    def setUp(self):
+        self.mapper = CoordinateMapper([
+            Feature('gene', '5..45', {}),
+            Feature('CDS', 'join(10..20,30..40)', {}),
+            Feature('CDS', 'complement(join(50..55,60..>65))',
+                    {'codon_start': '2'}),
+            Feature('mRNA', 'join(<5..20,30..45)', {}),
+            Feature('CDS', 'join(X12345.1:1..10,100..110)', {})])
+
+    def mapped(self, positions):
+        # The transcripts of a position are in no particular order
+        mapped = self.mapper.to_transcripts(positions)
+        return sorted([(positions[index], map_index, coordinate, codon, phase)
+                for index, map_index, coordinate, codon, phase
+                in mapped.rows()])
+
+    def test_maps(self):
+        self.assertEqual([transcript.feature.name
+                          for transcript in self.mapper.maps],
+                         ['CDS', 'CDS', 'mRNA', 'CDS'])
+        self.assertEqual([transcript.length()
+                          for transcript in self.mapper.maps],
+                         [22, 12, 32, 21])
+        cds, complement, mrna, _ = self.mapper.maps
+        self.assertFalse(cds.five_prime_partial)
+        # The '>' of the reverse strand is the 5' end
+        self.assertTrue(complement.five_prime_partial)
+        self.assertFalse(complement.three_prime_partial)
+        self.assertTrue(mrna.five_prime_partial)
+        self.assertIsNone(mrna.codon_start)
+
+    def test_join(self):
+        self.assertEqual(self.mapped([40, 10, 25, 20, 30]), [
+            (10, 0, 1, 1, 0), (10, 2, 6, NO_CODON, NO_CODON),
+            (20, 0, 11, 4, 1), (20, 2, 16, NO_CODON, NO_CODON),
+            (30, 0, 12, 4, 2), (30, 2, 17, NO_CODON, NO_CODON),
+            (40, 0, 22, 8, 0), (40, 2, 27, NO_CODON, NO_CODON)])
+
+    def test_complement(self):
+        # Read from 65 to 60 and then from 55 to 50, with the first
+        # codon starting at the second base
+        self.assertEqual(self.mapped([65, 64, 60, 55, 50, 57]), [
+            (50, 1, 12, 4, 1), (55, 1, 7, 2, 2), (60, 1, 6, 2, 1),
+            (64, 1, 2, 1, 0), (65, 1, 1, NO_CODON, NO_CODON)])
+        complement = self.mapper.maps[1]
+        self.assertEqual(complement.to_codon(7), (2, 2))
+        self.assertEqual(complement.codon_to_genome(1), 64)
+        self.assertEqual(complement.codon_to_genome(2, 2), 55)
+
+    def test_remote(self):
+        # The remote part only adds its length
+        self.assertEqual(self.mapped([100, 110]), [
+            (100, 3, 11, 4, 1), (110, 3, 21, 7, 2)])
+        self.assertIsNone(self.mapper.maps[3].to_genome(5))
+
+    def test_round_trip(self):
+        positions = list(range(120, 0, -1))
+        mapped = self.mapper.to_transcripts(positions)
+        self.assertEqual(
+            list(self.mapper.to_genome(mapped.map_indexes,
+                                       mapped.coordinates)),
+            [positions[index] for index in mapped.position_indexes])
+        # The sweep gives the same as mapping every position by itself
+        expected = sorted(
+            (position, map_index, transcript.to_transcript(position))
+            for position in positions
+            for map_index, transcript in enumerate(self.mapper.maps)
+            if transcript.to_transcript(position) is not None)
+        self.assertEqual([row[:3] for row in self.mapped(positions)],
+                         expected)
+        self.assertEqual(list(self.mapper.to_genome([0, 0, 1], [0, 23, 1])),
+                         [-1, -1, 65])
@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from src.genbank_parser import GenbankParser
+
+from .records import synthetic_record
+
+FEATURES = """FEATURES             Location/Qualifiers
+     CDS             1..30
+                     /note="a note which continues
+                     on the next line
+                     and the one after"
+                     /translation="MKV
+                     LLA
+                     W"
+                     /pseudo
+                     /codon_start=1
+ORIGIN
+"""
+
+
+def parse_block(block, binary=False):
+    with GenbankParser(block.encode('utf-8'), binary=binary) as parser:
+        return parser.parse_features()
+
+
+class QualifiersTest(TestCase):
+
+    def test_multiline_values(self):
+        for binary in (False, True):
+            feature, = parse_block(FEATURES, binary)
+            self.assertEqual(feature.attributes, {
+                'note': 'a note which continues on the next line and the '
+                        'one after',
+                'translation': 'MKVLLAW', 'pseudo': '', 'codon_start': '1'})
+
+    def test_unterminated_value(self):
+        block = FEATURES[:FEATURES.index('                     W"')]
+        for binary in (False, True):
+            with self.assertRaises(ValueError):
+                parse_block(block, binary)
+
+
+def parse_features(data, workers, encoding, binary):
+    with GenbankParser(data, encoding=encoding, binary=binary) as parser:
+        parser.parse_metadata(False)
+        return [(feature.name, str(feature.location), feature.attributes)
+                for feature in parser.parse_features(workers=workers)]
+
+
+class ParallelFeaturesTest(TestCase):
+
+    def test_same_as_serial(self):
+        data = synthetic_record(20000, 200).encode('utf-8')
+        for binary in (False, True):
+            self.assertEqual(parse_features(data, 2, 'utf-8', binary),
+                             parse_features(data, None, 'utf-8', binary))
+
+    def test_encoding(self):
+        # The workers decode the chunks with the encoding of the parser
+        text = synthetic_record(20000, 200).replace(
+            '/product="hypothetical protein"', '/product="protéine"')
+        data = text.encode('latin-1')
+        for binary in (False, True):
+            features = parse_features(data, 2, 'latin-1', binary)
+            self.assertEqual(features,
+                             parse_features(data, None, 'latin-1', binary))
+            self.assertEqual(features[-1][2]['product'], 'protéine')
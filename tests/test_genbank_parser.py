@@ -0,0 +1,103 @@
+from unittest import TestCase
+
+from src.genbank_parser import GenbankParser
+
+from .records import Stream, parse_records, synthetic_record
+
+
+class BinaryModeTest(TestCase):
+
+    def setUp(self):
+        self.text = synthetic_record() + synthetic_record(
+            2000, seed=2, locus_name='TEST00002')
+
+    def test_same_as_text(self):
+        data = self.text.encode('utf-8')
+        expected = parse_records(data)
+        self.assertEqual(parse_records(data, True), expected)
+        self.assertEqual(parse_records(Stream(data), True), expected)
+
+    def test_latin_1(self):
+        text = self.text.replace(
+            'Synthetic record TEST00002', 'Séquence TEST00002').replace(
+            '/product="hypothetical protein"', '/product="protéine"')
+        data = text.encode('latin-1')
+        expected = parse_records(data, encoding='latin-1')
+        self.assertEqual(expected[1][1], 'Séquence TEST00002 for '
+                                         'benchmarking, complete sequence.')
+        self.assertEqual(expected[1][3][-1][2]['product'], 'protéine')
+        self.assertEqual(parse_records(data, True, encoding='latin-1'),
+                         expected)
+
+    def test_values_stay_bytes_until_used(self):
+        with GenbankParser(self.text.encode('utf-8'), binary=True) as parser:
+            metadata = parser.parse_metadata()
+            features = parser.parse_features()
+        self.assertIsInstance(metadata.header.data, bytes)
+        self.assertEqual(metadata.accession, 'TEST00001')
+        feature = features[2]
+        self.assertIsInstance(feature.name, str)
+        # The encoding is kept until the attributes are decoded
+        self.assertEqual(feature.encoding, 'utf-8')
+        self.assertEqual(feature.attributes['product'],
+                         'hypothetical protein')
+        self.assertIsNone(feature.encoding)
+
+    def test_origin_coordinates(self):
+        # A missing ORIGIN line is found by the coordinates in binary
+        # mode, which decodes the block at once. Text mode and streams
+        # read the lines one by one and do not check them.
+        text = synthetic_record()
+        text = text.replace(text[text.index('      121 '):
+                                 text.index('      181 ')], '')
+        data = text.encode('utf-8')
+        with GenbankParser(data, binary=True) as parser:
+            parser.parse_metadata(False)
+            parser.parse_features(False)
+            with self.assertRaises(ValueError):
+                parser.parse_origin()
+        for source, binary in ((data, False), (Stream(data), True)):
+            self.assertEqual(len(parse_records(source, binary)[0][4]), 940)
+
+
+class RecordsTest(TestCase):
+
+    def setUp(self):
+        self.text = synthetic_record() + synthetic_record(
+            2000, seed=2, locus_name='TEST00002')
+        self.expected = parse_records(self.text.encode('utf-8'))
+
+    def test_skip_origin(self):
+        # Skipping the sequence reads past its '//', so the next record
+        # is parsed from its LOCUS line
+        for binary in (False, True):
+            with GenbankParser(self.text.encode('utf-8'),
+                               binary=binary) as parser:
+                self.assertTrue(parser.has_record())
+                parser.parse_metadata(False)
+                parser.parse_features(False)
+                self.assertIs(parser.parse_origin(False), True)
+                self.assertTrue(parser.has_record())
+                metadata = parser.parse_metadata()
+                self.assertEqual(metadata.locus_name, 'TEST00002')
+                self.assertEqual(len(parser.parse_features()),
+                                 len(self.expected[1][3]))
+                self.assertEqual(parser.parse_origin().get_sequence(),
+                                 self.expected[1][4])
+                self.assertFalse(parser.has_record())
+
+    def test_has_record(self):
+        data = (self.text + '\n\n').encode('utf-8')
+        with GenbankParser(data) as parser:
+            for _ in range(2):
+                self.assertTrue(parser.has_record())
+                # It does not move the parser
+                self.assertTrue(parser.has_record())
+                parser.parse_metadata()
+                parser.parse_features()
+                parser.parse_origin(False)
+            # Blank lines at the end are not a record
+            self.assertFalse(parser.has_record())
+        for source in (b'', b'\n'):
+            with GenbankParser(source) as parser:
+                self.assertFalse(parser.has_record())
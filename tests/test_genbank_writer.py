@@ -0,0 +1,97 @@
+from io import StringIO
+from unittest import TestCase
+
+from src.genbank_writer import GenbankWriter, slice_record
+
+from .records import parse_record, synthetic_record
+
+LOCUS_FIELDS = ('locus_name', 'seq_length', 'molecule_type',
+                'molecule_formation', 'division', 'modification_date_str')
+
+
+def write_record(metadata, features, sequence):
+    """ Writes a record and returns the text """
+    filehandle = StringIO()
+    with GenbankWriter(filehandle) as writer:
+        writer.write(metadata, features, sequence)
+    return filehandle.getvalue()
+
+
+def feature_fields(features):
+    return [(feature.name, str(feature.location), feature.attributes)
+            for feature in features]
+
+
+class RoundTripTest(TestCase):
+
+    def test_parse_write_parse(self):
+        for binary in (False, True):
+            metadata, features, sequence = parse_record(synthetic_record(),
+                                                        binary)
+            parsed = parse_record(write_record(metadata, features, sequence))
+            parsed_metadata, parsed_features, parsed_sequence = parsed
+            for field in LOCUS_FIELDS + ('description', 'accession',
+                                         'version', 'keywords', 'source',
+                                         'organism', 'comment'):
+                self.assertEqual(getattr(metadata, field),
+                                 getattr(parsed_metadata, field), field)
+            self.assertEqual(
+                [vars(publication) for publication in metadata.publications],
+                [vars(publication)
+                 for publication in parsed_metadata.publications])
+            self.assertEqual(feature_fields(features),
+                             feature_fields(parsed_features))
+            self.assertEqual(sequence.get_sequence(),
+                             parsed_sequence.get_sequence())
+
+    def test_write_is_stable(self):
+        text = write_record(*parse_record(synthetic_record()))
+        self.assertEqual(text, write_record(*parse_record(text)))
+
+
+class SliceRecordTest(TestCase):
+
+    def setUp(self):
+        self.metadata, self.features, self.sequence = parse_record(
+            synthetic_record())
+
+    def slice(self, start, end):
+        return slice_record(self.metadata, self.features, self.sequence,
+                            start, end)
+
+    def test_region(self):
+        metadata, features, sequence = self.slice(12, 600)
+        self.assertEqual(metadata.seq_length, 589)
+        self.assertEqual(metadata.molecule_formation, 'linear')
+        self.assertEqual(sequence.get_sequence(),
+                         self.sequence.get_sequence()[11:600])
+        self.assertEqual([str(feature.location) for feature in features], [
+            '<1..>589', '<1..90', '<1..90', '156..295',
+            'complement(156..295)', '322..465',
+            'join(322..388,398..465)', '488..>589',
+            'complement(488..>589)'])
+
+    def test_codon_start_forward_strand(self):
+        # 11 bases of 'CDS 1..101' are cut off at its 5' end
+        cds = self.slice(12, 600)[1][2]
+        self.assertEqual(cds.get_attribute('codon_start'), '2')
+        for start, codon_start in ((2, '3'), (3, '2'), (4, '1'),
+                                   (5, '3')):
+            cds = self.slice(start, 600)[1][2]
+            self.assertEqual(cds.get_attribute('codon_start'), codon_start)
+
+    def test_codon_start_reverse_strand(self):
+        # 61 bases of 'complement(499..661)' are cut off at its 5' end,
+        # which is on the right
+        cds = self.slice(12, 600)[1][-1]
+        self.assertEqual(cds.get_attribute('codon_start'), '3')
+        # Cutting the 3' end keeps the reading frame
+        cds = self.slice(550, 1000)[1][2]
+        self.assertEqual(str(cds.location), 'complement(<1..112)')
+        self.assertEqual(cds.get_attribute('codon_start'), '1')
+        # The original feature is not changed
+        self.assertEqual(self.features[8].get_attribute('codon_start'), '1')
+
+    def test_empty_region(self):
+        with self.assertRaises(ValueError):
+            self.slice(1001, 1100)
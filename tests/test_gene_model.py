@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from src.features_parser import Feature
+from src.gene_model import GeneModelBuilder
+
+
+def build(features):
+    builder = GeneModelBuilder()
+    for name, location, attributes in features:
+        builder.add(Feature(name, location, attributes))
+    return builder.build()
+
+
+def cds_locations(transcript):
+    return [str(cds.location) for cds in transcript.cds]
+
+
+class LinkCdsTest(TestCase):
+
+    GENE = ('gene', '100..900', {'gene': 'abc'})
+    MRNA_1 = ('mRNA', 'join(100..300,400..600,800..900)',
+              {'gene': 'abc', 'transcript_id': 'NM_1.1',
+               'product': 'abc, transcript variant 1'})
+    MRNA_2 = ('mRNA', 'join(100..300,800..900)',
+              {'gene': 'abc', 'transcript_id': 'NM_2.1',
+               'product': 'abc, transcript variant 2'})
+
+    def test_by_qualifier(self):
+        models, orphans = build([
+            self.GENE, self.MRNA_1, self.MRNA_2,
+            ('CDS', 'join(200..300,800..850)',
+             {'gene': 'abc', 'transcript_id': 'NM_2.1'}),
+            ('CDS', 'join(200..300,400..600,800..850)',
+             {'gene': 'abc', 'product': 'abc, transcript variant 1'})])
+        transcripts = models[0].transcripts
+        self.assertEqual(cds_locations(transcripts[0]),
+                         ['join(200..300,400..600,800..850)'])
+        self.assertEqual(cds_locations(transcripts[1]),
+                         ['join(200..300,800..850)'])
+        self.assertEqual(orphans, [])
+
+    def test_by_exons(self):
+        # Only the exons of the first transcript contain the second
+        # part of the CDS
+        models, _ = build([self.GENE, self.MRNA_2, self.MRNA_1,
+                           ('CDS', 'join(200..300,400..600,800..850)',
+                            {'gene': 'abc'})])
+        transcripts = models[0].transcripts
+        self.assertEqual([cds_locations(transcript)
+                          for transcript in transcripts],
+                         [[], ['join(200..300,400..600,800..850)']])
+
+    def test_ambiguous(self):
+        # Both transcripts contain the CDS
+        models, _ = build([self.GENE, self.MRNA_1, self.MRNA_2,
+                           ('CDS', 'join(200..300,800..850)',
+                            {'gene': 'abc', 'transcript_id': 'NM_3.1'})])
+        model = models[0]
+        self.assertEqual([cds_locations(transcript)
+                          for transcript in model.transcripts],
+                         [['join(200..300,800..850)']] * 2)
+        self.assertEqual(model.cds, [])
+
+    def test_without_transcript(self):
+        models, _ = build([self.GENE, ('CDS', '100..900', {'gene': 'abc'})])
+        self.assertEqual([str(cds.location) for cds in models[0].cds],
+                         ['100..900'])
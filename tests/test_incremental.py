@@ -0,0 +1,116 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.incremental import IncrementalState
+
+from .records import synthetic_record
+
+
+def names(records):
+    return [record.metadata.locus_name for record in records]
+
+
+class IncrementalStateTest(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.filename = join(self.directory.name, 'records.gb')
+        self.records = [synthetic_record(1000, seed=seed,
+                                         locus_name='TEST0000' + str(seed))
+                        for seed in range(1, 5)]
+        self.write(self.records[:3])
+        self.state = IncrementalState()
+        self.delta = self.state.update(self.filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, records, mode='w'):
+        with open(self.filename, mode) as filehandle:
+            filehandle.write(''.join(records))
+
+    def test_first_update(self):
+        self.assertEqual(names(self.delta.appended),
+                         ['TEST00001', 'TEST00002', 'TEST00003'])
+        self.assertEqual((self.delta.changed, self.delta.removed), ([], []))
+        self.assertTrue(self.state.update(self.filename).is_empty())
+
+    def test_appended(self):
+        for verify in (True, False):
+            self.write(self.records[3:], 'a')
+            delta = self.state.update(self.filename, verify)
+            self.assertEqual(names(delta.appended), ['TEST00004'])
+            self.assertEqual(delta.appended[0].sequence.length(), 1000)
+            self.assertEqual((delta.changed, delta.removed), ([], []))
+            self.write(self.records[:3])
+            self.state.update(self.filename)
+
+    def test_incomplete_record(self):
+        self.write([self.records[3][:500]], 'a')
+        self.assertTrue(self.state.update(self.filename, False).is_empty())
+        self.write([self.records[3][500:]], 'a')
+        self.assertEqual(names(self.state.update(self.filename,
+                                                 False).appended),
+                         ['TEST00004'])
+
+    def test_appended_copy(self):
+        # A copy of a record which is already in the file is new
+        for verify in (True, False):
+            self.write(self.records[:1], 'a')
+            delta = self.state.update(self.filename, verify)
+            self.assertEqual(names(delta.appended), ['TEST00001'])
+            self.assertEqual(delta.appended[0].boundary.start,
+                             len(''.join(self.records[:3])))
+            self.write(self.records[:3])
+            self.assertEqual(len(self.state.update(self.filename).removed),
+                             1)
+
+    def test_changed(self):
+        previous = self.state.records[1]
+        changed = self.records[1].replace('/codon_start=1',
+                                          '/codon_start=2')
+        self.write([self.records[0], changed, self.records[2]])
+        delta = self.state.update(self.filename)
+        self.assertEqual(names(delta.changed), ['TEST00002'])
+        self.assertEqual(delta.changed[0].previous, previous)
+        self.assertEqual((delta.appended, delta.removed), ([], []))
+        self.assertEqual(delta.changed[0].features[2]
+                         .get_attribute('codon_start'), '2')
+
+    def test_last_record_changed(self):
+        # Without verifying, a changed last record still scans the file
+        changed = self.records[2].replace('/codon_start=1',
+                                          '/codon_start=3')
+        self.write(self.records[:2] + [changed] + self.records[3:])
+        delta = self.state.update(self.filename, False)
+        self.assertEqual(names(delta.changed), ['TEST00003'])
+        self.assertEqual(names(delta.appended), ['TEST00004'])
+        self.assertEqual(delta.removed, [])
+
+    def test_removed(self):
+        removed = self.state.records[1]
+        self.write([self.records[0], self.records[2]])
+        delta = self.state.update(self.filename)
+        self.assertEqual(delta.removed, [removed])
+        self.assertEqual((delta.appended, delta.changed), ([], []))
+
+    def test_renamed(self):
+        # A record with another name does not replace the old one
+        renamed = self.records[1].replace('TEST00002', 'TEST00005')
+        self.write([self.records[0], renamed, self.records[2]])
+        delta = self.state.update(self.filename)
+        self.assertEqual(names(delta.changed), ['TEST00005'])
+        self.assertIsNone(delta.changed[0].previous)
+        self.assertEqual([record.name for record in delta.removed],
+                         ['TEST00002'])
+
+    def test_save_and_load(self):
+        filename = join(self.directory.name, 'state.json')
+        self.state.save(filename)
+        state = IncrementalState.load(filename)
+        self.assertEqual(state.records, self.state.records)
+        self.assertEqual(state.offset, self.state.offset)
+        self.write(self.records[3:], 'a')
+        self.assertEqual(names(state.update(self.filename, False).appended),
+                         ['TEST00004'])
@@ -0,0 +1,48 @@
+from os.path import join
+from pickle import dumps, loads
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.genbank_parser import GenbankParser
+from src.metadata_parser import Metadata
+
+from .records import synthetic_record
+
+
+class MetadataTest(TestCase):
+
+    def test_fields_as_arguments(self):
+        metadata = Metadata('X', '10', 'DNA', 'linear', 'BCT',
+                            '01-JAN-2020', 'A record.', 'X', ('X.1',), '.',
+                            'Organism', 'Organism\nBacteria.', [])
+        self.assertEqual((metadata.seq_length, metadata.description,
+                          metadata.version, metadata.publications),
+                         (10, 'A record.', ('X.1',), []))
+        self.assertIsNone(metadata.comment)
+
+    def test_header_with_blank_lines(self):
+        # The features are read from the line after the header, also
+        # when the header has blank lines and in text mode
+        text = synthetic_record().replace('KEYWORDS    .\n',
+                                          'KEYWORDS    .\n\n   \n')
+        with TemporaryDirectory() as directory:
+            filename = join(directory, 'record.gb')
+            for newline in ('\n', '\r\n'):
+                with open(filename, 'w', newline=newline) as filehandle:
+                    filehandle.write(text)
+                for binary in (False, True):
+                    with GenbankParser(filename, binary=binary) as parser:
+                        metadata = parser.parse_metadata()
+                        features = parser.parse_features()
+                    self.assertEqual(metadata.keywords, '.')
+                    self.assertEqual(len(metadata.publications), 2)
+                    self.assertEqual(len(features), 11)
+
+    def test_pickle(self):
+        with GenbankParser(synthetic_record().encode('utf-8')) as parser:
+            metadata = parser.parse_metadata()
+        metadata.version = ('Y.2',)
+        restored = loads(dumps(metadata))
+        self.assertEqual((restored.locus_name, restored.version,
+                          restored.accession),
+                         ('TEST00001', ('Y.2',), 'TEST00001'))
@@ -0,0 +1,99 @@
+from unittest import TestCase
+
+from src.genbank_parser import GenbankParser
+from src.origin_parser import reverse_complement
+
+from .records import (Stream, parse_record, synthetic_record,
+                      with_origin_lines)
+
+REGIONS = ((1, 1), (1, 60), (59, 62), (61, 120), (100, 400), (941, 1000),
+           (1000, 1000))
+
+
+class FetchRegionTest(TestCase):
+
+    def setUp(self):
+        self.text = synthetic_record()
+        self.bases = parse_record(self.text)[2].get_sequence()
+
+    def check_regions(self, text):
+        for source in (text.encode('utf-8'), text.replace('\n', '\r\n')
+                       .encode('utf-8')):
+            with GenbankParser(source) as parser:
+                for start, end in REGIONS:
+                    expected = self.bases[start - 1:end]
+                    self.assertEqual(parser.fetch_region(start, end),
+                                     expected, (start, end))
+                    self.assertEqual(parser.fetch_region(start, end, -1),
+                                     reverse_complement(expected))
+
+    def test_standard_lines(self):
+        self.check_regions(self.text)
+
+    def test_lines_of_another_length(self):
+        self.check_regions(with_origin_lines(self.text, self.bases, [50]))
+        self.check_regions(with_origin_lines(self.text, self.bases, [70]))
+
+    def test_irregular_line(self):
+        # A short line in the middle moves the lines after it
+        self.check_regions(with_origin_lines(self.text, self.bases,
+                                             [60, 60, 55, 60]))
+
+    def test_wrong_coordinate(self):
+        self.check_regions(self.text.replace('\n       61 ',
+                                             '\n       62 '))
+
+    def test_past_the_end(self):
+        for text in (self.text, with_origin_lines(self.text, self.bases,
+                                                  [50])):
+            with GenbankParser(text.encode('utf-8')) as parser:
+                with self.assertRaises(ValueError):
+                    parser.fetch_region(990, 1010)
+                with self.assertRaises(ValueError):
+                    parser.fetch_region(1001, 1001)
+                with self.assertRaises(ValueError):
+                    parser.fetch_region(10, 5)
+
+
+def parse_sequences(source, binary=False, **options):
+    """ Parses the sequences of all records of a source """
+    sequences = []
+    with GenbankParser(source, binary=binary) as parser:
+        while parser.has_record():
+            parser.parse_metadata(False)
+            parser.parse_features(False)
+            sequences.append(parser.parse_origin(**options).get_sequence())
+    return sequences
+
+
+class ParallelOriginTest(TestCase):
+
+    def test_same_as_serial(self):
+        data = (synthetic_record(50000) + synthetic_record(
+            3000, seed=2)).encode('utf-8')
+        expected = parse_sequences(data)
+        self.assertEqual([len(bases) for bases in expected], [50000, 3000])
+        for binary in (False, True):
+            for workers in (2, 3):
+                self.assertEqual(parse_sequences(data, binary,
+                                                 workers=workers),
+                                 expected, (binary, workers))
+            self.assertEqual(parse_sequences(data, binary, workers=4,
+                                             use_processes=False),
+                             expected)
+            # A stream gives no access to its bytes, so it is parsed
+            # line by line
+            self.assertEqual(parse_sequences(Stream(data), binary,
+                                             workers=2), expected)
+
+    def test_missing_line(self):
+        # The coordinates of the lines do not match the decoded bases
+        text = synthetic_record(50000)
+        origin = text.index('ORIGIN')
+        lines = text[origin:].split('\n')
+        del lines[400]
+        data = (text[:origin] + '\n'.join(lines)).encode('utf-8')
+        for binary in (False, True):
+            with self.assertRaises(ValueError):
+                parse_sequences(data, binary, workers=2,
+                                use_processes=False)
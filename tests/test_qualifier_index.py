@@ -0,0 +1,74 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.genbank_parser import GenbankParser
+from src.qualifier_index import QualifierIndex, split_db_xref
+
+from .records import synthetic_record
+
+
+def parse_indexed(data, workers=None, binary=False):
+    index = QualifierIndex()
+    with GenbankParser(data, binary=binary) as parser:
+        parser.parse_metadata(False)
+        features = parser.parse_features(index=index, workers=workers)
+    return features, index
+
+
+class QualifierIndexTest(TestCase):
+
+    def setUp(self):
+        self.data = synthetic_record(20000, 200).encode('utf-8')
+
+    def check_index(self, features, index):
+        # Every gene is followed by its CDS, after the source
+        for number in range(1, 200):
+            locus_tag = 'TEST00001_{:05d}'.format(number)
+            self.assertEqual(index.lookup('locus_tag', locus_tag),
+                             [2 * number - 1, 2 * number])
+            found = index.lookup_features(features, 'locus_tag', locus_tag)
+            self.assertEqual([feature.name for feature in found],
+                             ['gene', 'CDS'])
+            self.assertEqual({feature.get_attribute('locus_tag')
+                              for feature in found}, {locus_tag})
+            self.assertEqual(index.lookup('protein_id', locus_tag + '.1'),
+                             [2 * number])
+            self.assertEqual(index.lookup('db_xref',
+                                          'GeneID:{}'.format(number)),
+                             [2 * number])
+        self.assertEqual(index.lookup('locus_tag', 'missing'), [])
+        with self.assertRaises(KeyError):
+            index.lookup('product', 'hypothetical protein')
+
+    def test_serial(self):
+        for binary in (False, True):
+            self.check_index(*parse_indexed(self.data, binary=binary))
+
+    def test_parallel(self):
+        for binary in (False, True):
+            features, index = parse_indexed(self.data, 2, binary)
+            self.check_index(features, index)
+            self.assertEqual(index.qualifiers,
+                             parse_indexed(self.data)[1].qualifiers)
+
+    def test_db_xref(self):
+        self.assertEqual(split_db_xref('GeneID:2'), ('GeneID', '2'))
+        self.assertEqual(split_db_xref('UniProtKB/Swiss-Prot:P1:2'),
+                         ('UniProtKB/Swiss-Prot', 'P1:2'))
+        self.assertEqual(split_db_xref('12345'), ('', '12345'))
+        index = QualifierIndex()
+        index.add(0, 'db_xref', 'GeneID:2')
+        index.add(0, 'db_xref', 'GI:7')
+        index.add(3, 'db_xref', 'GeneID:2')
+        self.assertEqual(index.lookup('db_xref', 'GeneID:2'), [0, 3])
+        self.assertEqual(index.lookup('db_xref', ('GI', '7')), [0])
+
+    def test_save_and_load(self):
+        features, index = parse_indexed(self.data)
+        with TemporaryDirectory() as directory:
+            filename = join(directory, 'index.json')
+            index.save(filename)
+            loaded = QualifierIndex.load(filename)
+        self.assertEqual(loaded.qualifiers, index.qualifiers)
+        self.check_index(features, loaded)
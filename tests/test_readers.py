@@ -0,0 +1,173 @@
+from io import BytesIO, StringIO
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.genbank_parser import GenbankParser
+from src.readers import PrefetchReader, StreamReader
+
+from .records import Stream, parse_records, synthetic_record
+
+
+class SourcesTest(TestCase):
+
+    def setUp(self):
+        self.text = synthetic_record() + synthetic_record(
+            2000, seed=2, locus_name='TEST00002')
+        self.data = self.text.encode('utf-8')
+        self.directory = TemporaryDirectory()
+        self.filename = join(self.directory.name, 'records.gb')
+        with open(self.filename, 'wb') as filehandle:
+            filehandle.write(self.data)
+        self.expected = parse_records(self.filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_expected(self):
+        self.assertEqual([record[0][0] for record in self.expected],
+                         ['TEST00001', 'TEST00002'])
+        self.assertEqual([len(record[4]) for record in self.expected],
+                         [1000, 2000])
+
+    def test_buffers(self):
+        for source in (self.data, bytearray(self.data),
+                       memoryview(self.data)):
+            for binary in (False, True):
+                self.assertEqual(parse_records(source, binary),
+                                 self.expected, type(source))
+
+    def test_file_objects(self):
+        self.assertEqual(parse_records(StringIO(self.text)), self.expected)
+        for binary in (False, True):
+            self.assertEqual(parse_records(BytesIO(self.data), binary),
+                             self.expected)
+            with open(self.filename, 'rb') as filehandle:
+                self.assertEqual(parse_records(filehandle, binary),
+                                 self.expected)
+        with self.assertRaises(TypeError):
+            parse_records(StringIO(self.text), True)
+
+    def test_streams(self):
+        for binary in (False, True):
+            self.assertEqual(parse_records(Stream(self.data), binary),
+                             self.expected)
+        self.assertEqual(parse_records(Stream(self.text)), self.expected)
+
+    def test_crlf(self):
+        data = self.text.replace('\n', '\r\n').encode('utf-8')
+        for source in (data, BytesIO(data), Stream(data)):
+            self.assertEqual(parse_records(source), self.expected)
+
+
+class StreamReaderTest(TestCase):
+
+    def test_seek_back_to_tell(self):
+        reader = StreamReader(Stream(b'first\nsecond\nthird\n'),
+                              block_size=4)
+        self.assertEqual(reader.readline(), 'first\n')
+        position = reader.tell()
+        self.assertEqual(reader.readline(), 'second\n')
+        self.assertEqual(reader.readline(), 'third\n')
+        reader.seek(position)
+        self.assertEqual(reader.readline(), 'second\n')
+        # Seeking to the current position is allowed
+        reader.seek(reader.tell())
+        self.assertEqual(reader.readline(), 'third\n')
+        self.assertEqual(reader.readline(), '')
+
+    def test_seek_elsewhere(self):
+        reader = StreamReader(Stream(b'first\nsecond\nthird\n'),
+                              binary=True)
+        reader.readline()
+        reader.tell()
+        reader.readline()
+        for position in (0, 3, 100):
+            with self.assertRaises(ValueError):
+                reader.seek(position)
+        reader.readline()
+        # The position before the last tell is no longer available
+        position = reader.tell()
+        with self.assertRaises(ValueError):
+            reader.seek(position - 7)
+
+
+class PrefetchReaderTest(TestCase):
+
+    def setUp(self):
+        self.data = (synthetic_record() + synthetic_record(
+            2000, seed=2, locus_name='TEST00002')).encode('utf-8')
+        self.directory = TemporaryDirectory()
+        self.filename = join(self.directory.name, 'records.gb')
+        with open(self.filename, 'wb') as filehandle:
+            filehandle.write(self.data)
+        self.expected = parse_records(self.filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_same_as_direct(self):
+        for binary in (False, True):
+            for block_size in (256, 4096, len(self.data) * 2):
+                self.assertEqual(
+                    parse_records(self.filename, binary, prefetch=2,
+                                  prefetch_block_size=block_size),
+                    self.expected, block_size)
+                self.assertEqual(
+                    parse_records(BytesIO(self.data), binary, prefetch=2,
+                                  prefetch_block_size=block_size),
+                    self.expected, block_size)
+
+    def test_statistics(self):
+        with GenbankParser(self.filename, prefetch=2,
+                           prefetch_block_size=1000) as parser:
+            self.assertIsInstance(parser.filehandle, PrefetchReader)
+            while parser.has_record():
+                parser.parse_metadata()
+                parser.parse_features()
+                parser.parse_origin()
+            statistics = parser.prefetch_statistics
+        self.assertEqual(statistics.blocks, -(-len(self.data) // 1000))
+        self.assertEqual(statistics.bytes, len(self.data))
+        # The parsers only seek back to the last tell
+        self.assertEqual(statistics.restarts, 0)
+        self.assertGreaterEqual(statistics.read_seconds, 0)
+        self.assertIn(statistics.bound(), ('I/O', 'CPU'))
+        self.assertTrue(str(statistics).startswith(
+            '{} blocks, '.format(statistics.blocks)))
+        self.assertIsNone(GenbankParser(self.data).prefetch_statistics)
+
+    def test_restart(self):
+        reader = PrefetchReader(BytesIO(self.data), depth=1, block_size=64)
+        first = reader.readline()
+        # The blocks before the last tell are dropped as lines are read
+        reader.tell()
+        for _ in range(10):
+            reader.readline()
+        reader.seek(0)
+        self.assertEqual(reader.statistics.restarts, 1)
+        self.assertEqual(reader.readline(), first)
+        reader.close()
+        self.assertFalse(reader.thread.is_alive())
+
+    def test_thread_exits_on_close(self):
+        filehandle = BytesIO(self.data)
+        parser = GenbankParser(filehandle, prefetch=1,
+                               prefetch_block_size=64)
+        parser.parse_metadata()
+        thread = parser.filehandle.thread
+        self.assertTrue(thread.is_alive())
+        parser.close()
+        self.assertFalse(thread.is_alive())
+        # The file object belongs to the caller
+        self.assertFalse(filehandle.closed)
+
+    def test_thread_exits_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with GenbankParser(self.filename, prefetch=1,
+                               prefetch_block_size=64) as parser:
+                parser.parse_metadata()
+                raise RuntimeError()
+        self.assertFalse(parser.filehandle.thread.is_alive())
+        # The file the reader opened is closed
+        self.assertTrue(parser.filehandle.filehandle.closed)
@@ -0,0 +1,98 @@
+import re
+from unittest import TestCase
+
+from src.features_parser import Feature
+from src.origin_parser import Sequence
+from src.record_diff import diff_records, diff_sequences
+
+from .records import parse_record, synthetic_record
+
+
+def shifted_feature(feature, position, shift):
+    """ Copies a feature with the coordinates from position on shifted """
+    location = re.sub(r'\d+', lambda match: str(
+        int(match.group()) + (shift if int(match.group()) >= position
+                              else 0)), str(feature.location))
+    return Feature(feature.name, location, dict(feature.attributes))
+
+
+class DiffSequencesTest(TestCase):
+
+    def setUp(self):
+        self.bases = parse_record(synthetic_record(60000))[2].get_sequence()
+
+    def test_same(self):
+        self.assertEqual(diff_sequences(self.bases, self.bases), [])
+
+    def test_edits(self):
+        # The edits are far apart, so they are in different chunks
+        bases = self.bases
+        old_bases = bases[:40000] + 'N' * 10 + bases[40000:]
+        new_bases = bases[:99] + 'NNN' + bases[99:20000] + 'N' + \
+            bases[20001:]
+        edits = diff_sequences(old_bases, new_bases)
+        self.assertEqual([(edit.kind(), edit.old_start, edit.old_end,
+                           edit.new_start, edit.new_end) for edit in edits],
+                         [('insertion', 100, 99, 100, 102),
+                          ('substitution', 20001, 20001, 20004, 20004),
+                          ('deletion', 40001, 40010, 40004, 40003)])
+        self.assertEqual([(edit.old_bases, edit.new_bases)
+                          for edit in edits],
+                         [('', 'NNN'), (bases[20000], 'N'),
+                          ('N' * 10, '')])
+
+
+class DiffRecordsTest(TestCase):
+
+    def setUp(self):
+        _, self.features, sequence = parse_record(synthetic_record())
+        self.bases = sequence.get_sequence()
+
+    def test_same(self):
+        diff = diff_records(self.features, parse_record(
+            synthetic_record())[1], Sequence(self.bases),
+            Sequence(self.bases))
+        self.assertTrue(diff.is_empty())
+        self.assertEqual(diff.unchanged, len(self.features))
+
+    def test_features(self):
+        features = self.features
+        new_features = [shifted_feature(feature, 0, 0)
+                        for feature in features[:-2]]
+        # A qualifier and a location change, a feature is replaced
+        new_features[2].attributes['product'] = 'kinase'
+        new_features[4] = shifted_feature(features[4], 300, 6)
+        del new_features[6]
+        new_features.append(Feature('misc_feature', '900..950', {}))
+        diff = diff_records(features, new_features)
+        self.assertEqual([(change.old, change.new, change.changes)
+                          for change in diff.modified],
+                         [(features[2], new_features[2], ['product']),
+                          (features[4], new_features[4], ['location'])])
+        self.assertEqual(diff.removed, [features[6], features[9],
+                                        features[10]])
+        self.assertEqual(diff.added, [new_features[-1]])
+        self.assertEqual(diff.unchanged, len(features) - 5)
+
+    def test_shifted_features(self):
+        # An insertion in front of base 665, the first base of a gene
+        # and its CDS
+        new_bases = self.bases[:664] + 'NNNNNN' + self.bases[664:]
+        new_features = [shifted_feature(feature, 665, 6)
+                        for feature in self.features]
+        new_features[-1].attributes['product'] = 'kinase'
+        diff = diff_records(self.features, new_features,
+                            Sequence(self.bases), Sequence(new_bases))
+        self.assertEqual([(edit.old_start, edit.old_end, edit.new_bases)
+                          for edit in diff.edits], [(665, 664, 'NNNNNN')])
+        self.assertEqual([(old, new) for old, new in diff.shifted],
+                         [(self.features[0], new_features[0]),
+                          (self.features[9], new_features[9])])
+        self.assertEqual(str(new_features[9].location), '671..782')
+        self.assertEqual(diff.unchanged, 8)
+        # A feature which moved and changed is matched by its location
+        self.assertEqual([(change.old, change.new, change.changes)
+                          for change in diff.modified],
+                         [(self.features[10], new_features[10],
+                           ['location', 'product'])])
+        self.assertEqual((diff.added, diff.removed), ([], []))
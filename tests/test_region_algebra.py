@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from src.region_algebra import (coverage, coverage_array, intersection,
+                                merge, subtract, union)
+
+LENGTH = 1000
+
+
+class CircularRegionTest(TestCase):
+
+    def test_merge_across_the_origin(self):
+        self.assertEqual(merge([(990, 1000, 1), (1, 10, 1)],
+                               genome_length=LENGTH, circular=True),
+                         [(990, 10, 0)])
+        self.assertEqual(merge([(990, 10, 1), (5, 20, 1)],
+                               genome_length=LENGTH, circular=True),
+                         [(990, 20, 0)])
+        # The ends are not joined on a linear genome
+        self.assertEqual(merge([(990, 1000, 1), (1, 10, 1)],
+                               genome_length=LENGTH),
+                         [(1, 10, 0), (990, 1000, 0)])
+
+    def test_merge_by_strand(self):
+        self.assertEqual(merge([(990, 1000, 1), (1, 10, -1)], True,
+                               genome_length=LENGTH, circular=True),
+                         [(1, 10, -1), (990, 1000, 1)])
+
+    def test_set_operations(self):
+        region = [(990, 10, 1)]
+        self.assertEqual(union(region, [(5, 20, 1)], genome_length=LENGTH,
+                               circular=True), [(990, 20, 0)])
+        self.assertEqual(intersection(region, [(1, 5, 1), (995, 998, 1)],
+                                      genome_length=LENGTH, circular=True),
+                         [(1, 5, 0), (995, 998, 0)])
+        self.assertEqual(intersection(region, [(980, 3, 1)],
+                                      genome_length=LENGTH, circular=True),
+                         [(990, 3, 0)])
+        self.assertEqual(subtract(region, [(1, 5, 1)], genome_length=LENGTH,
+                                  circular=True),
+                         [(6, 10, 0), (990, 1000, 0)])
+        self.assertEqual(subtract(region, [(500, 600, 1)],
+                                  genome_length=LENGTH, circular=True),
+                         [(990, 10, 0)])
+
+    def test_coverage(self):
+        self.assertEqual(coverage([(990, 10, 1), (995, 5, 1)],
+                                  genome_length=LENGTH, circular=True),
+                         [(6, 10, 0, 1), (990, 994, 0, 1), (995, 5, 0, 2)])
+        depths = coverage_array([(990, 10, 1), (995, 5, 1)], LENGTH,
+                                circular=True)
+        self.assertEqual(len(depths), LENGTH)
+        self.assertEqual(sum(depths), 21 + 11)
+        self.assertEqual((depths[0], depths[5], depths[988], depths[999]),
+                         (2, 1, 0, 2))
+
+    def test_origin_requires_a_circular_genome(self):
+        for arguments in ({}, {'genome_length': LENGTH},
+                          {'circular': True}):
+            with self.assertRaises(ValueError):
+                merge([(990, 10, 1)], **arguments)
+            with self.assertRaises(ValueError):
+                coverage([(990, 10, 1)], **arguments)
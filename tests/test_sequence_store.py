@@ -0,0 +1,57 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.location_parser import parse_location
+from src.sequence_store import SequenceStore
+
+from .records import parse_record, synthetic_record
+
+
+class SequenceStoreTest(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.text = synthetic_record()
+        self.bases = parse_record(self.text)[2].get_sequence()
+        # A second record without VERSION
+        other = synthetic_record(2000, seed=2).replace(
+            'TEST00001', 'OTHER0001').replace('VERSION     OTHER0001.1\n',
+                                              '')
+        self.other_bases = parse_record(other)[2].get_sequence()
+        with open(join(self.directory.name, 'records.gb'), 'w') as handle:
+            handle.write(self.text + other)
+        self.store = SequenceStore(max_bases=2500)
+        self.assertEqual(self.store.add_directory(self.directory.name), 2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_accession_and_version_share_the_cache(self):
+        sequence = self.store.get('TEST00001')
+        self.assertIs(self.store.get('TEST00001.1'), sequence)
+        self.assertEqual(sequence.get_accession(), 'TEST00001.1')
+        self.assertEqual(sequence.get_sequence(), self.bases)
+        self.assertEqual(list(self.store.cache), ['TEST00001.1'])
+        self.assertEqual(self.store.cached_bases, 1000)
+
+    def test_without_version(self):
+        self.assertIn('OTHER0001', self.store)
+        self.assertNotIn('OTHER0001.1', self.store)
+        self.assertEqual(self.store.get('OTHER0001').get_sequence(),
+                         self.other_bases)
+        with self.assertRaises(KeyError):
+            self.store.get('OTHER0001.1')
+
+    def test_eviction(self):
+        self.store.get('TEST00001')
+        self.store.get('OTHER0001')
+        # Both do not fit, the least recently used one is removed
+        self.assertEqual(list(self.store.cache), ['OTHER0001'])
+        self.store.get('TEST00001.1')
+        self.assertEqual(list(self.store.cache), ['TEST00001.1'])
+
+    def test_remote_location(self):
+        location = parse_location('TEST00001.1:11..20')
+        self.assertEqual(self.store.get_sequence_from_location(location),
+                         self.bases[10:20])
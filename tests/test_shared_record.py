@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from src import shared_record
+from src.shared_record import attach_record, publish_record
+
+from .records import parse_record, synthetic_record
+
+
+class SharedRecordTest(TestCase):
+
+    def test_attach_in_the_publishing_process(self):
+        metadata, features, sequence = parse_record(synthetic_record())
+        record = publish_record(metadata, features, sequence)
+        try:
+            self.assertIn(record.name, shared_record._PUBLISHED_NAMES)
+            with attach_record(record.name) as attached:
+                self.assertEqual(attached.metadata.locus_name, 'TEST00001')
+                self.assertEqual(
+                    [(feature.name, str(feature.location),
+                      feature.attributes) for feature in attached.features],
+                    [(feature.name, str(feature.location),
+                      feature.attributes) for feature in features])
+                self.assertEqual(attached.sequence.get_sequence(),
+                                 sequence.get_sequence())
+                with self.assertRaises(ValueError):
+                    attached.unlink()
+        finally:
+            record.close()
+            record.unlink()
+        self.assertNotIn(record.name, shared_record._PUBLISHED_NAMES)
+        with self.assertRaises(FileNotFoundError):
+            attach_record(record.name)
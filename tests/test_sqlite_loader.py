@@ -0,0 +1,86 @@
+import sqlite3
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from src.sqlite_loader import SqliteLoader, load_files
+
+from .records import parse_records, synthetic_record
+
+
+class SqliteLoaderTest(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.filename = join(self.directory.name, 'records.gb')
+        with open(self.filename, 'w') as filehandle:
+            filehandle.write(synthetic_record() + synthetic_record(
+                2000, seed=2, locus_name='TEST00002'))
+        self.expected = parse_records(self.filename)
+        self.database = join(self.directory.name, 'records.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def query(self, sql, *parameters):
+        connection = sqlite3.connect(self.database)
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def test_load_and_query(self):
+        statistics = load_files([self.filename], self.database,
+                                records_per_transaction=1, batch_size=7)
+        self.assertEqual(statistics.records, 2)
+        self.assertEqual(self.query(
+            'SELECT id, locus_name, seq_length, division FROM records '
+            'ORDER BY id'),
+            [(1, 'TEST00001', 1000, 'BCT'), (2, 'TEST00002', 2000, 'BCT')])
+        for record_id, record in enumerate(self.expected, 1):
+            self.assertEqual(self.query(
+                'SELECT name, location FROM features WHERE record_id = ? '
+                'ORDER BY position', record_id),
+                [feature[:2] for feature in record[3]])
+            self.assertEqual(self.query(
+                'SELECT sequence FROM sequences WHERE record_id = ?',
+                record_id), [(record[4],)])
+        self.assertEqual(statistics.rows['features'], sum(
+            len(record[3]) for record in self.expected))
+        self.assertEqual(statistics.total_rows(), sum(
+            self.query('SELECT COUNT(*) FROM ' + table)[0][0]
+            for table in statistics.rows))
+        # The parts of the CDS, found by their qualifier
+        parts = """
+            SELECT features.location, part, start, end, strand
+            FROM qualifiers JOIN features ON features.id = feature_id
+            JOIN feature_parts USING (feature_id)
+            WHERE key = 'locus_tag' AND value = ? AND name = 'CDS'
+            ORDER BY part"""
+        self.assertEqual(self.query(parts, 'TEST00001_00003'), [
+            ('join(333..399,409..476)', 0, 333, 399, 1),
+            ('join(333..399,409..476)', 1, 409, 476, 1)])
+        self.assertEqual(self.query(parts, 'TEST00001_00002'), [
+            ('complement(167..306)', 0, 167, 306, -1)])
+        indexes = {row[0] for row in self.query(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('qualifiers_key_value', indexes)
+
+    def test_without_sequences(self):
+        with SqliteLoader(self.database, store_sequences=False) as loader:
+            self.assertEqual(loader.load_file(self.filename), 2)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM sequences'),
+                         [(0,)])
+        self.assertEqual(self.query(
+            'SELECT locus_name FROM records ORDER BY id'),
+            [('TEST00001',), ('TEST00002',)])
+
+    def test_load_again(self):
+        load_files([self.filename], self.database)
+        statistics = load_files([self.filename], self.database)
+        self.assertEqual(statistics.records, 2)
+        # The ids continue after the records loaded before
+        self.assertEqual(self.query('SELECT id FROM records ORDER BY id'),
+                         [(1,), (2,), (3,), (4,)])
+        self.assertEqual(self.query(
+            'SELECT COUNT(DISTINCT record_id) FROM features'), [(4,)])
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from src.tokenizer import (split_feature_line, split_keyword_line,
+                           split_origin_line, split_qualifier_line)
+
+
+class TokenizerTest(TestCase):
+
+    def test_keyword_line(self):
+        self.assertEqual(split_keyword_line('  AUTHORS   Doe,J.\n'),
+                         ('AUTHORS', 'Doe,J.'))
+        self.assertEqual(split_keyword_line('            and Roe,R.\n'),
+                         ('', 'and Roe,R.'))
+        # A keyword which runs into the value columns
+        self.assertEqual(split_keyword_line('BASE_COUNT_X 10 a\n'),
+                         ('BASE_COUNT_X', '10 a'))
+
+    def test_feature_line(self):
+        self.assertEqual(
+            split_feature_line(b'     CDS             complement(1..10)\n'),
+            (b'CDS', b'complement(1..10)'))
+        self.assertEqual(split_feature_line('     misc_feature_long 1..10\n'),
+                         ('misc_feature_long', '1..10'))
+
+    def test_qualifier_line(self):
+        for line in ('                     /gene="AXL2"\n',
+                     '   /gene="AXL2"  \r\n'):
+            self.assertEqual(split_qualifier_line(line), 'gene="AXL2"')
+            self.assertEqual(split_qualifier_line(line.encode('ascii')),
+                             b'gene="AXL2"')
+        self.assertEqual(split_qualifier_line(
+            '                     /pseudo\n'), 'pseudo')
+        for line in ('     gene            1..10\n',
+                     '                     AXL2"\n', 'ORIGIN\n', '', '\n'):
+            self.assertIsNone(split_qualifier_line(line))
+
+    def test_origin_line(self):
+        self.assertEqual(split_origin_line('       61 acgt acg\n'),
+                         ('61', 'acgtacg'))
+        self.assertEqual(split_origin_line('61 acgtacg\n'),
+                         ('61', 'acgtacg'))
+        self.assertEqual(split_origin_line('//\n'), (None, None))